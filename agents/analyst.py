@@ -1,18 +1,36 @@
-from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-import chromadb
+from utils.llm import get_llm, LLM_MODEL
 import os
 
-# Initialize Vector DB Client
+# Vector DB Client (opened on first use: importing chromadb is slow and the
+# embedding model only loads on the first query, see get_chroma_client / warm_up in api.py)
 CHROMA_PATH = "nba_chroma"
-client = chromadb.PersistentClient(path=CHROMA_PATH)
+# Collections the server writes at runtime (answer cache, few-shot examples) live apart from the
+# git-tracked RAG store built by utils/init_db.py
+RUNTIME_CHROMA_PATH = os.getenv("DEEPSTAT_RUNTIME_CHROMA_PATH", os.path.join(".cache", "chroma"))
+client = None
+runtime_client = None
 
-def get_context_analyst():
+def get_chroma_client():
+    global client
+    if client is None:
+        import chromadb
+        client = chromadb.PersistentClient(path=CHROMA_PATH)
+    return client
+
+def get_runtime_chroma_client():
+    global runtime_client
+    if runtime_client is None:
+        import chromadb
+        runtime_client = chromadb.PersistentClient(path=RUNTIME_CHROMA_PATH)
+    return runtime_client
+
+def get_context_analyst(model=LLM_MODEL):
     """
     Returns a chain that adds "Color Commentary" and "Context" to the raw SQL data.
     """
-    llm = ChatOllama(model="qwen2.5-coder:7b-instruct", temperature=0.7)
+    llm = get_llm("analyst", temperature=0.7, model=model)
     
     prompt = ChatPromptTemplate.from_messages([
         ("system", """You are a Senior NBA Sports Journalist (like Zach Lowe).
@@ -48,21 +66,32 @@ def retrieve_rag_context(query: str, n_results=3):
     """
     Simple retrieval from ChromaDB to find relevant Players/Teams.
     """
-    context_str = ""
+    return retrieve_rag_context_batch([query], n_results)[0]
+
+def retrieve_rag_context_batch(queries: list[str], n_results=3):
+    """
+    Retrieval for many questions at once: one embedding pass and one query per collection
+    instead of one per question. Returns a context string per query, in order.
+    """
+    contexts = ["" for _ in queries]
+    if not queries:
+        return contexts
     try:
         # Search Players
-        p_coll = client.get_collection("nba_players")
-        p_results = p_coll.query(query_texts=[query], n_results=n_results)
-        if p_results['documents']:
-            context_str += "Relevant Players: " + ", ".join(p_results['documents'][0]) + "\n"
+        p_coll = get_chroma_client().get_collection("nba_players")
+        p_results = p_coll.query(query_texts=queries, n_results=n_results)
+        for i, docs in enumerate(p_results['documents'] or []):
+            if docs:
+                contexts[i] += "Relevant Players: " + ", ".join(docs) + "\n"
             
         # Search Teams
-        t_coll = client.get_collection("nba_teams")
-        t_results = t_coll.query(query_texts=[query], n_results=n_results)
-        if t_results['documents']:
-             context_str += "Relevant Teams: " + ", ".join(t_results['documents'][0]) + "\n"
+        t_coll = get_chroma_client().get_collection("nba_teams")
+        t_results = t_coll.query(query_texts=queries, n_results=n_results)
+        for i, docs in enumerate(t_results['documents'] or []):
+            if docs:
+                contexts[i] += "Relevant Teams: " + ", ".join(docs) + "\n"
              
     except Exception as e:
         print(f"RAG Error: {e}")
         
-    return context_str
+    return contexts
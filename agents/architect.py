@@ -1,25 +1,19 @@
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_ollama import ChatOllama
 from langchain_core.output_parsers import StrOutputParser
+from utils.llm import get_llm, LLM_MODEL
+from utils.schema_prompt import schema_prompt
 
 # The Architect plans the analysis but does NOT write code.
 # It identifies the Entities (Curry, Warriors) and the Metrics (PTS, REB).
 
-def get_architect_chain():
-    llm = ChatOllama(model="qwen2.5-coder:7b-instruct", temperature=0)
+def get_architect_chain(model=LLM_MODEL):
+    llm = get_llm("architect", temperature=0, model=model)
     
     prompt = ChatPromptTemplate.from_messages([
         ("system", """You are a Data Architect for an NBA Analytics Engine.
         Your goal is to translate a natural language question into a LOGICAL PLAN for a Python Coder (who uses Pandas).
         
-        DATA SCHEMA (ONLY USE THESE COLUMNS):
-        1. games (GAME_ID, GAME_DATE_EST, HOME_TEAM_ID, VISITOR_TEAM_ID, SEASON, HOME_TEAM_WINS, PTS_home, PTS_away)
-           - `SEASON` is ONLY here.
-        2. game_stats (GAME_ID, TEAM_ID, TEAM_CITY, PLAYER_NAME, PTS, REB, AST, STL, BLK, DREB, PF, MIN, PLUS_MINUS, FG_PCT, FG3_PCT, FT_PCT)
-           - NO `SEASON` here. Join with `games`.
-        3. teams (TEAM_ID, ABBREVIATION, NICKNAME, CITY)
-        
-        CRITICAL: DO NOT USE `WIN_SHARES`, `DRAFT_YEAR`, `ROOKIE_STATUS`. THEY DO NOT EXIST.
+        CRITICAL: ONLY USE THE TABLES AND COLUMNS IN THE DATA SCHEMA BELOW. DO NOT USE `WIN_SHARES`, `DRAFT_YEAR`, `ROOKIE_STATUS`. THEY DO NOT EXIST.
         
         INSTRUCTIONS:
         1. Identify Core Tables.
@@ -47,8 +41,11 @@ def get_architect_chain():
         3. Calculate Aggregates: SUM(STL) as Total_Steals, SUM(BLK) as Total_Blocks.
         4. Order by (Total_Steals + Total_Blocks) DESC.
         5. Select TOP 10 to provide a broad perspective.
+
+        DATA SCHEMA (ONLY USE THESE COLUMNS):
+        {schema}
         """),
         ("user", "{question}")
-    ])
+    ]).partial(schema=schema_prompt)  # api.py passes a schema pruned to the question
     
     return prompt | llm | StrOutputParser()
@@ -0,0 +1,55 @@
+import json
+import re
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+from utils.llm import get_llm, LLM_MODEL
+from agents.coder import CODER_SYSTEM_PROMPT
+from utils.schema_prompt import schema_prompt
+from utils.example_store import default_examples
+
+# The Planner-Coder does the Architect's and the Coder's jobs in ONE call (plan-and-code mode).
+# It answers with a JSON object: the plan (kept for display) and the script that implements it.
+
+def get_plan_coder_chain(model=LLM_MODEL):
+    llm = get_llm("plan_coder", temperature=0, model=model, format="json")
+
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", """You are the Data Architect AND the Python Data Scientist of an NBA Analytics Engine.
+        In ONE answer, first write a short LOGICAL PLAN, then the script that implements it.
+
+        PLANNING RULES:
+        1. Identify the core tables, filters (e.g. SEASON=2016), joins (gs.GAME_ID = g.GAME_ID) and aggregation.
+        2. **SEASON LOGIC**: The 2008 Championship is SEASON=2007 (June 2008 Finals, playoffs).
+        3. **GLOBAL SEARCH**: If no season is specified, do NOT filter by `SEASON`. `GROUP BY PLAYER_NAME, SEASON` instead.
+        4. "Rookie" / "Debut" / "First Season" -> `MIN(SEASON)` per player. "Retirement" / "Final Season" -> `MAX(SEASON)` per player.
+        5. For "best" or "greatest" questions, return a TOP 10 for a broad perspective.
+
+        """ + CODER_SYSTEM_PROMPT + """
+
+        OUTPUT FORMAT (CRITICAL):
+        Reply with ONE JSON object and nothing else:
+        {{"plan": "1. Load 'game_stats'...\\n2. ...", "code": "query = \\"\\"\\"SELECT ...\\"\\"\\"\\ndf = con.execute(query).df()\\nprint(df)"}}
+        - "plan": numbered steps, plain text.
+        - "code": the Python script only (no markdown fences).
+        """),
+        ("user", "{question}")
+    ]).partial(schema=schema_prompt, examples=default_examples)
+
+    return prompt | llm | StrOutputParser()
+
+def parse_plan_and_code(text):
+    """
+    (plan, code) from the Planner-Coder's answer. Falls back to prose + a ```python block
+    when the model ignored the JSON format.
+    """
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict) and data.get("code"):
+            return str(data.get("plan") or "").strip(), str(data["code"]).strip()
+    except json.JSONDecodeError:
+        pass
+    match = re.search(r"```(?:python)?(.*?)```", text, re.DOTALL)
+    if match:
+        return text[:match.start()].strip(), match.group(1).strip()
+    return "", text.strip()
@@ -0,0 +1,43 @@
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+from utils.llm import get_llm, LLM_MODEL
+from utils.schema_prompt import schema_prompt
+from utils.example_store import default_sql_examples
+
+# The SQL Coder answers with ONE DuckDB query instead of a Python script (SQL mode, see utils/sql_mode.py).
+# The server runs it directly; questions it can't answer in SQL are flagged and go to the Python Coder.
+
+def get_sql_coder_chain(model=LLM_MODEL):
+    llm = get_llm("sql_coder", temperature=0, model=model, format="json")
+
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", """You are a SQL Data Scientist specialized in DuckDB.
+        Your goal is to write ONE query that answers the question below.
+
+        DATABASE: 'nba.duckdb' (tables are listed under TABLES at the end)
+
+        STRICT RULES:
+        1. **READ ONLY**: ONE `SELECT` (a `WITH ... SELECT` is fine). No other statements, no files, no table functions.
+        2. **STRICT SCHEMA**: If a column is not in TABLES, it does not exist.
+        3. **SQL JOIN**: Always join `games` to filter by `SEASON`.
+        4. **SAFE MIN PARSING**: `MIN` contains dirty data like strings. ALWAYS use this pattern to parse minutes:
+           - `CAST(CASE WHEN MIN LIKE '%:%' THEN SPLIT_PART(MIN, ':', 1) ELSE '0' END AS INTEGER)`
+        5. **Use Aliases**: ALWAYS use table aliases (e.g. `game_stats gs`). Select `gs.PTS`, not `PTS`.
+        6. **PARAMETERS**: Write literal values (seasons, names, limits) as `?` and list them, in order, in "params".
+        7. **NEEDS PYTHON**: If the answer needs pandas (reshaping, several queries, iterative logic), set "needs_python": true and leave "sql" empty.
+
+        EXAMPLES (similar questions that were answered correctly):
+        {examples}
+
+        TABLES (ONLY USE THESE):
+        {schema}
+
+        OUTPUT FORMAT (CRITICAL):
+        Reply with ONE JSON object and nothing else:
+        {{"sql": "SELECT ... LIMIT ?", "params": [10], "display": {{"title": "...", "chart": "table", "x": "PLAYER_NAME", "y": "PPG"}}, "needs_python": false}}
+        - "display.chart": "table", "bar" or "line"; "x" and "y" are result columns.
+        """),
+        ("user", "Plan: {plan}\n\nQuestion: {question}")
+    ]).partial(schema=schema_prompt, examples=default_sql_examples)  # api.py passes ones chosen for the question
+
+    return prompt | llm | StrOutputParser()
@@ -1,16 +1,54 @@
+import time
+IMPORT_STARTED = time.perf_counter()  # cold-start accounting, see deepstat_startup_seconds
+
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
-import duckdb
-import io
-import contextlib
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse, Response
 import os
+import sys
+import json
+import asyncio
+import importlib
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+# Agents are imported on first use (or by warm_up): they pull in LangChain, the Ollama client and Chroma,
+# which would otherwise make up most of the server's import time
+def lazy(module, name):
+    def load(*args, **kwargs):
+        return getattr(importlib.import_module(module), name)(*args, **kwargs)
+    load.__name__ = name
+    return load
 
-# Import Agents
-# Import Agents
-from agents.architect import get_architect_chain
-from agents.coder import get_coder_chain
-from agents.analyst import get_context_analyst, retrieve_rag_context
+get_architect_chain = lazy("agents.architect", "get_architect_chain")
+get_coder_chain = lazy("agents.coder", "get_coder_chain")
+get_context_analyst = lazy("agents.analyst", "get_context_analyst")
+get_plan_coder_chain = lazy("agents.plan_coder", "get_plan_coder_chain")
+parse_plan_and_code = lazy("agents.plan_coder", "parse_plan_and_code")
+get_sql_coder_chain = lazy("agents.sql_coder", "get_sql_coder_chain")
+retrieve_rag_context = lazy("agents.analyst", "retrieve_rag_context")
+retrieve_rag_context_batch = lazy("agents.analyst", "retrieve_rag_context_batch")
+get_chroma_client = lazy("agents.analyst", "get_chroma_client")
+get_runtime_chroma_client = lazy("agents.analyst", "get_runtime_chroma_client")
+from utils.answer_cache import AnswerCache, CACHE_ENABLED, normalize_question
+from utils.stage_cache import StageCache, STAGE_CACHE_ENABLED, stage_key
+from utils.sandbox import SandboxPool, ExecutionResult
+from utils.results import ResultStore, to_columnar, to_arrow_ipc, summarize_table, PAGE_SIZE, ARROW_MEDIA_TYPE
+from utils.db_pool import ConnectionPool
+from utils.sql_templates import TemplateLibrary, TEMPLATES_ENABLED, TEMPLATE_MIN_CONFIDENCE, run_template
+from utils.sql_validator import SQLValidator, SQL_VALIDATION_ENABLED
+from utils.sql_mode import SQL_MODE_DEFAULT, parse_sql_answer, unsafe_reason, run_sql
+from utils.schema_prompt import get_schema_catalog, schema_prompt
+from utils.example_store import ExampleStore, FEW_SHOT_ENABLED, FEW_SHOT_LEARN, SEED_EXAMPLES, format_examples, default_examples
+from utils.code_repair import repair_code, LOCAL_REPAIR_ENABLED, MAX_LOCAL_REPAIRS
+from utils.deadline import Deadline, StageTimeout, REQUEST_DEADLINE_SECONDS
+from utils.tracing import Trace, TraceSink, TRACE_ENABLED
+from utils.model_router import route, escalate, record as record_route, LARGE_MODEL, SMALL_MODEL, ROUTING_ENABLED
+from utils.metrics import (REGISTRY, PROMETHEUS_CONTENT_TYPE, STAGE_SECONDS, LLM_SECONDS, REQUESTS, RETRIES,
+                           CACHE_LOOKUPS, STARTUP_SECONDS, FIRST_REQUEST_SECONDS)
 
 app = FastAPI()
 
@@ -23,8 +61,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress JSON/Arrow payloads (result pages can be large). SSE is left uncompressed so tokens flush immediately.
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
 class QueryRequest(BaseModel):
     question: str
+    speculative: bool | None = None  # None -> DEEPSTAT_SPECULATIVE
+    deadline_seconds: float | None = None  # None -> DEEPSTAT_REQUEST_DEADLINE_SECONDS
+    plan_and_code: bool | None = None  # None -> DEEPSTAT_PLAN_AND_CODE
+    sql_mode: bool | None = None  # None -> DEEPSTAT_SQL_MODE
+
+class BatchRequest(BaseModel):
+    questions: list[str]
+    concurrency: int | None = None
+    deadline_seconds: float | None = None  # per question
+    plan_and_code: bool | None = None
+    sql_mode: bool | None = None
 
 class QueryResponse(BaseModel):
     plan: str
@@ -32,6 +84,62 @@ class QueryResponse(BaseModel):
     result: str
     narrative: str | None = None
     success: bool
+    cached: bool = False
+    table: dict | None = None  # first page of the result as typed columnar JSON
+    result_id: str | None = None  # page through the rest with GET /api/results/{result_id}
+    timings: dict[str, float] = {}  # seconds per stage (see run_pipeline)
+    template: str | None = None  # set when an SQL template answered without the Architect/Coder
+    timed_out_stage: str | None = None  # plan | code | execution | analyst when the deadline cut the request short
+    display: dict | None = None  # SQL mode: the SQL Coder's title/chart/x/y hints for the result
+
+# Concurrency Limits
+# MAX_CONCURRENT_QUERIES caps how many questions run the pipeline at once (extra requests wait their turn).
+# EXECUTOR_WORKERS sizes the thread pool for blocking work (waiting on the sandbox, Chroma retrieval).
+MAX_CONCURRENT_QUERIES = int(os.getenv("DEEPSTAT_MAX_CONCURRENT_QUERIES", "4"))
+EXECUTOR_WORKERS = int(os.getenv("DEEPSTAT_EXECUTOR_WORKERS", "4"))
+BATCH_CONCURRENCY = int(os.getenv("DEEPSTAT_BATCH_CONCURRENCY", str(MAX_CONCURRENT_QUERIES)))
+
+# Speculative Code Generation (opt-in)
+# One Coder candidate per temperature, executed in parallel; the first non-empty success wins.
+SPECULATIVE_DEFAULT = os.getenv("DEEPSTAT_SPECULATIVE", "0") == "1"
+SPECULATIVE_TEMPERATURES = [float(t) for t in os.getenv("DEEPSTAT_SPECULATIVE_TEMPERATURES", "0,0.3,0.7").split(",")]
+
+# Plan-and-Code Mode (opt-in)
+# One structured LLM call returns both the plan and the code (agents/plan_coder.py), saving the
+# Architect round trip. Retries still go to the regular Coder with the plan and the error.
+PLAN_AND_CODE_DEFAULT = os.getenv("DEEPSTAT_PLAN_AND_CODE", "0") == "1"
+
+# SQL Mode (opt-in, DEEPSTAT_SQL_MODE)
+# The SQL Coder (agents/sql_coder.py) answers with one parameterized query that runs directly on
+# db_pool, without the sandbox (utils/sql_mode.py). The Python Coder is the fallback.
+
+# Warm-up (on by default)
+# Runs in the background once the server is up: opens DuckDB and primes the catalog (templates,
+# validator), loads Chroma's embedding model, builds the chains and loads each model in use into
+# Ollama. Questions are served meanwhile; /health reports what is warm.
+WARMUP_ENABLED = os.getenv("DEEPSTAT_WARMUP", "1") == "1"
+
+executor = ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS, thread_name_prefix="deepstat")
+query_slots = asyncio.Semaphore(MAX_CONCURRENT_QUERIES)
+
+async def run_blocking(fn, *args):
+    """
+    Runs a blocking function on the bounded executor so the event loop stays free.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, fn, *args)
+
+# References to fire-and-forget writes, so they aren't garbage-collected before they finish
+background_tasks = set()
+
+def run_in_background(fn, *args):
+    """
+    Schedules a blocking write (answer cache, few-shot example) without making the response wait on it.
+    """
+    task = asyncio.create_task(run_blocking(fn, *args))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
 
 # Initialize Chains (Lazy load to allow time for pip install)
 architect_chain = None
@@ -46,132 +154,1014 @@ def get_chains():
         coder_chain = get_coder_chain()
     if not analyst_chain:
         analyst_chain = get_context_analyst()
+    readiness["chains"]["ready"] = True
     return architect_chain, coder_chain, analyst_chain
 
-import pandas as pd 
+speculative_coders = {}
 
-def execute_code(code):
-    print("\n🐍 EXECUTING CODE...")
-    code = code.replace("```python", "").replace("```", "").strip()
-    
-    f = io.StringIO()
-    f_err = io.StringIO()
-    success = False
-    exec_globals = {'duckdb': duckdb, 'pd': pd}
-    
-    with contextlib.redirect_stdout(f), contextlib.redirect_stderr(f_err):
+def get_speculative_coder(decision, temperature):
+    """
+    The Coder chain for one speculative candidate: the routed model (see get_routed_chain) at the given temperature.
+    """
+    if temperature == 0:
+        return get_routed_chain(decision)
+    key = (decision.model, temperature)
+    if key not in speculative_coders:
+        speculative_coders[key] = get_coder_chain(temperature=temperature, model=decision.model)
+    return speculative_coders[key]
+
+routed_chains = {}
+
+def get_routed_chain(decision):
+    """
+    The agent chain for a routing decision (see utils/model_router.py). The large model uses the chains from get_chains().
+    """
+    if decision.model == LARGE_MODEL and decision.stage in ("architect", "coder", "analyst"):
+        return dict(zip(["architect", "coder", "analyst"], get_chains()))[decision.stage]
+    key = (decision.stage, decision.model)
+    if key not in routed_chains:
+        factory = {"architect": get_architect_chain, "coder": get_coder_chain, "analyst": get_context_analyst,
+                   "plan_coder": get_plan_coder_chain, "sql_coder": get_sql_coder_chain}[decision.stage]
+        routed_chains[key] = factory(model=decision.model)
+    return routed_chains[key]
+
+answer_cache = None
+
+def get_answer_cache():
+    global answer_cache
+    if CACHE_ENABLED and not answer_cache:
+        answer_cache = AnswerCache(get_runtime_chroma_client())
+    return answer_cache
+
+example_store = None
+example_store_failure = None  # (time, error) of the last failed construction
+EXAMPLE_STORE_RETRY_SECONDS = 60
+
+def get_example_store():
+    """
+    The shared ExampleStore, or None when few-shot retrieval is off. Construction seeds the store
+    (which needs the embedding model); if that fails, the same error is raised again without
+    retrying for EXAMPLE_STORE_RETRY_SECONDS.
+    """
+    global example_store, example_store_failure
+    if FEW_SHOT_ENABLED and not example_store:
+        if example_store_failure and time.monotonic() - example_store_failure[0] < EXAMPLE_STORE_RETRY_SECONDS:
+            raise example_store_failure[1]
         try:
-            exec(code, exec_globals)
-            success = True
+            example_store = ExampleStore(get_runtime_chroma_client())
+            example_store_failure = None
         except Exception as e:
-            print(f"RUNTIME ERROR: {e}")
-            import traceback
-            traceback.print_exc()
-            success = False
-            
-    output = f.getvalue()
-    errors = f_err.getvalue()
-    
-    if errors: output += f"\n[STDERR]\n{errors}"
+            example_store_failure = (time.monotonic(), e)
+            raise
+    return example_store
+
+def select_examples(question):
+    """
+    (examples, [example questions]) for the Coder prompts (see format_examples): the stored examples
+    closest to the question. Every seed example when few-shot retrieval is off or the store can't be read.
+    """
+    try:
+        store = get_example_store()
+        if store:
+            examples = store.select(question)
+            return examples, [e["question"] for e in examples]
+    except Exception as e:
+        print(f"   [Examples] Lookup Error: {e}")
+    return SEED_EXAMPLES, []
+
+def learn_example(question, code):
+    try:
+        store = get_example_store()
+        if store:
+            store.add(question, code)
+    except Exception as e:
+        print(f"   [Examples] Store Error: {e}")
+
+stage_cache = None
+
+def get_stage_cache():
+    global stage_cache
+    if STAGE_CACHE_ENABLED and not stage_cache:
+        stage_cache = StageCache()
+    return stage_cache
+
+def llm_config(stage):
+    # Per-call callbacks: token usage per agent lands in /metrics
+    from utils.llm import TokenUsageHandler
+    return {"callbacks": [TokenUsageHandler(stage)]}
+
+async def timed_ainvoke(stage, chain, inputs):
+    started = time.perf_counter()
+    value = await chain.ainvoke(inputs, config=llm_config(stage))
+    LLM_SECONDS.observe(time.perf_counter() - started, agent=stage)
+    return value
+
+async def memo_ainvoke(stage, chain, inputs):
+    """
+    chain.ainvoke(inputs), memoized on disk by a hash of the exact prompt the LLM would see.
+    """
+    cache = get_stage_cache()
+    if not cache:
+        return await timed_ainvoke(stage, chain, inputs)
+    key = stage_key(stage, chain, inputs)
+    value = await run_blocking(cache.get, stage, key)
+    if value is not None:
+        print(f"   [Memo] {stage} served from stage cache")
+        CACHE_LOOKUPS.inc(cache=f"stage_{stage}", result="hit")
+        return value
+    CACHE_LOOKUPS.inc(cache=f"stage_{stage}", result="miss")
+    value = await timed_ainvoke(stage, chain, inputs)
+    await run_blocking(cache.put, stage, key, value)
+    return value
+
+async def forget_stage(stage, chain, inputs):
+    # Drops a memoized result that turned out to be bad (e.g. code that failed to execute)
+    cache = get_stage_cache()
+    if cache:
+        await run_blocking(cache.delete, stage_key(stage, chain, inputs))
+
+async def memo_astream(stage, chain, inputs):
+    """
+    Streaming counterpart of memo_ainvoke: a memoized result arrives as a single chunk.
+    """
+    cache = get_stage_cache()
+    key = stage_key(stage, chain, inputs) if cache else None
+    if cache:
+        value = await run_blocking(cache.get, stage, key)
+        if value is not None:
+            print(f"   [Memo] {stage} served from stage cache")
+            CACHE_LOOKUPS.inc(cache=f"stage_{stage}", result="hit")
+            yield value
+            return
+        CACHE_LOOKUPS.inc(cache=f"stage_{stage}", result="miss")
+    value = ""
+    started = time.perf_counter()
+    async for chunk in chain.astream(inputs, config=llm_config(stage)):
+        value += chunk
+        yield chunk
+    LLM_SECONDS.observe(time.perf_counter() - started, agent=stage)
+    if cache and value.strip():
+        await run_blocking(cache.put, stage, key, value)
+
+sandbox = None
+
+def get_sandbox():
+    global sandbox
+    if not sandbox:
+        sandbox = SandboxPool()
+        sandbox.start()
+    return sandbox
+
+# Readiness of each lazily loaded component. Set by warm_up, or by first use when warm-up is off.
+readiness = {
+    "duckdb": {"ready": False},
+    "chroma": {"ready": False},
+    "chains": {"ready": False},
+    "llm": {"ready": False},
+}
+warmup_task = None
+
+def models_in_use():
+    return [LARGE_MODEL] + ([SMALL_MODEL] if ROUTING_ENABLED and SMALL_MODEL != LARGE_MODEL else [])
+
+def warm_duckdb():
+    db_pool.cursor().close()  # raises RuntimeError when nba.duckdb is missing
+    get_templates()
+    get_schema_catalog().load()
+    if get_validator():
+        validator.get_catalog()
+
+def warm_chroma():
+    # The first query loads the embedding model (the slowest part of a cold RAG call)
+    get_chroma_client().get_collection("nba_players").query(query_texts=["warm up"], n_results=1)
+    get_answer_cache()
+    try:
+        get_example_store()
+    except Exception as e:
+        # The Coder falls back to the seed examples; RAG itself is still warm
+        print(f"   [Examples] Store Error: {e}")
+
+async def warm_llm():
+    from utils.llm import warm_model
+    await asyncio.gather(*(warm_model(model) for model in models_in_use()))
+
+async def warm_up():
+    """
+    Loads everything the first question would otherwise wait for, timing each component.
+    Failures are reported by /health and never stop the server.
+    """
+    async def step(component, work):
+        started = time.perf_counter()
+        try:
+            await work()
+            readiness[component].update(ready=True, error=None)
+        except Exception as e:
+            readiness[component].update(ready=False, error=str(e))
+            print(f"   [Warm-up] {component} failed: {e}")
+        seconds = round(time.perf_counter() - started, 4)
+        readiness[component]["seconds"] = seconds
+        STARTUP_SECONDS.set(seconds, phase=f"warmup_{component}")
+
+    print("🔥 Warming up DuckDB, Chroma, chains and models...")
+    await asyncio.gather(
+        step("duckdb", lambda: run_blocking(warm_duckdb)),
+        step("chroma", lambda: run_blocking(warm_chroma)),
+        step("chains", lambda: run_blocking(get_chains)),
+    )
+    await step("llm", warm_llm)
+    ready = round(time.perf_counter() - IMPORT_STARTED, 4)
+    STARTUP_SECONDS.set(ready, phase="ready")
+    print(f"🔥 Warm-up done, {ready}s after import")
+
+@app.on_event("startup")
+async def start_sandbox():
+    # Pre-fork the execution workers so the first question doesn't pay for interpreter startup
+    global warmup_task
+    started = time.perf_counter()
+    get_sandbox()
+    STARTUP_SECONDS.set(round(time.perf_counter() - started, 4), phase="sandbox")
+    if WARMUP_ENABLED:
+        warmup_task = asyncio.create_task(warm_up())
+    else:
+        STARTUP_SECONDS.set(round(time.perf_counter() - IMPORT_STARTED, 4), phase="ready")
+
+@app.on_event("shutdown")
+def stop_sandbox():
+    if warmup_task:
+        warmup_task.cancel()
+    if sandbox:
+        sandbox.shutdown()
+    db_pool.close()
+    if trace_sink:
+        trace_sink.close()
+
+# Server-side read-only connection for the SQL template fast path (no sandbox needed: the SQL is ours)
+db_pool = ConnectionPool()
+get_schema_catalog(db_pool)  # the agents' DATA SCHEMA sections read this pool's catalog
+templates = None
+
+def get_templates():
+    global templates
+    # Rebuilt along with the pool's connection when nba.duckdb is rebuilt
+    if TEMPLATES_ENABLED and (not templates or templates.version != db_pool.current_version()):
+        try:
+            templates = TemplateLibrary.from_pool(db_pool)
+            readiness["duckdb"]["ready"] = True
+        except RuntimeError:
+            return None  # nba.duckdb not built yet
+    return templates
+
+def match_template(question):
+    library = get_templates()
+    if not library:
+        return None
+    match = library.match(question)
+    if match and match.confidence >= TEMPLATE_MIN_CONFIDENCE:
+        return match
+    return None
+
+validator = None
+
+def get_validator():
+    global validator
+    if SQL_VALIDATION_ENABLED and not validator:
+        validator = SQLValidator(db_pool)
+    return validator
+
+def validate_code(code):
+    """
+    Binds the script's SQL against the catalog before it runs. Returns a ValidationReport, or
+    None when validation is disabled or nba.duckdb is missing (the sandbox reports that itself).
+    """
+    checker = get_validator()
+    if not checker:
+        return None
+    try:
+        return checker.validate(code)
+    except RuntimeError:
+        return None
+
+def validate_query(answer):
+    # validate_code for an SQL mode query (report.code is the query itself)
+    checker = get_validator()
+    if not checker:
+        return None
+    try:
+        return checker.validate_sql(answer.sql, answer.params)
+    except RuntimeError:
+        return None
+
+result_store = ResultStore()
+
+trace_sink = None
+
+def get_trace_sink():
+    global trace_sink
+    if TRACE_ENABLED and not trace_sink:
+        trace_sink = TraceSink()
+    return trace_sink
+
+def record_trace(trace, **summary):
+    # Queued for the background writer; never blocks the request
+    sink = get_trace_sink()
+    if sink:
+        sink.emit(trace.to_dict(**summary))
+
+def execution_attrs(execution):
+    attrs = {"success": execution.success, "rows": execution.table.num_rows if execution.table is not None else None}
+    if execution.timed_out:
+        attrs["timed_out"] = True
+    if not execution.success:
+        # The "RUNTIME ERROR: ..." line, not the whole traceback
+        errors = [line for line in execution.output.splitlines() if "ERROR" in line]
+        attrs["error"] = (errors[0] if errors else execution.output.strip())[:500]
+    return attrs
+
+def execute_code(code, cancel_event=None):
+    print("\n🐍 EXECUTING CODE...")
+    return get_sandbox().run(code, cancel_event=cancel_event)
+
+async def execute_cancellable(code):
+    """
+    Runs code on the sandbox. If the awaiting task is cancelled, the sandbox run is stopped too
+    (a plain run_in_executor call would keep the worker busy until the script finished).
+    """
+    cancel_event = threading.Event()
+    try:
+        return await run_blocking(execute_code, code, cancel_event)
+    except asyncio.CancelledError:
+        cancel_event.set()
+        raise
+
+def has_rows(execution):
+    # "Success" that produced nothing useful doesn't count as a speculative win
+    if not execution.success:
+        return False
+    if execution.table is not None:
+        return execution.table.num_rows > 0
+    return bool(execution.output.strip()) and not execution.output.startswith("(No output")
+
+async def speculate_code(coder_inputs, decision):
+    """
+    Asks the Coder (on decision.model) for one candidate per SPECULATIVE_TEMPERATURES at once, executes each as soon
+    as it is written and returns (code, execution) for the first that succeeds with a non-empty
+    result. The remaining candidates are cancelled. If none win, returns the first candidate that
+    finished (so the regular retry loop can fix it), or None if every generation failed.
+    Each candidate is validated and locally repaired like a regular attempt before it can lose.
+    """
+    async def candidate(temperature):
+        coder = get_speculative_coder(decision, temperature)
+        if temperature == 0:
+            code_raw = await memo_ainvoke("coder", coder, coder_inputs)
+        else:
+            # Sampled candidates are not memoized: a repeat question should get fresh ones
+            code_raw = await timed_ainvoke("coder", coder, coder_inputs)
+        code_clean = extract_code(code_raw)
+        code_clean, execution = await run_candidate(code_clean)
+        if temperature == 0 and not has_rows(execution):
+            await forget_stage("coder", coder, coder_inputs)
+        return code_clean, execution
+
+    async def run_candidate(code_clean):
+        report = await run_blocking(validate_code, code_clean)
+        if report and report.fixes:
+            print(f"   [Speculative] Validator auto-fixed: {report.fixes}")
+            code_clean = report.code
+        if report and not report.ok:
+            # Rejected before paying for a sandbox run; the retry loop sees the validator's error
+            return code_clean, ExecutionResult(output=report.error_output(), success=False)
+        execution = await execute_cancellable(code_clean)
+        repaired = repair_code(code_clean, execution.output) if LOCAL_REPAIR_ENABLED and not execution.success else None
+        if repaired:
+            print(f"   [Speculative] Local repair: {repaired[1]}")
+            code_clean = repaired[0]
+            execution = await execute_cancellable(code_clean)
+        return code_clean, execution
 
-    if not output.strip() and success:
-        if 'result' in exec_globals: output = f"[Captured 'result']:\n{exec_globals['result']}"
-        elif 'df' in exec_globals: output = f"[Captured 'df']:\n{exec_globals['df']}"
-        else: output = "(No output. Try assigning 'result' variable.)"
-            
-    return output, success
+    # route() counted one Coder call; each extra candidate is another call on the same model
+    for _ in SPECULATIVE_TEMPERATURES[1:]:
+        record_route(decision)
+    tasks = [asyncio.create_task(candidate(t)) for t in SPECULATIVE_TEMPERATURES]
+    fallback = None
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                code_clean, execution = await next_done
+            except Exception as e:
+                print(f"   [Speculative] Candidate failed: {e}")
+                continue
+            if has_rows(execution):
+                print(f"   [Speculative] Winner found, cancelling {sum(not t.done() for t in tasks)} candidates")
+                return code_clean, execution
+            fallback = fallback or (code_clean, execution)
+    finally:
+        for task in tasks:
+            task.cancel()
+    return fallback
 
 import re
 
+def extract_code(code_raw):
+    # Robust Extraction: Find content strictly inside ```python ... ```
+    match = re.search(r"```python(.*?)```", code_raw, re.DOTALL)
+    if match:
+        return match.group(1).strip()
+    # Fallback: Just strip fences if regex fails
+    return code_raw.replace("```python", "").replace("```", "").strip()
+
 @app.post("/api/query", response_model=QueryResponse)
 async def run_query(req: QueryRequest):
+    async with query_slots:
+        try:
+            return await answer_question(req.question, speculative=req.speculative, deadline_seconds=req.deadline_seconds,
+                                         plan_and_code=req.plan_and_code, sql_mode=req.sql_mode)
+        except Exception as e:
+            traceback.print_exc()
+            raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/query/stream")
+async def run_query_stream(req: QueryRequest):
+    """
+    Server-Sent Events version of /api/query.
+    Emits: plan, code, execution (one per attempt), result, narrative (token deltas), done | error.
+    """
+    async def event_source():
+        async with query_slots:
+            try:
+                async for event, data in run_pipeline(req.question, speculative=req.speculative, deadline_seconds=req.deadline_seconds,
+                                                      plan_and_code=req.plan_and_code, sql_mode=req.sql_mode):
+                    yield format_sse(event, data)
+            except Exception as e:
+                traceback.print_exc()
+                yield format_sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/api/query/batch")
+async def run_query_batch(req: BatchRequest):
+    """
+    Answers many questions with bounded parallelism and streams JSONL as answers finish.
+    Duplicate questions (after normalization) are answered once, RAG retrieval for the whole
+    batch is a single Chroma call, and plans/code come from the stage cache where possible.
+    Each line is {"index", "question", "response", "error"}; the last line is {"summary": ...}.
+    """
+    async def lines():
+        started = time.time()
+
+        # 1. Collapse duplicates: normalized question -> original indices
+        groups = {}
+        for i, question in enumerate(req.questions):
+            groups.setdefault(normalize_question(question), []).append(i)
+        unique = [(req.questions[indices[0]], indices) for indices in groups.values()]
+
+        # 2. Shared RAG lookup for every unique question
+        contexts = await run_blocking(retrieve_rag_context_batch, [q for q, _ in unique])
+
+        limit = asyncio.Semaphore(max(1, req.concurrency or BATCH_CONCURRENCY))
+
+        async def answer(question, rag_context, indices):
+            async with limit, query_slots:
+                try:
+                    response = await answer_question(question, rag_context=rag_context, deadline_seconds=req.deadline_seconds,
+                                                     plan_and_code=req.plan_and_code, sql_mode=req.sql_mode)
+                    return indices, response.model_dump(), None
+                except Exception as e:
+                    traceback.print_exc()
+                    return indices, None, str(e)
+
+        tasks = [
+            asyncio.create_task(answer(question, rag_context, indices))
+            for (question, indices), rag_context in zip(unique, contexts)
+        ]
+        succeeded = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                indices, response, error = await next_done
+                for i in indices:
+                    succeeded += bool(response and response["success"])
+                    yield json.dumps({"index": i, "question": req.questions[i], "response": response, "error": error}) + "\n"
+        finally:
+            # Client went away: stop the remaining questions
+            for task in tasks:
+                task.cancel()
+
+        duration = time.time() - started
+        yield json.dumps({"summary": {
+            "questions": len(req.questions),
+            "unique_questions": len(unique),
+            "succeeded": succeeded,
+            "duration": round(duration, 2),
+            "questions_per_minute": round(len(req.questions) / (duration / 60), 2) if duration > 0 else None,
+        }}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def answer_question(question, rag_context=None, speculative=None, deadline_seconds=None, plan_and_code=None, sql_mode=None):
+    response = None
+    async for event, data in run_pipeline(question, rag_context=rag_context, speculative=speculative,
+                                          deadline_seconds=deadline_seconds, plan_and_code=plan_and_code, sql_mode=sql_mode):
+        if event == "done":
+            response = QueryResponse(**data)
+    return response
+
+def timed_retrieval(question):
+    started = time.perf_counter()
+    context = retrieve_rag_context(question)
+    if context:
+        readiness["chroma"]["ready"] = True  # the embedding model is loaded now
+    return context, time.perf_counter() - started
+
+first_request_seen = False
+
+def observe_first_request(seconds):
+    global first_request_seen
+    if not first_request_seen:
+        first_request_seen = True
+        FIRST_REQUEST_SECONDS.set(round(seconds, 4))
+
+async def run_pipeline(question, rag_context=None, speculative=None, deadline_seconds=None, plan_and_code=None, sql_mode=None):
+    """
+    Runs Architect -> Coder -> Execute (with retry) -> Analyst, yielding (event, data) pairs
+    as each stage finishes. The final "done" event carries the full QueryResponse payload.
+    rag_context may be supplied by the caller (batch endpoint) to skip retrieval.
+    speculative=True races several Coder candidates for the first attempt (see speculate_code).
+    plan_and_code=True gets the plan and the first script from one Planner-Coder call instead
+    (agents/plan_coder.py); it takes precedence over speculative.
+    sql_mode=True asks the SQL Coder for one query and runs it directly on db_pool (utils/sql_mode.py);
+    questions it can't answer, and queries that fail, go back to the Python Coder and the sandbox.
+    plan_and_code takes precedence over it, and it over speculative.
+    Questions that match an SQL template (utils/sql_templates.py) skip the Architect and Coder.
+
+    Generated SQL is bound against the catalog (utils/sql_validator.py) before each execution,
+    and known failure classes are repaired locally (utils/code_repair.py) before re-prompting the Coder.
+
+    The request has an end-to-end deadline (utils/deadline.py) split across plan, code, execution
+    and analyst. A stage that runs out is cancelled and a partial response names it in timed_out_stage.
+
+    Timings (seconds): plan, code, validation, execution, rag (retrieval itself, overlapped with the other
+    stages), rag_wait (time the Analyst actually waited for RAG), analyst, total.
+    """
+    if speculative is None:
+        speculative = SPECULATIVE_DEFAULT
+    if plan_and_code is None:
+        plan_and_code = PLAN_AND_CODE_DEFAULT
+    if sql_mode is None:
+        sql_mode = SQL_MODE_DEFAULT
+    started = time.perf_counter()
+    deadline = Deadline(REQUEST_DEADLINE_SECONDS if deadline_seconds is None else deadline_seconds)
+    trace = Trace(question, speculative=speculative, plan_and_code=plan_and_code, sql_mode=sql_mode, deadline=deadline.seconds)
+    timings = {"plan": 0.0, "code": 0.0, "validation": 0.0, "execution": 0.0, "rag": 0.0, "rag_wait": 0.0, "analyst": 0.0}
+
+    # 0. Answer Cache (repeat and near-repeat questions skip every LLM call)
+    cache = get_answer_cache()
+    if cache:
+        with trace.span("answer_cache") as span:
+            cached = await run_blocking(cache.lookup, question)
+            span.set(hit=bool(cached))
+        CACHE_LOOKUPS.inc(cache="answer", result="hit" if cached else "miss")
+        if cached:
+            cached["cached"] = True
+            cached["timings"] = {"total": round(time.perf_counter() - started, 4)}
+            STAGE_SECONDS.observe(cached["timings"]["total"], stage="total")
+            observe_first_request(cached["timings"]["total"])
+            REQUESTS.inc(route="cache", outcome="success" if cached["success"] else "failure")
+            yield "plan", {"plan": cached["plan"]}
+            yield "code", {"code": cached["code"], "attempt": 1}
+            yield "result", {"result": cached["result"], "success": cached["success"], "table": cached.get("table"), "result_id": None,
+                             "display": cached.get("display")}
+            yield "narrative", {"token": cached["narrative"] or ""}
+            yield "done", cached
+            record_trace(trace, route="cache", success=cached["success"], cached=True, timings=cached["timings"])
+            return
+
+    architect, coder, analyst = get_chains()
+    coder_route = None
+    models = {}  # stage -> model actually used, for the trace
+
+    # RAG only needs the question: start it now, alongside the Architect, and await it
+    # only when the Analyst needs it
+    rag_task = None
+    if rag_context is None:
+        rag_task = asyncio.create_task(run_blocking(timed_retrieval, question))
+    
+    # Defaults for a partial response if the deadline cuts the request short
+    plan = ""
+    code_clean = ""
+    success = False
+    result_output = ""
+    table_page = None
+    result_id = None
+    narrative = ""
+    analyst_failed = False
+    display = None
+    template = None
+    timed_out_stage = None
+    sql_answer = None  # set while the current code is an SQL mode query
+
     try:
-        architect, coder, analyst = get_chains()
-        
-        # 1. Plan
-        print(f"🤔 Planning: {req.question}")
-        plan = architect.invoke({"question": req.question})
-        
-        # 2. Code
-        print(f"💻 Coding...")
-        code_raw = coder.invoke({"plan": plan, "question": req.question})
-        
-        # Robust Extraction: Find content strictly inside ```python ... ```
-        match = re.search(r"```python(.*?)```", code_raw, re.DOTALL)
+        # Fast path: common question shapes are answered by a parameterized query, no LLM until the Analyst
+        execution = None
+        stage_started = time.perf_counter()
+        match = await run_blocking(match_template, question)
         if match:
-            code_clean = match.group(1).strip()
-        else:
-            # Fallback: Just strip fences if regex fails
-            code_clean = code_raw.replace("```python", "").replace("```", "").strip()
-        
+            print(f"⚡ Template: {match.name} {match.slots}")
+            with trace.span("template", template=match.name, confidence=match.confidence, slots=match.slots) as span:
+                execution = await run_blocking(run_template, db_pool, match, deadline.budget("execution"))
+                span.set(**execution_attrs(execution))
+            if has_rows(execution):
+                template = match.name
+                plan = match.plan
+                code_clean = match.render_code()
+                coder_inputs = {"plan": plan, "question": question}
+                code_memo = ("coder", coder, coder_inputs)
+                timings["execution"] = time.perf_counter() - stage_started
+                yield "plan", {"plan": plan}
+                yield "code", {"code": code_clean, "attempt": 1}
+            else:
+                print(f"   [Template] No rows ({execution.output[:80]!r}), falling back to the LLM pipeline")
+                execution = None
+
+        if template is None and plan_and_code:
+            # 1+2. Plan and code in one call; repairs still go to the Coder
+            print(f"🤔💻 Planning and coding: {question}")
+            selected, example_questions = await run_blocking(select_examples, question)
+            examples = format_examples(selected)
+            plan_coder_inputs = {"question": question, "schema": await run_blocking(schema_prompt, question), "examples": examples}
+            stage_started = time.perf_counter()
+            decision = route("plan_coder", question)
+            plan_coder = get_routed_chain(decision)
+            models["plan_coder"] = decision.model
+            with trace.span("plan_and_code", attempt=1, prompt_hash=stage_key("plan_coder", plan_coder, plan_coder_inputs),
+                            schema_chars=len(plan_coder_inputs["schema"]), examples=example_questions, **decision.to_dict()) as span:
+                raw = await deadline.run("code", memo_ainvoke("plan_coder", plan_coder, plan_coder_inputs))
+                plan, code_clean = parse_plan_and_code(raw)
+                code_clean = extract_code(code_clean)
+                span.set(code=code_clean)
+            code_memo = ("plan_coder", plan_coder, plan_coder_inputs)
+            coder_inputs = {"plan": plan, "question": question, "examples": examples}
+            timings["code"] += time.perf_counter() - stage_started
+            yield "plan", {"plan": plan}
+            yield "code", {"code": code_clean, "attempt": 1}
+
+        elif template is None:
+            # 1. Plan
+            print(f"🤔 Planning: {question}")
+            stage_started = time.perf_counter()
+            # Example retrieval only needs the question: run it alongside the Architect
+            examples_task = asyncio.create_task(run_blocking(select_examples, question))
+            architect_inputs = {"question": question, "schema": await run_blocking(schema_prompt, question)}
+            decision = route("architect", question)
+            architect = get_routed_chain(decision)
+            models["architect"] = decision.model
+            with trace.span("plan", prompt_hash=stage_key("architect", architect, architect_inputs),
+                            schema_chars=len(architect_inputs["schema"]), **decision.to_dict()):
+                plan = await deadline.run("plan", memo_ainvoke("architect", architect, architect_inputs))
+            timings["plan"] = time.perf_counter() - stage_started
+            yield "plan", {"plan": plan}
+
+            # 2. Code
+            print(f"💻 Coding...")
+            selected, example_questions = await examples_task
+            schema = await run_blocking(schema_prompt, question, plan)
+            coder_inputs = {"plan": plan, "question": question, "schema": schema, "examples": format_examples(selected)}
+            stage_started = time.perf_counter()
+            if sql_mode:
+                # One query, run without the sandbox; anything it can't answer falls through to the Python Coder
+                sql_inputs = {**coder_inputs, "examples": format_examples(selected, sql=True)}
+                decision = route("sql_coder", question, plan)
+                sql_coder = get_routed_chain(decision)
+                models["sql_coder"] = decision.model
+                with trace.span("sql_code", attempt=1, prompt_hash=stage_key("sql_coder", sql_coder, sql_inputs),
+                                schema_chars=len(schema), examples=example_questions, **decision.to_dict()) as span:
+                    answer = parse_sql_answer(await deadline.run("code", memo_ainvoke("sql_coder", sql_coder, sql_inputs)))
+                    if answer is None or answer.needs_python:
+                        reason = "needs Python" if answer else "no JSON answer"
+                    else:
+                        reason = await run_blocking(unsafe_reason, db_pool, answer.sql)
+                    span.set(sql=answer.sql if answer else None, params=answer.params if answer else None, fallback=reason)
+                    if not reason:
+                        span.set(code=answer.render_code())
+                if reason:
+                    print(f"   [SQL] Falling back to the Python Coder ({reason})")
+                    RETRIES.inc(kind="sql_fallback")
+                    await forget_stage("sql_coder", sql_coder, sql_inputs)
+                else:
+                    sql_answer = answer
+                    code_clean = sql_answer.render_code()
+                    code_memo = ("sql_coder", sql_coder, sql_inputs)
+
+            if sql_answer is None:
+                coder_route = route("coder", question, plan)
+                coder = get_routed_chain(coder_route)
+                models["coder"] = coder_route.model
+                with trace.span("code", attempt=1, prompt_hash=stage_key("coder", coder, coder_inputs),
+                                schema_chars=len(schema), examples=example_questions, **coder_route.to_dict()) as span:
+                    speculation = await deadline.run("code", speculate_code(coder_inputs, coder_route)) if speculative else None
+                    if speculation:
+                        # Candidates were generated and executed together; charge it all to "code"
+                        code_clean, execution = speculation
+                        span.set(speculative=True, **execution_attrs(execution))
+                    else:
+                        code_raw = await deadline.run("code", memo_ainvoke("coder", coder, coder_inputs))
+                        code_clean = extract_code(code_raw)
+                        execution = None
+                    span.set(code=code_clean)
+                code_memo = ("coder", coder, coder_inputs)
+            timings["code"] += time.perf_counter() - stage_started
+            yield "code", {"code": code_clean, "attempt": 1}
+
         # 3. Execute with Retry
         max_retries = 2
         attempt = 0
-        success = False
-        result_output = ""
-        
+        local_repairs = 0
+
         while attempt <= max_retries:
-            print(f"🐍 Executing (Attempt {attempt+1}/{max_retries+1})...")
-            result_output, success = execute_code(code_clean)
-            
+            issues = []
+            attempt_span = trace.span("execution", attempt=attempt + 1)
+            if execution is None:
+                # Catch hallucinated columns/tables before paying for a sandbox run
+                stage_started = time.perf_counter()
+                with attempt_span.span("validation") as span:
+                    if sql_answer:
+                        report = await run_blocking(validate_query, sql_answer)
+                    else:
+                        report = await run_blocking(validate_code, code_clean)
+                    if report:
+                        span.set(queries=report.queries, fixes=report.fixes, issues=[i.to_dict() for i in report.issues])
+                timings["validation"] += time.perf_counter() - stage_started
+                if report and report.fixes:
+                    print(f"   [Validator] Auto-fixed: {report.fixes}")
+                    RETRIES.inc(kind="sql_autofix")
+                    if sql_answer:
+                        sql_answer.sql = report.code
+                        code_clean = sql_answer.render_code()
+                    else:
+                        code_clean = report.code
+                    yield "code", {"code": code_clean, "attempt": attempt + 1, "fixes": report.fixes}
+                if report and not report.ok:
+                    print(f"   [Validator] Rejected: {[issue.describe() for issue in report.issues]}")
+                    issues = [issue.to_dict() for issue in report.issues]
+                    execution = ExecutionResult(output=report.error_output(), success=False)
+            if execution is None:
+                print(f"🐍 Executing (Attempt {attempt+1}/{max_retries+1})...")
+                stage_started = time.perf_counter()
+                try:
+                    if sql_answer:
+                        # SQL mode: straight to the read-only pool, which interrupts the query at the budget
+                        with attempt_span.span("sql") as span:
+                            execution = await deadline.run("execution", run_blocking(run_sql, db_pool, sql_answer, deadline.budget("execution")))
+                            span.set(**execution_attrs(execution))
+                    else:
+                        # Cancelling on the deadline interrupts the script's in-flight SQL
+                        with attempt_span.span("sandbox") as span:
+                            execution = await deadline.run("execution", execute_cancellable(code_clean))
+                            span.set(**execution_attrs(execution))
+                finally:
+                    timings["execution"] += time.perf_counter() - stage_started
+                    attempt_span.end()
+            attempt_span.set(**execution_attrs(execution))
+            attempt_span.end()
+            result_output, success = execution.output, execution.success
+            yield "execution", {"attempt": attempt + 1, "success": success, "output": result_output, "validation": issues}
+
             if success:
                 break
-            
+
+            if sql_answer:
+                # The failed query's Python rendering is repaired and re-run on the sandbox like any script
+                print(f"   [SQL] Query failed, continuing with the Python path")
+                RETRIES.inc(kind="sql_fallback")
+                sql_answer = None
+
+            # Known failure classes (fences, numpy params, dirty MIN, ambiguous columns) are fixed
+            # locally and re-run without another Coder round trip
+            if LOCAL_REPAIR_ENABLED and local_repairs < MAX_LOCAL_REPAIRS:
+                repaired = repair_code(code_clean, result_output)
+                if repaired:
+                    code_clean, repairs = repaired
+                    local_repairs += 1
+                    RETRIES.inc(kind="local_repair")
+                    execution = None
+                    print(f"   [Repair] Applied {repairs}, re-running without the Coder")
+                    trace.span("repair", repairs=repairs, code=code_clean).end()
+                    yield "code", {"code": code_clean, "attempt": attempt + 1, "repairs": repairs}
+                    continue
+
+            await forget_stage(*code_memo)
+
             attempt += 1
             if attempt <= max_retries:
                 print(f"⚠️ Runtime Error. Requesting Fix from Coder...")
+                RETRIES.inc(kind="coder")
                 error_hint = f"\n\nPREVIOUS CODE FAILED WITH ERROR:\n{result_output}\n\nFIX THE CODE. DO NOT REPEAT MISTAKES."
-                
-                # Ask Coder to Fix
-                code_raw = coder.invoke({
-                    "plan": plan, 
-                    "question": req.question + error_hint
-                })
-                
-                # Extract
-                match = re.search(r"```python(.*?)```", code_raw, re.DOTALL)
-                if match:
-                    code_clean = match.group(1).strip()
-                else:
-                    code_clean = code_raw.replace("```python", "").replace("```", "").strip()
-        
+
+                # Ask Coder to Fix (on the large model if the small one wrote the failing code)
+                # The full schema: the failing script may have needed a column the pruned one left out
+                coder_inputs = {
+                    "plan": plan,
+                    "question": question + error_hint,
+                    "schema": await run_blocking(schema_prompt),
+                    "examples": coder_inputs.get("examples") or default_examples(),
+                }
+                coder_route = escalate(coder_route) if coder_route else route("coder", question, plan)
+                coder = get_routed_chain(coder_route)
+                models["coder"] = coder_route.model
+                stage_started = time.perf_counter()
+                with trace.span("code", attempt=attempt + 1, prompt_hash=stage_key("coder", coder, coder_inputs), **coder_route.to_dict()) as span:
+                    code_raw = await deadline.run("code", memo_ainvoke("coder", coder, coder_inputs))
+                    code_clean = extract_code(code_raw)
+                    span.set(code=code_clean)
+                code_memo = ("coder", coder, coder_inputs)
+                timings["code"] += time.perf_counter() - stage_started
+                execution = None
+                yield "code", {"code": code_clean, "attempt": attempt + 1}
+
+        # Structured result: first page for the client, capped summary for the Analyst
+        analyst_answer = result_output
+        if success and execution.table is not None:
+            result_id = result_store.put(execution.table)
+            table_page = to_columnar(execution.table, 0, PAGE_SIZE)
+            analyst_answer = summarize_table(execution.table)
+
+        display = sql_answer.display if success and sql_answer else None
+        yield "result", {"result": result_output, "success": success, "table": table_page, "result_id": result_id, "display": display}
+
         # 4. Analyst Augmentation
         print(f"🎙️ Analyzing...")
-        narrative = ""
         if success:
-            rag_context = retrieve_rag_context(req.question)
+            stage_started = time.perf_counter()
+            analyst_span = trace.span("analyst")
+            if rag_task:
+                with analyst_span.span("rag_wait"):
+                    rag_context, timings["rag"] = await deadline.run("analyst", rag_task)
+                timings["rag_wait"] = time.perf_counter() - stage_started
             print(f"   [RAG] Content Length: {len(rag_context)}")
-            
+
+            analyst_inputs = {
+                "question": question,
+                "answer": analyst_answer,
+                "context": rag_context
+            }
+            decision = route("analyst", question)
+            analyst = get_routed_chain(decision)
+            models["analyst"] = decision.model
+            analyst_span.set(prompt_hash=stage_key("analyst", analyst, analyst_inputs), **decision.to_dict())
             try:
-                narrative = analyst.invoke({
-                    "question": req.question,
-                    "answer": result_output,
-                    "context": rag_context
-                })
+                # Stream tokens so the UI can render the story as it is written
+                async for token in deadline.stream("analyst", memo_astream("analyst", analyst, analyst_inputs)):
+                    narrative += token
+                    yield "narrative", {"token": token}
                 print(f"   [Analyst] Output Length: {len(narrative)}")
-                
+
                 if not narrative.strip():
                      narrative = "The Analyst Agent returned no narrative. Check terminal logs."
+            except StageTimeout as e:
+                analyst_span.set(error=str(e))
+                raise
             except Exception as e:
                 print(f"   [Analyst] Error: {e}")
                 narrative = f"Analyst Error: {e}"
-            
-        return QueryResponse(
-            plan=plan,
-            code=code_clean,
-            result=result_output,
-            narrative=narrative,
-            success=success
-        )
+                analyst_failed = True
+                analyst_span.set(error=str(e))
+            finally:
+                timings["analyst"] = time.perf_counter() - stage_started - timings["rag_wait"]
+                analyst_span.set(narrative_chars=len(narrative))
+                analyst_span.end()
+        elif rag_task:
+            rag_task.cancel()
+    except StageTimeout as e:
+        # Partial response: whatever finished before the deadline, plus the stage that ran out
+        timed_out_stage = e.stage
+        if e.stage in ("plan", "code"):
+            # Execution and the Analyst record their time in a finally; these stop at the await
+            timings[e.stage] += time.perf_counter() - stage_started
+        print(f"⏰ {e}")
+        if rag_task:
+            rag_task.cancel()
+        if e.stage == "analyst":
+            narrative = (narrative + "\n\n" if narrative else "") + f"[{e}]"
+        else:
+            success = False
+            result_output = f"{result_output}\n{e}".strip() if e.stage == "execution" else str(e)
+            yield "result", {"result": result_output, "success": False, "table": None, "result_id": None}
+
+    timings["total"] = time.perf_counter() - started
+    timings = {stage: round(seconds, 4) for stage, seconds in timings.items()}
+    print(f"⏱️ Timings: {timings}")
+    for stage, seconds in timings.items():
+        if seconds > 0:  # stages that didn't run (template route, failed execution) aren't observed
+            STAGE_SECONDS.observe(seconds, stage=stage)
+    REQUESTS.inc(route="template" if template else "llm",
+                 outcome="timeout" if timed_out_stage else ("success" if success else "failure"))
+    observe_first_request(timings["total"])
+        
+    response = QueryResponse(
+        plan=plan,
+        code=code_clean,
+        result=result_output,
+        narrative=narrative,
+        success=success,
+        table=table_page,
+        result_id=result_id,
+        timings=timings,
+        template=template,
+        timed_out_stage=timed_out_stage,
+        display=display
+    ).model_dump()
+    yield "done", response
+
+    record_trace(
+        trace,
+        route="template" if template else "llm",
+        success=success,
+        cached=False,
+        template=template,
+        timed_out_stage=timed_out_stage,
+        attempts=sum(1 for span in trace.root.children if span.name == "execution"),
+        rows=table_page["total_rows"] if table_page else None,
+        models=models,
+        timings=timings,
+    )
+
+    if cache and not analyst_failed and not timed_out_stage:
+        # result_id points into this process's in-memory store, so it is not cached
+        run_in_background(cache.store, question, {**response, "result_id": None})
+
+    if FEW_SHOT_LEARN and template is None and success and table_page and table_page["total_rows"]:
+        # Code that ran and returned rows becomes an example for similar questions
+        run_in_background(learn_example, question, code_clean)
+
+@app.get("/api/results/{result_id}")
+def get_result_page(result_id: str, offset: int = 0, limit: int = PAGE_SIZE, format: str = "json"):
+    """
+    Server-side pagination over a stored result. format=arrow returns an Arrow IPC stream.
+    """
+    table = result_store.get(result_id)
+    if table is None:
+        raise HTTPException(status_code=404, detail="Result expired or not found.")
+    offset = max(offset, 0)
+    limit = max(min(limit, 10000), 1)
+    if format == "arrow":
+        return Response(content=to_arrow_ipc(table, offset, limit), media_type=ARROW_MEDIA_TYPE)
+    return to_columnar(table, offset, limit)
 
+@app.get("/api/cache/stats")
+def cache_stats():
+    answers = get_answer_cache()
+    stages = get_stage_cache()
+    try:
+        examples = get_example_store()
+        example_stats = examples.stats() if examples else {"enabled": False}
     except Exception as e:
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
+        example_stats = {"enabled": False, "error": str(e)}
+    return {
+        "answers": answers.stats() if answers else {"enabled": False},
+        "stages": stages.stats() if stages else {"enabled": False},
+        "examples": example_stats,
+    }
+
+@app.get("/api/validation/stats")
+def validation_stats():
+    checker = get_validator()
+    return checker.stats() if checker else {"enabled": False}
+
+@app.get("/metrics")
+def metrics():
+    """
+    Prometheus text exposition of the counters and histograms in utils/metrics.py.
+    """
+    return Response(content=REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
 
 @app.get("/health")
 def health():
-    return {"status": "ok", "db": os.path.exists("nba.duckdb")}
+    """
+    Liveness plus readiness: each component's warm state (and warm-up time/error, if it ran).
+    Always 200; "ready" is true once DuckDB, Chroma, the chains and every model in use are warm.
+    """
+    components = {name: dict(state) for name, state in readiness.items()}
+    llm = sys.modules.get("utils.llm")  # not imported yet = no model has been used
+    warm = llm.warm_models if llm else set()
+    components["llm"]["models"] = {model: model in warm for model in models_in_use()}
+    components["llm"]["ready"] = all(components["llm"]["models"].values())
+    db = os.path.exists("nba.duckdb")
+    ready = db and all(state["ready"] for state in components.values())
+    return {
+        "status": "ok" if ready else ("degraded" if not db else "starting"),
+        "ready": ready,
+        "db": db,
+        "warmup": "disabled" if not WARMUP_ENABLED else ("done" if warmup_task and warmup_task.done() else "running"),
+        "components": components,
+    }
+
+# Everything above is what every cold start pays before the server can accept a request
+STARTUP_SECONDS.set(round(time.perf_counter() - IMPORT_STARTED, 4), phase="import")
 
 if __name__ == "__main__":
     import uvicorn
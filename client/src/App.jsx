@@ -6,14 +6,49 @@ function App() {
   const [result, setResult] = useState(null)
   const [error, setError] = useState(null)
 
+  const [stage, setStage] = useState(null)
+
+  // Applies one Server-Sent Event from /api/query/stream to the partial result
+  const applyEvent = (event, data) => {
+    switch (event) {
+      case 'plan':
+        setStage('Writing Code...')
+        setResult(prev => ({ ...prev, plan: data.plan }))
+        break
+      case 'code':
+        setStage(data.attempt > 1 ? `Fixing Code (Attempt ${data.attempt})...` : 'Executing Code...')
+        setResult(prev => ({ ...prev, code: data.code }))
+        break
+      case 'execution':
+        setResult(prev => ({ ...prev, result: data.output, success: data.success }))
+        break
+      case 'result':
+        setStage(data.success ? 'Writing Narrative...' : null)
+        setResult(prev => ({ ...prev, result: data.result, success: data.success, table: data.table, result_id: data.result_id }))
+        break
+      case 'narrative':
+        setResult(prev => ({ ...prev, narrative: (prev.narrative || '') + data.token }))
+        break
+      case 'done':
+        setResult(data)
+        if (data.timed_out_stage) setError(`Request timed out during ${data.timed_out_stage}. Showing partial results.`)
+        break
+      case 'error':
+        throw new Error(data.detail)
+      default:
+        break
+    }
+  }
+
   const handleQuery = async () => {
     if (!question.trim()) return
     setLoading(true)
     setError(null)
-    setResult(null)
+    setResult({ plan: '', code: '', result: '', narrative: '', success: true })
+    setStage('Architecting Solution...')
 
     try {
-      const response = await fetch('http://localhost:8000/api/query', {
+      const response = await fetch('http://localhost:8000/api/query/stream', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ question }),
@@ -23,15 +58,47 @@ function App() {
         throw new Error('Failed to execute query')
       }
 
-      const data = await response.json()
-      setResult(data)
+      // SSE frames are separated by a blank line: "event: <name>\ndata: <json>\n\n"
+      const reader = response.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ''
+      while (true) {
+        const { value, done } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+        const frames = buffer.split('\n\n')
+        buffer = frames.pop()
+        for (const frame of frames) {
+          const event = frame.match(/^event: (.*)$/m)?.[1]
+          const data = frame.match(/^data: (.*)$/m)?.[1]
+          if (event && data) applyEvent(event, JSON.parse(data))
+        }
+      }
     } catch (err) {
       setError(err.message)
+      setResult(null)
     } finally {
       setLoading(false)
+      setStage(null)
     }
   }
 
+  // Fetch the next page of a stored result (server-side pagination)
+  const loadMoreRows = async () => {
+    const { table, result_id } = result
+    const offset = table.offset + table.data[table.columns[0].name].length
+    const response = await fetch(`http://localhost:8000/api/results/${result_id}?offset=${offset}&limit=${table.limit}`)
+    if (!response.ok) return
+    const page = await response.json()
+    setResult(prev => ({
+      ...prev,
+      table: {
+        ...prev.table,
+        data: Object.fromEntries(prev.table.columns.map(c => [c.name, [...prev.table.data[c.name], ...page.data[c.name]]])),
+      },
+    }))
+  }
+
   // Handle Enter key
   const handleKeyDown = (e) => {
     if (e.key === 'Enter') handleQuery()
@@ -110,9 +177,37 @@ function App() {
           {result.narrative && result.success && (
             <div className="card" style={{ opacity: 0.9 }}>
               <h3 style={{ marginTop: 0, color: '#94A3B8', fontSize: '1rem' }}>🔢 Raw Data Source</h3>
-              <pre style={{ background: '#0F172A', padding: '1rem', borderRadius: '8px', fontSize: '0.9rem', color: '#CBD5E1', overflowX: 'auto' }}>
-                {result.result}
-              </pre>
+              {result.table ? (
+                <div style={{ overflowX: 'auto' }}>
+                  <table style={{ width: '100%', borderCollapse: 'collapse', fontSize: '0.9rem', color: '#CBD5E1' }}>
+                    <thead>
+                      <tr>
+                        {result.table.columns.map(c => (
+                          <th key={c.name} style={{ textAlign: 'left', padding: '0.5rem', borderBottom: '1px solid #334155' }}>{c.name}</th>
+                        ))}
+                      </tr>
+                    </thead>
+                    <tbody>
+                      {result.table.data[result.table.columns[0].name].map((_, i) => (
+                        <tr key={i}>
+                          {result.table.columns.map(c => (
+                            <td key={c.name} style={{ padding: '0.5rem', borderBottom: '1px solid #1E293B' }}>{String(result.table.data[c.name][i] ?? '')}</td>
+                          ))}
+                        </tr>
+                      ))}
+                    </tbody>
+                  </table>
+                  {result.result_id && result.table.data[result.table.columns[0].name].length < result.table.total_rows && (
+                    <button onClick={loadMoreRows} style={{ marginTop: '1rem' }}>
+                      Load More ({result.table.data[result.table.columns[0].name].length} of {result.table.total_rows} rows)
+                    </button>
+                  )}
+                </div>
+              ) : (
+                <pre style={{ background: '#0F172A', padding: '1rem', borderRadius: '8px', fontSize: '0.9rem', color: '#CBD5E1', overflowX: 'auto' }}>
+                  {result.result}
+                </pre>
+              )}
             </div>
           )}
 
@@ -174,10 +269,10 @@ function App() {
         </div>
       )}
 
-      {loading && (
+      {loading && stage && (
         <div style={{ textAlign: 'center', color: '#64748B', marginTop: '4rem' }}>
           <div className="loader" style={{ margin: '0 auto 1rem auto' }}></div>
-          <p>Architecting Solution...</p>
+          <p>{stage}</p>
         </div>
       )}
     </div>
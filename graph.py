@@ -17,12 +17,35 @@ class AgentState(TypedDict):
     jury_engagement_score: int
     jury_detailed_results: dict
 
+# Chains are built once and reused by every writer/jury call (they share the pooled LLM client)
+writer_chain = None
+jurors = None
+
+def get_writer():
+    global writer_chain
+    if writer_chain is None:
+        writer_chain = get_writer_chain()
+    return writer_chain
+
+def get_jurors():
+    global jurors
+    if jurors is None:
+        jurors = {
+            "fact": get_fact_checker(),
+            "bias": get_bias_watchdog(),
+            "safety": get_brand_safety(),
+            "editor": get_editor_in_chief(),
+            "seo": get_seo_strategist(),
+            "engagement": get_engagement_editor(),
+        }
+    return jurors
+
 def writer_node(state: AgentState):
     # RED TEAM BYPASS
     if state.get("force_draft"):
         return {"draft": state['force_draft'], "revision_count": state.get("revision_count", 0) + 1}
 
-    chain = get_writer_chain()
+    chain = get_writer()
     input_text = state['input_stats']
     
     # Append feedback if retrying
@@ -36,43 +59,44 @@ def writer_node(state: AgentState):
 def jury_node(state: AgentState):
     draft = state['draft']
     stats = state['input_stats']
+    jury = get_jurors()
     
     # --- STANDARDS DIVISION (Veto Power) ---
     # 1. Fact Check
     try:
-        fact_res = get_fact_checker().invoke({"stats": stats, "draft": draft})
+        fact_res = jury["fact"].invoke({"stats": stats, "draft": draft})
     except:
         fact_res = {"status": "FAIL", "errors": ["Fact check parsing error"]}
 
     # 2. Bias Check
     try:
-        bias_res = get_bias_watchdog().invoke({"draft": draft})
+        bias_res = jury["bias"].invoke({"draft": draft})
     except:
         bias_res = {"status": "FAIL", "issues": ["Bias check parsing error"]}
         
     # 3. Brand Safety (New)
     try:
-        safety_res = get_brand_safety().invoke({"draft": draft})
+        safety_res = jury["safety"].invoke({"draft": draft})
     except:
         safety_res = {"status": "PASS", "flags": ["Safety check error"]} 
 
     # --- EDITORIAL DIVISION ---
     # 4. Editor-in-Chief
     try:
-        editor_res = get_editor_in_chief().invoke({"draft": draft})
+        editor_res = jury["editor"].invoke({"draft": draft})
     except:
         editor_res = {"status": "PASS", "score": 5, "feedback": "Editor check failed"}
 
     # --- GROWTH DIVISION ---
     # 5. SEO Strategist (New)
     try:
-        seo_res = get_seo_strategist().invoke({"draft": draft})
+        seo_res = jury["seo"].invoke({"draft": draft})
     except:
         seo_res = {"score": 50, "suggestions": ["SEO check failed"]}
 
     # 6. Engagement Editor (New)
     try:
-        engage_res = get_engagement_editor().invoke({"draft": draft})
+        engage_res = jury["engagement"].invoke({"draft": draft})
     except:
         engage_res = {"score": 5, "critique": "Engagement check failed"}
 
@@ -1,37 +1,26 @@
 import sys
 from agents.architect import get_architect_chain
 from agents.coder import get_coder_chain
-import duckdb
-import io
-import contextlib
+from utils.sandbox import SandboxPool
 
-def execute_code(code):
+def execute_code(pool, code):
     print("\n🐍 EXECUTING CODE...")
-    # Clean code markdown
-    code = code.replace("```python", "").replace("```", "").strip()
-    
-    # Capture stdout
-    f = io.StringIO()
-    with contextlib.redirect_stdout(f):
-        try:
-            exec(code, {'duckdb': duckdb})
-            success = True
-        except Exception as e:
-            print(f"Runtime Error: {e}")
-            success = False
-            
-    output = f.getvalue()
-    return output, success
+    result = pool.run(code)
+    return result.output, result.success
 
 def main():
     print("🏀 Deep Stat AI: Ready for Queries (Type 'exit' to quit)")
     
     architect = get_architect_chain()
     coder = get_coder_chain()
+    pool = SandboxPool(size=1)
+    pool.start()
     
     while True:
         q = input("\nQuery: ")
-        if q.lower() in ['exit', 'quit']: break
+        if q.lower() in ['exit', 'quit']:
+            pool.shutdown()
+            break
         
         print("\n🤔 Architecting Plan...")
         plan = architect.invoke({"question": q})
@@ -41,7 +30,7 @@ def main():
         code = coder.invoke({"plan": plan, "question": q})
         print(f"CODE:\n{code}")
         
-        result, success = execute_code(code)
+        result, success = execute_code(pool, code)
         
         print("\n📊 RESULT:")
         print(result)
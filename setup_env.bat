@@ -25,7 +25,7 @@ if not exist "venv" (
 :: 3. Install Dependencies
 echo [INFO] Installing requirements...
 call venv\Scripts\activate
-pip install duckdb chromadb pandas sentence-transformers langchain langchain-community langchain-core langchain-ollama fastapi uvicorn tabulate
+pip install duckdb pyarrow chromadb pandas sentence-transformers langchain langchain-community langchain-core langchain-ollama fastapi uvicorn tabulate
 if %errorlevel% neq 0 (
     echo [ERROR] Dependency installation failed!
     pause
@@ -0,0 +1,59 @@
+import requests
+import json
+import time
+import sys
+
+URL = "http://localhost:8000/api/query"
+BATCH_URL = "http://localhost:8000/api/query/batch"
+
+# A nightly-report style workload: a few question shapes, with repeats
+QUESTIONS = [
+    "Who won the 2016 NBA Championship?",
+    "Who had the most points in 2016?",
+    "Compare LeBron James and Stephen Curry",
+    "Who is the best defender in history?",
+    "Who won the 2016 NBA championship",
+    "Who had the most assists in 2015?",
+]
+
+def run_loop(questions):
+    start = time.time()
+    ok = 0
+    for q in questions:
+        res = requests.post(URL, json={"question": q})
+        ok += res.status_code == 200 and res.json().get("success", False)
+    return time.time() - start, ok
+
+def run_batch(questions, concurrency=None):
+    start = time.time()
+    ok = 0
+    summary = None
+    with requests.post(BATCH_URL, json={"questions": questions, "concurrency": concurrency}, stream=True) as res:
+        for line in res.iter_lines():
+            if not line:
+                continue
+            row = json.loads(line)
+            if "summary" in row:
+                summary = row["summary"]
+                continue
+            ok += bool(row["response"] and row["response"]["success"])
+            print(f"   [{time.time() - start:6.2f}s] #{row['index']} {row['question']}")
+    return time.time() - start, ok, summary
+
+if __name__ == "__main__":
+    # Usage: python tests/bench_batch.py [repeat] [concurrency]
+    # Note: run with DEEPSTAT_CACHE_ENABLED=0 DEEPSTAT_STAGE_CACHE_ENABLED=0 on the server
+    # for a cold comparison; otherwise the second run benefits from the first run's caches.
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    questions = QUESTIONS * repeat
+
+    print(f"--- Loop over /api/query ({len(questions)} questions) ---")
+    loop_time, loop_ok = run_loop(questions)
+    print(f"✅ {loop_ok}/{len(questions)} succeeded in {loop_time:.2f}s ({len(questions) / (loop_time / 60):.1f} q/min)")
+
+    print(f"\n--- /api/query/batch ({len(questions)} questions) ---")
+    batch_time, batch_ok, summary = run_batch(questions, concurrency)
+    print(f"✅ {batch_ok}/{len(questions)} succeeded in {batch_time:.2f}s ({len(questions) / (batch_time / 60):.1f} q/min)")
+    print(f"Summary: {summary}")
+    print(f"Speedup: {loop_time / batch_time:.2f}x")
@@ -0,0 +1,70 @@
+import requests
+import threading
+import time
+import sys
+
+URL = "http://localhost:8000/api/query"
+HEALTH_URL = "http://localhost:8000/health"
+
+QUESTIONS = [
+    "Who won the 2016 NBA Championship?",
+    "Who had the most points in 2016?",
+    "Compare LeBron James and Stephen Curry",
+    "Who is the best defender in history?",
+]
+
+def timed_query(question, results, idx):
+    start = time.time()
+    try:
+        res = requests.post(URL, json={"question": question})
+        ok = res.status_code == 200
+    except Exception as e:
+        print(f"❌ Connection Error: {e}")
+        ok = False
+    results[idx] = (question, time.time() - start, ok)
+
+def probe_health(stop, latencies):
+    # /health must keep answering while queries are in flight.
+    while not stop.is_set():
+        start = time.time()
+        try:
+            requests.get(HEALTH_URL, timeout=30)
+            latencies.append(time.time() - start)
+        except Exception:
+            latencies.append(float("inf"))
+        time.sleep(0.5)
+
+def bench(concurrency):
+    questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(concurrency)]
+    results = [None] * concurrency
+    health_latencies = []
+    stop = threading.Event()
+
+    prober = threading.Thread(target=probe_health, args=(stop, health_latencies))
+    prober.start()
+
+    start = time.time()
+    threads = [threading.Thread(target=timed_query, args=(q, results, i)) for i, q in enumerate(questions)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    wall = time.time() - start
+
+    stop.set()
+    prober.join()
+
+    serial_estimate = sum(r[1] for r in results)
+    print(f"\n--- Concurrency {concurrency} ---")
+    for question, duration, ok in results:
+        print(f"{'✅' if ok else '❌'} {duration:6.2f}s  {question}")
+    print(f"Wall Clock:       {wall:.2f}s")
+    print(f"Sum of Latencies: {serial_estimate:.2f}s")
+    # 1.0 means the requests ran one after another; N means N requests fully overlapped.
+    print(f"Overlap Factor:   {serial_estimate / wall:.2f}x")
+    if health_latencies:
+        print(f"/health max latency while busy: {max(health_latencies):.3f}s ({len(health_latencies)} probes)")
+
+if __name__ == "__main__":
+    # Usage: python tests/bench_concurrency.py [concurrency]
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    bench(1)
+    bench(concurrency)
@@ -0,0 +1,236 @@
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+
+# Run from the project root, like the other tests/ scripts
+sys.path.append(os.getcwd())
+from utils.metrics import percentile
+
+# Load Test Harness
+# Replays a question corpus against a running api.py at a given concurrency and arrival rate,
+# then reports latency percentiles, throughput, error rate and per-stage timings. Results are
+# written as JSON so two builds can be compared with --compare. Only talks to the local server.
+BASE_URL = "http://localhost:8000"
+
+QUESTIONS = [
+    "Who won the 2016 NBA Championship?",
+    "Who had the most points in 2016?",
+    "Compare LeBron James and Stephen Curry",
+    "Who is the best defender in history?",
+    "Best rookie seasons by points",
+    "Who had the most assists in 2015?",
+    "Who had the best carry job in the playoffs?",
+    "Top 5 rebounders in the 2015 playoffs",
+]
+
+STAGES = ["plan", "code", "validation", "execution", "rag_wait", "analyst", "total"]
+
+def load_corpus(path):
+    """
+    Questions from a .jsonl file (trace lines or any objects with a "question" field,
+    e.g. logs/traces.jsonl) or a plain text file with one question per line.
+    """
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, dict) and record.get("question"):
+                    questions.append(record["question"])
+            else:
+                questions.append(line)
+    return questions
+
+def summarize(values):
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 4),
+        "p50": round(percentile(values, 50), 4),
+        "p95": round(percentile(values, 95), 4),
+        "p99": round(percentile(values, 99), 4),
+        "max": round(max(values), 4),
+    }
+
+def send(url, question, deadline, scheduled):
+    """
+    One request. With an arrival rate, latency counts from the scheduled arrival time (so queueing
+    behind the concurrency limit is not hidden); service always counts from the moment it was sent.
+    """
+    sent = time.perf_counter()
+    scheduled = sent if scheduled is None else scheduled
+    row = {"question": question, "queued": round(sent - scheduled, 4)}
+    payload = {"question": question}
+    if deadline is not None:
+        payload["deadline_seconds"] = deadline
+    try:
+        res = requests.post(url, json=payload, timeout=600)
+        row["status"] = res.status_code
+        if res.status_code == 200:
+            data = res.json()
+            row["success"] = bool(data.get("success"))
+            row["route"] = "cache" if data.get("cached") else ("template" if data.get("template") else "llm")
+            row["timed_out_stage"] = data.get("timed_out_stage")
+            row["timings"] = data.get("timings") or {}
+        else:
+            row["error"] = res.text[:200]
+    except requests.RequestException as e:
+        row["status"] = None
+        row["error"] = str(e)[:200]
+    done = time.perf_counter()
+    row["service"] = round(done - sent, 4)
+    row["latency"] = round(done - scheduled, 4)
+    return row
+
+def run_load(questions, url, requests_total, concurrency, rate, poisson, deadline, shuffle):
+    order = list(questions)
+    if shuffle:
+        random.shuffle(order)
+    schedule = [order[i % len(order)] for i in range(requests_total)]
+
+    rows = []
+    lock = threading.Lock()
+    started = time.perf_counter()
+
+    def job(question, scheduled):
+        row = send(url, question, deadline, scheduled)
+        with lock:
+            rows.append(row)
+            done = len(rows)
+        mark = "✅" if row.get("success") else "❌"
+        print(f"   [{time.perf_counter() - started:7.2f}s] {done}/{requests_total} {mark} {row['latency']:.2f}s {question[:60]}")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        next_arrival = started
+        for question in schedule:
+            if rate:
+                # Open loop: arrivals follow the configured rate whether or not earlier requests finished
+                gap = random.expovariate(rate) if poisson else 1.0 / rate
+                next_arrival += gap
+                delay = next_arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                scheduled = next_arrival
+            else:
+                # Closed loop: as fast as the concurrency limit allows (each worker sends as soon as it is free)
+                scheduled = None
+            pool.submit(job, question, scheduled)
+
+    return rows, time.perf_counter() - started
+
+def build_report(rows, duration, config):
+    ok = [r for r in rows if r.get("status") == 200]
+    errors = [r for r in rows if r.get("status") != 200]
+    failures = [r for r in ok if not r.get("success")]
+    routes = {}
+    for r in ok:
+        routes[r["route"]] = routes.get(r["route"], 0) + 1
+    stages = {}
+    for stage in STAGES:
+        values = [r["timings"][stage] for r in ok if r["timings"].get(stage)]
+        if values:
+            stages[stage] = summarize(values)
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": config,
+        "requests": len(rows),
+        "duration": round(duration, 2),
+        "throughput_rps": round(len(rows) / duration, 4) if duration > 0 else None,
+        "questions_per_minute": round(len(rows) / (duration / 60), 2) if duration > 0 else None,
+        "error_rate": round(len(errors) / len(rows), 4) if rows else None,
+        "failure_rate": round(len(failures) / len(ok), 4) if ok else None,
+        "timeouts": sum(1 for r in ok if r.get("timed_out_stage")),
+        "routes": routes,
+        "latency": summarize([r["latency"] for r in rows]),
+        "service": summarize([r["service"] for r in rows]),
+        "stages": stages,
+    }
+
+def print_report(report):
+    lat = report["latency"]
+    print(f"\n--- {report['requests']} requests in {report['duration']:.2f}s ---")
+    print(f"Throughput: {report['throughput_rps']} req/s ({report['questions_per_minute']} q/min)")
+    print(f"Error rate: {report['error_rate']}  Failure rate: {report['failure_rate']}  Timeouts: {report['timeouts']}")
+    print(f"Routes: {report['routes']}")
+    if lat["count"]:
+        print(f"Latency: p50 {lat['p50']}s  p95 {lat['p95']}s  p99 {lat['p99']}s  max {lat['max']}s")
+    for stage, stats in report["stages"].items():
+        print(f"   {stage:<10} p50 {stats['p50']:>8}s  p95 {stats['p95']:>8}s  p99 {stats['p99']:>8}s")
+
+def compare(report, baseline):
+    """
+    Prints this run against a previous results file (old -> new, with the relative change).
+    """
+    def delta(new, old):
+        if new is None or old is None:
+            return "n/a"
+        change = f"{(new - old) / old * 100:+.1f}%" if old else ""
+        return f"{old} -> {new} {change}"
+
+    print(f"\n--- Compared with baseline ({baseline.get('timestamp')}) ---")
+    for key in ("p50", "p95", "p99"):
+        print(f"Latency {key}: {delta(report['latency'].get(key), baseline['latency'].get(key))}")
+    print(f"Throughput (req/s): {delta(report['throughput_rps'], baseline.get('throughput_rps'))}")
+    print(f"Error rate: {delta(report['error_rate'], baseline.get('error_rate'))}")
+    for stage, stats in report["stages"].items():
+        old = baseline.get("stages", {}).get(stage)
+        if old:
+            print(f"   {stage:<10} p95: {delta(stats['p95'], old.get('p95'))}")
+
+if __name__ == "__main__":
+    # Usage: python tests/bench_load.py --corpus logs/traces.jsonl --concurrency 4 --rate 0.5 --out load.json
+    #        python tests/bench_load.py --requests 20 --compare load.json
+    parser = argparse.ArgumentParser(description="Replay questions against a running Deep Stat AI server.")
+    parser.add_argument("--url", default=BASE_URL)
+    parser.add_argument("--endpoint", default="/api/query")
+    parser.add_argument("--corpus", help=".jsonl (traces or {\"question\": ...} lines) or .txt (one question per line)")
+    parser.add_argument("--requests", type=int, help="Total requests (default: one pass over the corpus)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum requests in flight")
+    parser.add_argument("--rate", type=float, default=0, help="Arrival rate in requests/second (0 = closed loop)")
+    parser.add_argument("--poisson", action="store_true", help="Exponential inter-arrival times instead of a fixed interval")
+    parser.add_argument("--deadline", type=float, help="deadline_seconds sent with each request")
+    parser.add_argument("--shuffle", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write the report (and per-request rows) to this JSON file")
+    parser.add_argument("--compare", help="Previous --out file to compare against")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    questions = load_corpus(args.corpus) if args.corpus else QUESTIONS
+    if not questions:
+        sys.exit(f"No questions found in {args.corpus}")
+    total = args.requests or len(questions)
+    config = {
+        "endpoint": args.endpoint, "corpus": args.corpus or "built-in", "requests": total,
+        "concurrency": args.concurrency, "rate": args.rate, "poisson": args.poisson, "deadline": args.deadline,
+    }
+    print(f"--- Replaying {total} requests ({len(questions)} distinct questions) at concurrency {args.concurrency}"
+          f"{f', {args.rate} req/s' if args.rate else ''} ---")
+
+    rows, duration = run_load(questions, args.url.rstrip("/") + args.endpoint, total, args.concurrency,
+                              args.rate, args.poisson, args.deadline, args.shuffle)
+    report = build_report(rows, duration, config)
+    print_report(report)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({**report, "rows": rows}, f, indent=2)
+        print(f"\n📝 Results written to {args.out}")
@@ -0,0 +1,67 @@
+import requests
+import time
+import sys
+import os
+
+# Run from the project root, like the other tests/ scripts
+sys.path.append(os.getcwd())
+from utils.metrics import percentile
+
+URL = "http://localhost:8000/api/query"
+
+# Questions that go through the Architect/Coder (no SQL template covers them)
+QUESTIONS = [
+    "Who won the 2008 Championship?",
+    "Compare LeBron James and Stephen Curry",
+    "Who is the best defender in history?",
+    "Best rookie seasons by points",
+    "Which player improved the most in the 2016 playoffs compared to the regular season?",
+    "Which team had the longest winning streak in 2015?",
+]
+
+def run_mode(questions, plan_and_code):
+    rows = []
+    for q in questions:
+        start = time.time()
+        res = requests.post(URL, json={"question": q, "plan_and_code": plan_and_code})
+        elapsed = time.time() - start
+        body = res.json() if res.status_code == 200 else {}
+        timings = body.get("timings", {})
+        rows.append({
+            "question": q,
+            "success": bool(body.get("success")),
+            "latency": elapsed,
+            "to_code": timings.get("plan", 0) + timings.get("code", 0),  # seconds until the first script exists
+            "skipped": bool(body.get("cached") or body.get("template")),
+        })
+        print(f"   [{elapsed:6.2f}s] {'✅' if rows[-1]['success'] else '❌'} {q}")
+    return rows
+
+def report(name, rows):
+    measured = [r for r in rows if not r["skipped"]]
+    latencies = [r["latency"] for r in measured]
+    ok = sum(r["success"] for r in measured)
+    print(f"{name:<14} {ok}/{len(measured)} succeeded ({ok / max(len(measured), 1):.0%})"
+          f" | mean {sum(latencies) / max(len(latencies), 1):.2f}s p50 {percentile(latencies, 50, 0.0):.2f}s p95 {percentile(latencies, 95, 0.0):.2f}s"
+          f" | to code {sum(r['to_code'] for r in measured) / max(len(measured), 1):.2f}s")
+    if len(measured) < len(rows):
+        print(f"{'':<14} ({len(rows) - len(measured)} cached/template answers left out)")
+    return latencies
+
+if __name__ == "__main__":
+    # Usage: python tests/bench_plan_and_code.py [repeat]
+    # Note: run with DEEPSTAT_CACHE_ENABLED=0 DEEPSTAT_STAGE_CACHE_ENABLED=0 on the server,
+    # otherwise the second mode is answered from the first mode's caches.
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    questions = QUESTIONS * repeat
+
+    print(f"--- Two calls: Architect + Coder ({len(questions)} questions) ---")
+    two_call = run_mode(questions, False)
+    print(f"\n--- One call: Planner-Coder ({len(questions)} questions) ---")
+    one_call = run_mode(questions, True)
+
+    print()
+    two = report("two-call", two_call)
+    one = report("plan-and-code", one_call)
+    if one and two:
+        print(f"Speedup (mean): {(sum(two) / len(two)) / (sum(one) / len(one)):.2f}x")
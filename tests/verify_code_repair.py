@@ -0,0 +1,50 @@
+import ast
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.append(os.getcwd())
+
+from utils.code_repair import repair_code
+
+MIN_ERROR = "RUNTIME ERROR: Conversion Error: Could not convert string '34:12' to INT32"
+AMBIGUOUS_ERROR = 'RUNTIME ERROR: Binder Error: Ambiguous reference to column name "GAME_ID" (use: "gs.GAME_ID" or "g.GAME_ID")'
+NUMPY_ERROR = "RUNTIME ERROR: Not implemented Error: Unable to transform python value of type <class 'numpy.int64'>"
+
+# Non-ASCII names shift AST byte columns away from character offsets
+PLAYERS = ["Nikola Jokic", "Nikola Jokić", "Luka Dončić"]
+
+def check(code, output, repair):
+    repaired = repair_code(code, output)
+    assert repaired, f"No repair for:\n{code}"
+    fixed, applied = repaired
+    assert repair in applied, f"Expected {repair}, got {applied}"
+    ast.parse(fixed)  # a broken splice raises SyntaxError here
+    return fixed
+
+def test_dirty_min():
+    for name in PLAYERS:
+        code = f"df = con.execute(\"SELECT AVG(CAST(MIN AS INTEGER)) FROM game_stats WHERE PLAYER_NAME = '{name}'\").df()\nprint(df)"
+        fixed = check(code, MIN_ERROR, "dirty_min")
+        assert f"PLAYER_NAME = '{name}'" in fixed and "SPLIT_PART(MIN" in fixed
+        assert fixed.endswith(".df()\nprint(df)")
+
+def test_ambiguous_column():
+    for name in PLAYERS:
+        code = (f'query = """SELECT GAME_ID FROM game_stats gs JOIN games g ON gs.GAME_ID = g.GAME_ID WHERE gs.PLAYER_NAME = \'{name}\'"""\n'
+                "df = con.execute(query).df()\nprint(df)")
+        fixed = check(code, AMBIGUOUS_ERROR, "ambiguous_column")
+        assert "SELECT gs.GAME_ID" in fixed and f"'{name}'" in fixed
+        assert '"""\ndf = con.execute(query).df()' in fixed
+
+def test_numpy_params():
+    for name in PLAYERS:
+        code = f"df = con.execute('SELECT PTS FROM game_stats WHERE PLAYER_NAME = ? AND SEASON = ?', ['{name}', season]).df()"
+        fixed = check(code, NUMPY_ERROR, "numpy_params")
+        assert f"_py(['{name}', season])" in fixed
+
+if __name__ == "__main__":
+    test_dirty_min()
+    test_ambiguous_column()
+    test_numpy_params()
+    print("✅ Verification Success: local repairs keep scripts valid with non-ASCII names.")
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from utils.db_pool import DB_PATH, db_fingerprint
+
+# Semantic Answer Cache
+# Stores full QueryResponse payloads in a Chroma collection under DEEPSTAT_RUNTIME_CHROMA_PATH
+# (.cache/chroma), apart from the git-tracked RAG collections in nba_chroma.
+# Lookup order: exact match on the normalized question, then nearest neighbour by embedding.
+CACHE_COLLECTION = "answer_cache"
+SIMILARITY_THRESHOLD = float(os.getenv("DEEPSTAT_CACHE_SIMILARITY", "0.90"))
+CACHE_TTL_SECONDS = int(os.getenv("DEEPSTAT_CACHE_TTL_SECONDS", str(24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.getenv("DEEPSTAT_CACHE_MAX_ENTRIES", "500"))
+CACHE_ENABLED = os.getenv("DEEPSTAT_CACHE_ENABLED", "1") == "1"
+
+def normalize_question(question: str) -> str:
+    """
+    Lowercases, strips punctuation and collapses whitespace.
+    "Who won the 2016 Championship?" -> "who won the 2016 championship"
+    """
+    text = re.sub(r"[^a-z0-9\s]", " ", question.lower())
+    return " ".join(text.split())
+
+def number_signature(normalized: str) -> str:
+    # Years and counts change the answer ("2016 champion" vs "2017 champion") even when
+    # the embeddings are nearly identical, so semantic hits must agree on every number.
+    return " ".join(sorted(re.findall(r"\d+", normalized)))
+
+class AnswerCache:
+    """
+    Whole-answer cache keyed by normalized question + embedding similarity.
+    Entries expire after CACHE_TTL_SECONDS and the least recently used entry is evicted
+    once CACHE_MAX_ENTRIES is reached. Methods are blocking (Chroma I/O); call them off the event loop.
+    """
+
+    def __init__(self, client, db_path=DB_PATH, threshold=SIMILARITY_THRESHOLD,
+                 ttl_seconds=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES):
+        self.client = client
+        self.db_path = db_path
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.lru = OrderedDict()  # entry id -> None, oldest first
+        self.db_version = db_fingerprint(db_path)
+        self.collection = self._open_collection()
+        self._load_lru()
+
+    def _open_collection(self):
+        return self.client.get_or_create_collection(
+            CACHE_COLLECTION,
+            metadata={"hnsw:space": "cosine"},
+        )
+
+    def _load_lru(self):
+        existing = self.collection.get(include=["metadatas"])
+        entries = sorted(zip(existing["ids"], existing["metadatas"]), key=lambda e: e[1].get("created_at", 0))
+        stale = [entry_id for entry_id, meta in entries if not self._check_db_version(meta)]
+        if stale:
+            self.collection.delete(ids=stale)
+        for entry_id, meta in entries:
+            if entry_id not in stale:
+                self.lru[entry_id] = None
+
+    def _check_db_version(self, entry_meta):
+        return entry_meta.get("db_version") == self.db_version
+
+    def _sync_db_version(self):
+        # nba.duckdb was rebuilt while the server was running: every answer is stale.
+        current = db_fingerprint(self.db_path)
+        if current != self.db_version:
+            print("   [Cache] nba.duckdb changed. Invalidating answer cache.")
+            self._reset()
+            self.db_version = current
+
+    def _reset(self):
+        try:
+            self.client.delete_collection(CACHE_COLLECTION)
+        except Exception:
+            pass
+        self.lru.clear()
+        self.collection = self._open_collection()
+
+    def _is_fresh(self, entry_meta):
+        return time.time() - entry_meta.get("created_at", 0) <= self.ttl_seconds
+
+    def _delete(self, entry_ids):
+        if not entry_ids:
+            return
+        self.collection.delete(ids=entry_ids)
+        for entry_id in entry_ids:
+            self.lru.pop(entry_id, None)
+
+    def _hit(self, entry_id, entry_meta, similarity):
+        self.lru.move_to_end(entry_id)
+        self.hits += 1
+        response = json.loads(entry_meta["response"])
+        print(f"   [Cache] HIT ({similarity:.3f}) for: {entry_meta.get('question')}")
+        return response
+
+    def lookup(self, question: str):
+        """
+        Returns the cached response dict for question, or None on a miss.
+        """
+        normalized = normalize_question(question)
+        entry_id = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+        with self.lock:
+            try:
+                self._sync_db_version()
+
+                # 1. Exact match (no embedding needed)
+                exact = self.collection.get(ids=[entry_id], include=["metadatas"])
+                if exact["ids"]:
+                    meta = exact["metadatas"][0]
+                    if self._check_db_version(meta) and self._is_fresh(meta):
+                        return self._hit(entry_id, meta, 1.0)
+                    self._delete([entry_id])
+
+                # 2. Semantic match among entries with the same numbers
+                if self.lru:
+                    near = self.collection.query(
+                        query_texts=[normalized],
+                        n_results=1,
+                        where={"numbers": number_signature(normalized)},
+                        include=["metadatas", "distances"],
+                    )
+                    if near["ids"] and near["ids"][0]:
+                        near_id = near["ids"][0][0]
+                        meta = near["metadatas"][0][0]
+                        similarity = 1 - near["distances"][0][0]
+                        if not (self._check_db_version(meta) and self._is_fresh(meta)):
+                            self._delete([near_id])
+                        elif similarity >= self.threshold:
+                            return self._hit(near_id, meta, similarity)
+            except Exception as e:
+                print(f"   [Cache] Lookup Error: {e}")
+
+            self.misses += 1
+            return None
+
+    def store(self, question: str, response: dict):
+        """
+        Caches a successful response. Failed answers are never cached.
+        """
+        if not response.get("success"):
+            return
+        normalized = normalize_question(question)
+        entry_id = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+        with self.lock:
+            try:
+                self._sync_db_version()
+                self.collection.upsert(
+                    ids=[entry_id],
+                    documents=[normalized],
+                    metadatas=[{
+                        "question": question,
+                        "numbers": number_signature(normalized),
+                        "db_version": self.db_version,
+                        "created_at": time.time(),
+                        "response": json.dumps(response),
+                    }],
+                )
+                self.lru[entry_id] = None
+                self.lru.move_to_end(entry_id)
+
+                # LRU Eviction
+                overflow = len(self.lru) - self.max_entries
+                if overflow > 0:
+                    self._delete(list(self.lru)[:overflow])
+            except Exception as e:
+                print(f"   [Cache] Store Error: {e}")
+
+    def clear(self):
+        with self.lock:
+            self._reset()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": len(self.lru),
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.max_entries,
+        }
@@ -0,0 +1,185 @@
+import ast
+import os
+import re
+
+# Deterministic Local Repair
+# The Coder keeps hitting the same failure classes its prompt warns about: markdown fences
+# left around the script, numpy.int64 values bound as SQL parameters, CASTs of the dirty MIN
+# column, and unqualified columns that are ambiguous after a join. Each has a known rewrite,
+# so the error output is classified and the code fixed here instead of re-prompting the Coder.
+# Unknown errors still go back to the LLM.
+LOCAL_REPAIR_ENABLED = os.getenv("DEEPSTAT_LOCAL_REPAIR", "1") == "1"
+MAX_LOCAL_REPAIRS = int(os.getenv("DEEPSTAT_MAX_LOCAL_REPAIRS", "2"))
+
+SAFE_MIN = "CAST(CASE WHEN {col} LIKE '%:%' THEN SPLIT_PART({col}, ':', 1) ELSE '0' END AS INTEGER)"
+SQL_WORDS = re.compile(r"\b(SELECT|FROM)\b", re.IGNORECASE)
+
+NUMPY_HELPER = '''def _py(value):
+    # numpy scalars -> Python scalars (DuckDB can't bind numpy.int64)
+    if hasattr(value, "item") and not isinstance(value, (list, tuple, dict, str)):
+        return value.item() if getattr(value, "ndim", 0) == 0 else [_py(v) for v in value.tolist()]
+    if isinstance(value, (list, tuple)):
+        return [_py(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _py(v) for k, v in value.items()}
+    return value
+
+'''
+
+def _positions(code):
+    """
+    (lineno, col_offset) -> character offset into code, for turning AST positions into slices.
+    AST columns count UTF-8 bytes, so a non-ASCII name earlier on the line would shift a plain sum.
+    """
+    lines = code.splitlines(keepends=True)
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+
+    def position(lineno, col_offset):
+        line = lines[lineno - 1] if lineno <= len(lines) else ""
+        return offsets[lineno - 1] + len(line.encode("utf-8")[:col_offset].decode("utf-8", errors="ignore"))
+    return position
+
+def _sql_literals(code):
+    """
+    [(start, end, sql)]: the source span and value of every SQL string literal (f-string parts excluded).
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return []
+    in_fstring = {id(part) for node in ast.walk(tree) if isinstance(node, ast.JoinedStr) for part in ast.walk(node)}
+    position = _positions(code)
+    return [(position(node.lineno, node.col_offset), position(node.end_lineno, node.end_col_offset), node.value)
+            for node in ast.walk(tree)
+            if isinstance(node, ast.Constant) and isinstance(node.value, str) and id(node) not in in_fstring
+            and SQL_WORDS.search(node.value)]
+
+def _literal(value, source):
+    """
+    value as a Python string literal: in the original literal's quotes when that is safe, else repr().
+    """
+    for delimiter in ('"""', "'''", '"', "'"):
+        if source.startswith(delimiter):
+            break
+    else:
+        return repr(value)  # prefixed literal (r"...", u"...")
+    if "\\" in value or delimiter[0] in value or (len(delimiter) == 1 and "\n" in value):
+        return repr(value)
+    return delimiter + value + delimiter
+
+def _rewrite_sql(code, rewrite):
+    """
+    Applies rewrite(sql) -> sql to every SQL string literal in the script. Each literal is
+    re-emitted whole, so quotes the rewrite adds ('%:%') can't end it early.
+    """
+    fixed = code
+    for start, end, sql in sorted(_sql_literals(code), reverse=True):
+        new_sql = rewrite(sql)
+        if new_sql != sql:
+            fixed = fixed[:start] + _literal(new_sql, code[start:end]) + fixed[end:]
+    return fixed
+
+def _is_prose(line):
+    # A stray language tag, or words without code punctuation that don't parse ("Here is the code:")
+    line = line.strip()
+    if line.lower() in ("python", "py"):
+        return True
+    if len(line.split()) < 2 or not re.fullmatch(r"[A-Za-z][^=()\[\]{}\"#]*", line):
+        return False
+    try:
+        ast.parse(line)
+        return False
+    except SyntaxError:
+        return True
+
+def has_fences_or_prose(code):
+    lines = [line for line in code.splitlines() if line.strip()]
+    return "```" in code or bool(lines) and (_is_prose(lines[0]) or _is_prose(lines[-1]))
+
+def fix_fences(code, output):
+    # Drops fence lines and leading/trailing prose; lines of the script itself are never touched
+    lines = [line for line in code.splitlines() if not line.strip().startswith("```")]
+    while lines and (not lines[0].strip() or _is_prose(lines[0])):
+        lines = lines[1:]
+    while lines and (not lines[-1].strip() or _is_prose(lines[-1])):
+        lines = lines[:-1]
+    fixed = "\n".join(lines).strip()
+    return fixed if fixed and fixed != code.strip() else None
+
+def fix_numpy_params(code, output):
+    """
+    Wraps the parameters of every con.execute/sql(query, params) call (positional or parameters=) in _py(...).
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    position = _positions(code)
+
+    spans = []
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and node.func.attr in ("execute", "sql", "query")):
+            continue
+        params = node.args[1:2] or [k.value for k in node.keywords if k.arg in ("parameters", "params")]
+        for arg in params:
+            if isinstance(arg, ast.Call) and getattr(arg.func, "id", None) == "_py":
+                continue
+            spans.append((position(arg.lineno, arg.col_offset), position(arg.end_lineno, arg.end_col_offset)))
+    if not spans:
+        return None
+    fixed = code
+    for start, end in sorted(spans, reverse=True):
+        fixed = fixed[:start] + "_py(" + fixed[start:end] + ")" + fixed[end:]
+    return NUMPY_HELPER + fixed
+
+def fix_dirty_min(code, output):
+    def rewrite(sql):
+        sql = re.sub(r"(?<!TRY_)CAST\(\s*((?:\w+\.)?MIN)\s+AS\s+\w+\s*\)",
+                     lambda m: SAFE_MIN.format(col=m.group(1)), sql, flags=re.IGNORECASE)
+        return re.sub(r"\b((?:\w+\.)?MIN)\s*::\s*\w+",
+                      lambda m: SAFE_MIN.format(col=m.group(1)), sql, flags=re.IGNORECASE)
+
+    fixed = _rewrite_sql(code, rewrite)
+    # pandas: df['MIN'].astype(int)
+    fixed = re.sub(r"""(\w+\[['"]MIN['"]\])\.astype\(\s*['"]?(int|float)\w*['"]?\s*\)""",
+                   r"pd.to_numeric(\1.astype(str).str.split(':').str[0], errors='coerce').fillna(0).astype(\2)",
+                   fixed)
+    return fixed if fixed != code else None
+
+def fix_ambiguous_column(code, output):
+    match = re.search(r'Ambiguous reference to column name "(\w+)" \(use: "(\w+)\.\w+"', output)
+    if not match:
+        return None
+    column, alias = match.groups()
+    # Both candidates are join keys with equal values, so the first one is as good as any
+    pattern = rf"(?<![\.\w'\"])(?<!AS )\b{re.escape(column)}\b(?![\w'\"])"
+    fixed = _rewrite_sql(code, lambda sql: re.sub(pattern, f"{alias}.{column}", sql, flags=re.IGNORECASE))
+    return fixed if fixed != code else None
+
+# (name, detector over the error output, fixer(code, output) -> fixed code or None)
+REPAIRS = [
+    ("markdown_fences", lambda out, code: has_fences_or_prose(code), fix_fences),
+    ("numpy_params", lambda out, code: "numpy." in out and ("Unable to transform" in out or "not supported" in out), fix_numpy_params),
+    ("dirty_min", lambda out, code: re.search(r"convert string '[^']*'|invalid literal for int\(\)", out) is not None
+                                    and re.search(r"\bMIN\b", code) is not None, fix_dirty_min),
+    ("ambiguous_column", lambda out, code: "Ambiguous reference to column" in out, fix_ambiguous_column),
+]
+
+def repair_code(code, output):
+    """
+    Classifies a failed run's output and applies every matching known rewrite.
+    Returns (fixed_code, [repair names]), or None when no known repair applies (ask the LLM).
+    """
+    fixed = code
+    applied = []
+    for name, detects, fixer in REPAIRS:
+        if not detects(output, fixed):
+            continue
+        result = fixer(fixed, output)
+        if result and result != fixed:
+            fixed = result
+            applied.append(name)
+    return (fixed, applied) if applied else None
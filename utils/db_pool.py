@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+
+# Read-Only DuckDB Pool
+# nba.duckdb is opened once per process in read-only mode. Requests borrow cheap cursors
+# (each cursor is an independent connection to the same in-memory database instance),
+# so connect + catalog load never shows up in per-query latency.
+# utils/init_db.py builds the next nba.duckdb under STAGED_SUFFIX and swaps it in. A pool that sees
+# a staged build or a new fingerprint closes its connection (Windows can't replace an open file) and
+# reopens on the next cursor, so a rebuild is picked up without restarting the server.
+DB_PATH = "nba.duckdb"
+STAGED_SUFFIX = ".new"
+REFRESH_SECONDS = float(os.getenv("DEEPSTAT_DB_REFRESH_SECONDS", "2"))
+
+def db_fingerprint(db_path=DB_PATH) -> str:
+    """
+    Identifies the current build of nba.duckdb. utils/init_db.py replaces the file,
+    which changes its inode and mtime (and usually its size).
+    """
+    try:
+        st = os.stat(db_path)
+        return f"{st.st_ino}-{st.st_mtime_ns}-{st.st_size}"
+    except OSError:
+        return "missing"
+
+def fetch_arrow(cursor):
+    """
+    Fetches the pending result of cursor.execute(...) as a pyarrow Table.
+    """
+    # duckdb >= 1.4 renamed fetch_arrow_table -> to_arrow_table
+    if hasattr(cursor, "to_arrow_table"):
+        return cursor.to_arrow_table()
+    return cursor.fetch_arrow_table()
+
+class ConnectionPool:
+    def __init__(self, db_path=DB_PATH, config=None):
+        self.db_path = db_path
+        self.config = config or {}
+        self.connection = None
+        self.version = None  # db_fingerprint of the open build
+        self.lock = threading.Lock()
+        self.watcher = None
+
+    def _stale(self):
+        return os.path.exists(self.db_path + STAGED_SUFFIX) or db_fingerprint(self.db_path) != self.version
+
+    def _open(self):
+        import duckdb
+
+        if self.connection is not None and self._stale():
+            print(f"   [DuckDB] {self.db_path} was rebuilt. Reopening.")
+            self.connection.close()
+            self.connection = None
+        if self.connection is None and os.path.exists(self.db_path) and not os.path.exists(self.db_path + STAGED_SUFFIX):
+            self.version = db_fingerprint(self.db_path)
+            self.connection = duckdb.connect(self.db_path, read_only=True, config=self.config)
+            if self.watcher is None:
+                self.watcher = threading.Thread(target=self._watch, daemon=True)
+                self.watcher.start()
+        return self.connection
+
+    def _watch(self):
+        # Releases the file for a rebuild even while no request is using the pool
+        while True:
+            time.sleep(REFRESH_SECONDS)
+            with self.lock:
+                if self.connection is not None and self._stale():
+                    self.connection.close()
+                    self.connection = None
+
+    def open(self):
+        """
+        Opens the shared read-only connection (reopening it if nba.duckdb was rebuilt).
+        Returns None when nba.duckdb does not exist yet, or a rebuild is being swapped in.
+        """
+        with self.lock:
+            return self._open()
+
+    def current_version(self):
+        """
+        The fingerprint of the build the pool serves, or None. Caches derived from the database
+        (catalogs, player names) compare it to know when to reload.
+        """
+        with self.lock:
+            return self.version if self._open() is not None else None
+
+    def cursor(self):
+        with self.lock:
+            connection = self._open()
+            if connection is None:
+                raise RuntimeError(f"{self.db_path} not found. Run utils/init_db.py first!")
+            return connection.cursor()
+
+    def fetch_arrow(self, query, params=None, timeout=None):
+        """
+        Runs one query on a fresh cursor and returns the result as a pyarrow Table.
+        With a timeout, the query is interrupted (duckdb.InterruptException) once it runs out.
+        """
+        cur = self.cursor()
+        timer = threading.Timer(timeout, cur.interrupt) if timeout is not None else None
+        try:
+            if timer:
+                timer.start()
+            if params is None:
+                cur.execute(query)
+            else:
+                cur.execute(query, params)
+            return fetch_arrow(cur)
+        finally:
+            if timer:
+                timer.cancel()
+            cur.close()
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+                self.version = None
+
+class ArrowRecorder:
+    """
+    Remembers the last result fetched by generated code, as an Arrow table.
+    """
+
+    def __init__(self):
+        self.last_table = None
+
+class ArrowCursor:
+    """
+    The `con` handed to generated code. Wraps a pooled cursor so that `.df()` goes through
+    DuckDB's Arrow path (fetch Arrow, then to_pandas) and the Arrow table is recorded as the
+    structured result of the run. Everything else is delegated to the real cursor.
+    """
+
+    def __init__(self, cursor, recorder):
+        self._cursor = cursor
+        self._recorder = recorder
+
+    def execute(self, query, parameters=None):
+        if parameters is None:
+            self._cursor.execute(query)
+        else:
+            self._cursor.execute(query, parameters)
+        return self
+
+    def sql(self, query):
+        return self.execute(query)
+
+    def arrow(self):
+        table = fetch_arrow(self._cursor)
+        self._recorder.last_table = table
+        return table
+
+    def df(self):
+        return self.arrow().to_pandas()
+
+    fetchdf = df
+    fetch_df = df
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
@@ -0,0 +1,82 @@
+import asyncio
+import os
+import time
+
+# Request Deadlines
+# Every question gets an end-to-end time budget, split across the stages by weight. Time a stage
+# doesn't use rolls over to the stages after it. When a stage runs out it is cancelled (pending LLM
+# calls are cancelled, in-flight SQL is interrupted) and the request returns a partial response
+# naming the stage that timed out, so one pathological question can't hold a worker for minutes.
+REQUEST_DEADLINE_SECONDS = float(os.getenv("DEEPSTAT_REQUEST_DEADLINE_SECONDS", "180"))
+STAGE_WEIGHTS = {
+    stage: float(weight)
+    for stage, weight in (
+        item.split("=") for item in os.getenv("DEEPSTAT_STAGE_BUDGETS", "plan=2,code=3,execution=3,analyst=2").split(",")
+    )
+}
+STAGE_ORDER = ["plan", "code", "execution", "analyst"]
+
+class StageTimeout(Exception):
+    def __init__(self, stage):
+        super().__init__(f"Request deadline exceeded during {stage}.")
+        self.stage = stage
+
+class Deadline:
+    """
+    Tracks the remaining time of one request. seconds <= 0 disables the deadline
+    (every budget is None, i.e. no timeout).
+    """
+
+    def __init__(self, seconds=REQUEST_DEADLINE_SECONDS):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds if seconds > 0 else None
+
+    def remaining(self):
+        if self.expires is None:
+            return None
+        return max(self.expires - time.monotonic(), 0.0)
+
+    def budget(self, stage):
+        """
+        Seconds granted to `stage`: its weight's share of the remaining time among the stages
+        that are still ahead (so a fast plan leaves more time for code, execution and narration).
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return None
+        ahead = STAGE_ORDER[STAGE_ORDER.index(stage):]
+        total = sum(STAGE_WEIGHTS.get(s, 0) for s in ahead)
+        return remaining * STAGE_WEIGHTS.get(stage, 0) / total if total else remaining
+
+    async def run(self, stage, awaitable):
+        """
+        Awaits within the stage budget. Raises StageTimeout (after cancelling the awaitable) if it runs out.
+        """
+        try:
+            return await asyncio.wait_for(awaitable, self.budget(stage))
+        except asyncio.TimeoutError:
+            raise StageTimeout(stage) from None
+
+    def stage_expiry(self, stage):
+        budget = self.budget(stage)
+        return None if budget is None else time.monotonic() + budget
+
+    async def stream(self, stage, iterator):
+        """
+        Re-yields an async iterator, raising StageTimeout once the stage budget is spent.
+        """
+        expiry = self.stage_expiry(stage)
+        iterator = iterator.__aiter__()
+        try:
+            while True:
+                timeout = None if expiry is None else max(expiry - time.monotonic(), 0)
+                try:
+                    item = await asyncio.wait_for(iterator.__anext__(), timeout)
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    raise StageTimeout(stage) from None
+                yield item
+        finally:
+            if hasattr(iterator, "aclose"):
+                await iterator.aclose()
@@ -0,0 +1,241 @@
+import hashlib
+import os
+import sys
+import textwrap
+import threading
+import time
+
+from utils.answer_cache import normalize_question
+from utils.sql_validator import extract_sql
+from utils.tracing import read_traces, TRACE_PATH
+
+# Few-Shot Example Store
+# Worked (question, verified code) pairs for the Coder, in a Chroma collection next to the answer
+# cache (DEEPSTAT_RUNTIME_CHROMA_PATH, not the tracked nba_chroma). Each request gets only the
+# FEW_SHOT_K examples closest to its question instead of every example, so prompts are shorter
+# and uncommon question shapes get a matching pattern. The store starts from SEED_EXAMPLES and grows from successful query traces:
+#   python -m utils.example_store [logs/traces.jsonl]
+EXAMPLES_COLLECTION = "coder_examples"
+FEW_SHOT_ENABLED = os.getenv("DEEPSTAT_FEW_SHOT", "1") == "1"
+FEW_SHOT_K = int(os.getenv("DEEPSTAT_FEW_SHOT_K", "2"))
+FEW_SHOT_MIN_SIMILARITY = float(os.getenv("DEEPSTAT_FEW_SHOT_MIN_SIMILARITY", "0.3"))
+FEW_SHOT_MAX_ENTRIES = int(os.getenv("DEEPSTAT_FEW_SHOT_MAX_ENTRIES", "500"))
+# Also store the code of every successful live answer (as the trace seeding does offline)
+FEW_SHOT_LEARN = os.getenv("DEEPSTAT_FEW_SHOT_LEARN", "0") == "1"
+
+# The worked examples the Coder prompt used to carry in full, one per question pattern
+SEED_EXAMPLES = [
+    {
+        "question": "Best Scoring Season in History (All Time)",
+        "code": '''query = """
+    SELECT gs.PLAYER_NAME,
+           g.SEASON,
+           SUM(gs.PTS) as Total_Points,
+           AVG(gs.PTS) as PPG
+    FROM game_stats gs
+    JOIN games g ON gs.GAME_ID = g.GAME_ID
+    GROUP BY gs.PLAYER_NAME, g.SEASON
+    ORDER BY Total_Points DESC
+    LIMIT 10
+"""
+df = con.execute(query).df()
+print(df)''',
+    },
+    {
+        "question": "Who had the best carry job? (Best Playoff vs Reg Season improvement)",
+        "code": '''query = """
+    WITH reg_season AS (
+        SELECT gs.PLAYER_NAME, AVG(gs.PTS) as Reg_PPG
+        FROM game_stats gs JOIN games g ON gs.GAME_ID = g.GAME_ID
+        WHERE CAST(g.GAME_ID AS VARCHAR) LIKE '2%'
+        GROUP BY gs.PLAYER_NAME
+    ),
+    playoffs AS (
+        SELECT gs.PLAYER_NAME, AVG(gs.PTS) as Playoff_PPG, COUNT(DISTINCT gs.GAME_ID) as Games
+        FROM game_stats gs JOIN games g ON gs.GAME_ID = g.GAME_ID
+        WHERE CAST(g.GAME_ID AS VARCHAR) LIKE '4%'
+        GROUP BY gs.PLAYER_NAME
+    )
+    SELECT p.PLAYER_NAME,
+           r.Reg_PPG,
+           p.Playoff_PPG,
+           (p.Playoff_PPG - r.Reg_PPG) as Elevation
+    FROM playoffs p
+    JOIN reg_season r ON p.PLAYER_NAME = r.PLAYER_NAME
+    WHERE p.Games > 10 -- Minimum sample size
+    ORDER BY Elevation DESC
+    LIMIT 10
+"""
+df = con.execute(query).df()
+print(df)''',
+    },
+    {
+        "question": "Compare LeBron and Curry",
+        "code": '''query = """
+    SELECT gs.PLAYER_NAME,
+           COUNT(DISTINCT gs.GAME_ID) as GP,
+           SUM(gs.PTS) as Total_Points,
+           AVG(gs.PTS) as PPG
+    FROM game_stats gs
+    WHERE gs.PLAYER_NAME IN ('LeBron James', 'Stephen Curry')
+    GROUP BY gs.PLAYER_NAME
+    ORDER BY Total_Points DESC
+"""
+df = con.execute(query).df()
+print(df)''',
+    },
+    {
+        "question": "Best Rookie Seasons (First Season)",
+        "code": '''query = """
+    WITH player_milestones AS (
+        SELECT gs.PLAYER_NAME,
+               MIN(g.SEASON) as Rookie_Season,
+               MAX(g.SEASON) as Final_Season
+        FROM game_stats gs
+        JOIN games g ON gs.GAME_ID = g.GAME_ID
+        GROUP BY gs.PLAYER_NAME
+    )
+    SELECT gs.PLAYER_NAME,
+           mil.Rookie_Season as Season,
+           SUM(gs.PTS) as Rookie_Points
+    FROM game_stats gs
+    JOIN games g ON gs.GAME_ID = g.GAME_ID
+    JOIN player_milestones mil ON gs.PLAYER_NAME = mil.PLAYER_NAME
+                              AND g.SEASON = mil.Rookie_Season -- Filter for FIRST season
+    GROUP BY gs.PLAYER_NAME, mil.Rookie_Season
+    ORDER BY Rookie_Points DESC
+    LIMIT 10
+"""
+df = con.execute(query).df()
+print(df)''',
+    },
+]
+
+def format_examples(examples, sql=False):
+    """
+    The EXAMPLES section of the Coder prompt: one fenced script per example, headed by its question.
+    sql=True shows only each script's query, for the SQL Coder (scripts without one are left out).
+    """
+    blocks = []
+    for e in examples:
+        if not sql:
+            blocks.append(f"```python\n# Q: {e['question']}\n{e['code'].strip()}\n```")
+            continue
+        queries, _ = extract_sql(e["code"])
+        if len(queries) == 1:
+            blocks.append(f"```sql\n-- Q: {e['question']}\n{textwrap.dedent(queries[0]).strip()}\n```")
+    return "\n".join(blocks) or "(none close to this question)"
+
+def default_examples():
+    # Every seed example: what callers get when they don't pass retrieved ones (main.py, tests/)
+    return format_examples(SEED_EXAMPLES)
+
+def default_sql_examples():
+    return format_examples(SEED_EXAMPLES, sql=True)
+
+def example_id(question):
+    return hashlib.sha256(normalize_question(question).encode("utf-8")).hexdigest()
+
+def verified_code(trace):
+    """
+    The script that produced a successful LLM answer in a trace record, or None.
+    """
+    if trace.get("route") != "llm" or not trace.get("success") or trace.get("cached") or not trace.get("rows"):
+        return None
+    code = None
+    for span in trace.get("spans", []):
+        if span.get("name") in ("code", "sql_code", "repair", "plan_and_code") and span.get("code"):
+            code = span["code"]  # the last script written is the one that ran successfully
+    return code
+
+class ExampleStore:
+    """
+    Embedding-indexed few-shot examples. Methods are blocking (Chroma I/O); call them off the event loop.
+    """
+
+    def __init__(self, client, k=FEW_SHOT_K, min_similarity=FEW_SHOT_MIN_SIMILARITY, max_entries=FEW_SHOT_MAX_ENTRIES):
+        self.client = client
+        self.k = k
+        self.min_similarity = min_similarity
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.collection = client.get_or_create_collection(EXAMPLES_COLLECTION, metadata={"hnsw:space": "cosine"})
+        self.seed()
+
+    def seed(self):
+        """
+        Adds any SEED_EXAMPLES missing from the collection.
+        """
+        ids = [example_id(e["question"]) for e in SEED_EXAMPLES]
+        existing = set(self.collection.get(ids=ids, include=[])["ids"])
+        missing = [(entry_id, e) for entry_id, e in zip(ids, SEED_EXAMPLES) if entry_id not in existing]
+        if missing:
+            self._upsert([e for _, e in missing], "seed")
+
+    def _upsert(self, examples, source):
+        now = time.time()
+        self.collection.upsert(
+            ids=[example_id(e["question"]) for e in examples],
+            documents=[normalize_question(e["question"]) for e in examples],
+            metadatas=[{"question": e["question"], "code": e["code"], "source": source, "created_at": now} for e in examples],
+        )
+
+    def add(self, question, code, source="live"):
+        with self.lock:
+            try:
+                self._upsert([{"question": question, "code": code}], source)
+                self._evict()
+            except Exception as e:
+                print(f"   [Examples] Store Error: {e}")
+
+    def _evict(self):
+        # Oldest learned examples go first; seeds are never evicted
+        overflow = self.collection.count() - self.max_entries
+        if overflow <= 0:
+            return
+        learned = self.collection.get(where={"source": {"$ne": "seed"}}, include=["metadatas"])
+        oldest = sorted(zip(learned["ids"], learned["metadatas"]), key=lambda e: e[1].get("created_at", 0))
+        self.collection.delete(ids=[entry_id for entry_id, _ in oldest[:overflow]])
+
+    def select(self, question, k=None):
+        """
+        Up to k examples closest to the question (at least min_similarity), most similar first:
+        [{"question", "code", "similarity"}].
+        """
+        k = self.k if k is None else k
+        with self.lock:
+            near = self.collection.query(query_texts=[normalize_question(question)], n_results=k,
+                                         include=["metadatas", "distances"])
+        examples = []
+        for meta, distance in zip(near["metadatas"][0], near["distances"][0]):
+            similarity = 1 - distance
+            if similarity >= self.min_similarity:
+                examples.append({"question": meta["question"], "code": meta["code"], "similarity": round(similarity, 3)})
+        return examples
+
+    def seed_from_traces(self, path=TRACE_PATH):
+        """
+        Stores the verified code of every successful LLM answer in a trace file. Returns how many were added.
+        """
+        examples = {}
+        for trace in read_traces(path):
+            code = verified_code(trace)
+            if code:
+                examples[example_id(trace["question"])] = {"question": trace["question"], "code": code}  # latest wins
+        with self.lock:
+            for start in range(0, len(examples), 100):
+                self._upsert(list(examples.values())[start:start + 100], "trace")
+            self._evict()
+        return len(examples)
+
+    def stats(self):
+        return {"entries": self.collection.count(), "k": self.k, "min_similarity": self.min_similarity,
+                "max_entries": self.max_entries, "learn": FEW_SHOT_LEARN}
+
+if __name__ == "__main__":
+    # Usage: python -m utils.example_store [logs/traces.jsonl]
+    from agents.analyst import get_runtime_chroma_client
+
+    path = sys.argv[1] if len(sys.argv) > 1 else TRACE_PATH
+    store = ExampleStore(get_runtime_chroma_client())
+    print(f"📚 Added {store.seed_from_traces(path)} examples from {path} ({store.stats()['entries']} in the store)")
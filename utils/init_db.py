@@ -4,6 +4,7 @@ import chromadb
 import pandas as pd
 import os
 import sys
+import time
 
 # Paths (Robust resolution)
 SCRIPT_DIR = Path(__file__).resolve().parent # deep_stat_ai/utils
@@ -13,13 +14,32 @@ REPO_ROOT = PROJECT_ROOT.parent          # sports_edit_ai
 DATA_DIR = REPO_ROOT / "data" / "archive"
 DB_PATH = str(PROJECT_ROOT / "nba.duckdb")
 CHROMA_PATH = str(PROJECT_ROOT / "nba_chroma")
+RUNTIME_CHROMA_PATH = os.getenv("DEEPSTAT_RUNTIME_CHROMA_PATH", str(PROJECT_ROOT / ".cache" / "chroma"))
+
+# Build next to the live file and swap it in: running servers keep answering from the old build
+# meanwhile, and reopen the new one when they see it (utils/db_pool.py)
+STAGED_PATH = DB_PATH + ".new"
+SWAP_TIMEOUT_SECONDS = 30
+
+def swap_in(staged, target):
+    # Windows refuses to replace a file that is open; servers release it once they see the staged build
+    deadline = time.time() + SWAP_TIMEOUT_SECONDS
+    while True:
+        try:
+            os.replace(staged, target)
+            return
+        except PermissionError:
+            if time.time() > deadline:
+                raise
+            print("   -> Waiting for running servers to release nba.duckdb...")
+            time.sleep(1)
 
 def init_duckdb():
     print("🦆 Initializing DuckDB...")
-    if os.path.exists(DB_PATH):
-        os.remove(DB_PATH)
+    if os.path.exists(STAGED_PATH):
+        os.remove(STAGED_PATH)
     
-    con = duckdb.connect(DB_PATH)
+    con = duckdb.connect(STAGED_PATH)
     
     # Load Tables
     files = {
@@ -40,7 +60,19 @@ def init_duckdb():
     con.execute("CREATE INDEX idx_stats_game_id ON game_stats(GAME_ID)")
     con.execute("CREATE INDEX idx_stats_player ON game_stats(PLAYER_NAME)")
     con.close()
+    swap_in(STAGED_PATH, DB_PATH)
     print("✅ DuckDB Ready.")
+    reset_answer_cache()
+
+def reset_answer_cache():
+    # Cached answers (api.py /api/query) were computed against the old database.
+    if not os.path.exists(RUNTIME_CHROMA_PATH):
+        return
+    client = chromadb.PersistentClient(path=RUNTIME_CHROMA_PATH)
+    try:
+        client.delete_collection("answer_cache")
+        print("   -> Cleared cached answers.")
+    except: pass
 
 def init_chroma():
     print("🦁 Initializing ChromaDB (Vector Store)...")
@@ -0,0 +1,440 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any
+
+import httpx
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_ollama import ChatOllama
+from ollama import AsyncClient, Client
+
+from utils.metrics import LLM_IN_FLIGHT, LLM_QUEUE_SECONDS, LLM_TOKENS
+
+# LLM Backend
+# Every agent gets its chat model from get_llm(). DEEPSTAT_LLM_MODE picks the backend:
+#   live   - ChatOllama (default)
+#   record - ChatOllama, and every response is saved as a cassette keyed by a hash of the prompt
+#   replay - answers only from cassettes (a prompt with no cassette is an error)
+#   stub   - answers from cassettes when there is one, otherwise from a canned per-agent fixture
+# replay and stub wait DEEPSTAT_LLM_LATENCY seconds per call, so DuckDB, RAG and the retry loop
+# can be benchmarked deterministically on a machine without Ollama.
+#
+# Whatever the mode, models are shared: one Ollama HTTP client (pooled keep-alive connections) for
+# every agent, one model object per (agent, model, temperature), and a global limiter that caps
+# concurrent generations at DEEPSTAT_LLM_MAX_CONCURRENCY, serving waiting agents round-robin.
+LLM_MODEL = os.getenv("DEEPSTAT_LLM_MODEL", "qwen2.5-coder:7b-instruct")
+LLM_MODE = os.getenv("DEEPSTAT_LLM_MODE", "live")
+LLM_MODES = ("live", "record", "replay", "stub")
+CASSETTE_DIR = os.getenv("DEEPSTAT_LLM_CASSETTES", "cassettes")
+FIXTURES_PATH = os.getenv("DEEPSTAT_LLM_FIXTURES")
+LLM_MAX_CONCURRENCY = int(os.getenv("DEEPSTAT_LLM_MAX_CONCURRENCY", "4"))
+# How long Ollama keeps a model loaded after its last request ("30m", "1h", -1 = forever)
+LLM_KEEP_ALIVE = os.getenv("DEEPSTAT_LLM_KEEP_ALIVE", "30m")
+LLM_KEEP_ALIVE = int(LLM_KEEP_ALIVE) if LLM_KEEP_ALIVE.lstrip("-").isdigit() else LLM_KEEP_ALIVE
+
+def parse_latency(value):
+    """
+    "0.5" -> 0.5s for every agent; "architect=0.5,coder=2,0.2" -> per agent, 0.2s for the rest.
+    """
+    latency = {"*": 0.0}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        agent, _, seconds = item.rpartition("=")
+        latency[agent or "*"] = float(seconds)
+    return latency
+
+LLM_LATENCY = parse_latency(os.getenv("DEEPSTAT_LLM_LATENCY", "0"))
+
+# Canned answers for stub mode: a plan, a script that runs against the real schema, a narrative.
+DEFAULT_FIXTURES = {
+    "architect": "1. Load 'games'.\n2. Count the games per SEASON.\n3. Order by SEASON DESC and LIMIT 10.",
+    "coder": (
+        "```python\n"
+        "query = \"\"\"\n"
+        "    SELECT g.SEASON, COUNT(*) AS Games\n"
+        "    FROM games g\n"
+        "    GROUP BY g.SEASON\n"
+        "    ORDER BY g.SEASON DESC\n"
+        "    LIMIT 10\n"
+        "\"\"\"\n"
+        "df = con.execute(query).df()\n"
+        "print(df)\n"
+        "```"
+    ),
+    "analyst": "The table lists the number of games played in each of the most recent seasons.",
+}
+DEFAULT_FIXTURES["plan_coder"] = json.dumps({
+    "plan": DEFAULT_FIXTURES["architect"],
+    "code": DEFAULT_FIXTURES["coder"].removeprefix("```python\n").removesuffix("\n```"),
+})
+DEFAULT_FIXTURES["sql_coder"] = json.dumps({
+    "sql": "SELECT g.SEASON, COUNT(*) AS Games FROM games g GROUP BY g.SEASON ORDER BY g.SEASON DESC LIMIT ?",
+    "params": [10],
+    "display": {"title": "Games per season", "chart": "bar", "x": "SEASON", "y": "Games"},
+    "needs_python": False,
+})
+
+fixtures = None
+
+def load_fixtures():
+    """
+    DEFAULT_FIXTURES overlaid with the JSON object ({agent: text}) at DEEPSTAT_LLM_FIXTURES.
+    """
+    global fixtures
+    if fixtures is None:
+        fixtures = dict(DEFAULT_FIXTURES)
+        if FIXTURES_PATH:
+            with open(FIXTURES_PATH, encoding="utf-8") as f:
+                fixtures.update(json.load(f))
+    return fixtures
+
+def prompt_hash(model, temperature, messages) -> str:
+    """
+    Cassette key: sha256 of the model settings and the rendered messages.
+    """
+    payload = {
+        "model": model,
+        "temperature": temperature,
+        "messages": [(m.type, m.content) for m in messages],
+    }
+    raw = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class CassetteChatModel(BaseChatModel):
+    """
+    Chat model for the record, replay and stub modes. Cassettes are one JSON file per prompt
+    hash in DEEPSTAT_LLM_CASSETTES, so they can be reviewed and committed alongside a benchmark.
+    """
+
+    agent: str
+    model: str
+    temperature: float = 0
+    mode: str = "replay"
+    latency: float = 0
+    fixture: str = ""
+    cassette_dir: str = CASSETTE_DIR
+    live: Any = None  # the ChatOllama being recorded (record mode only)
+
+    @property
+    def _llm_type(self) -> str:
+        return f"deepstat-{self.mode}"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model": self.model, "temperature": self.temperature, "mode": self.mode}
+
+    def _path(self, key):
+        return os.path.join(self.cassette_dir, f"{key}.json")
+
+    def _load(self, messages):
+        key = prompt_hash(self.model, self.temperature, messages)
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return key, json.load(f)
+        except FileNotFoundError:
+            return key, None
+
+    def _save(self, messages, message):
+        key = prompt_hash(self.model, self.temperature, messages)
+        record = {
+            "agent": self.agent,
+            "model": self.model,
+            "temperature": self.temperature,
+            "messages": [(m.type, m.content) for m in messages],
+            "content": message.content,
+            "usage_metadata": getattr(message, "usage_metadata", None),
+        }
+        os.makedirs(self.cassette_dir, exist_ok=True)
+        tmp = self._path(key) + f".{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(record, f, indent=2)
+        os.replace(tmp, self._path(key))
+
+    def _respond(self, messages):
+        key, record = self._load(messages)
+        if record is not None:
+            return record
+        if self.mode == "stub":
+            return {"content": self.fixture}
+        raise LookupError(f"No cassette for {self.agent} prompt {key[:12]} in {self.cassette_dir}/ (record it with DEEPSTAT_LLM_MODE=record).")
+
+    @staticmethod
+    def _result(record):
+        message = AIMessage(content=record["content"], usage_metadata=record.get("usage_metadata"))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.mode == "record":
+            message = self.live.invoke(messages, stop=stop, **kwargs)
+            self._save(messages, message)
+            return ChatResult(generations=[ChatGeneration(message=message)])
+        record = self._respond(messages)
+        if self.latency:
+            time.sleep(self.latency)
+        return self._result(record)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.mode == "record":
+            message = await self.live.ainvoke(messages, stop=stop, **kwargs)
+            self._save(messages, message)
+            return ChatResult(generations=[ChatGeneration(message=message)])
+        record = self._respond(messages)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._result(record)
+
+class Waiter:
+    def __init__(self, loop=None):
+        self.state = "waiting"  # -> granted | cancelled (changed under the limiter lock)
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+        self.event = None if loop else threading.Event()
+
+    def grant(self):
+        if self.state != "waiting":
+            return False
+        self.state = "granted"
+        if self.future is not None:
+            self.loop.call_soon_threadsafe(lambda: self.future.done() or self.future.set_result(True))
+        else:
+            self.event.set()
+        return True
+
+class FairLimiter:
+    """
+    Caps concurrent LLM generations. Waiters queue per agent and a freed slot goes to the next
+    agent in round-robin order, so a burst of speculative Coder calls can't starve the Analyst.
+    Usable from async code (slot) and from threads (slot_sync).
+    """
+
+    def __init__(self, slots=LLM_MAX_CONCURRENCY):
+        self.slots = max(1, slots)
+        self.in_use = 0
+        self.queues = {}  # agent -> deque of waiters
+        self.order = deque()  # agents with waiters, next to be served on the left
+        self.lock = threading.Lock()
+
+    def _try_acquire(self, agent, waiter):
+        with self.lock:
+            if self.in_use < self.slots and not self.order:
+                self.in_use += 1
+                LLM_IN_FLIGHT.set(self.in_use)
+                return True
+            queue = self.queues.setdefault(agent, deque())
+            if not queue:
+                self.order.append(agent)
+            queue.append(waiter)
+            return False
+
+    def release(self):
+        with self.lock:
+            while self.order:
+                agent = self.order.popleft()
+                queue = self.queues[agent]
+                waiter = queue.popleft()
+                if queue:
+                    self.order.append(agent)
+                if waiter.grant():
+                    return  # the slot passes straight to the waiter
+            self.in_use -= 1
+            LLM_IN_FLIGHT.set(self.in_use)
+
+    async def acquire(self, agent):
+        waiter = Waiter(asyncio.get_running_loop())
+        if self._try_acquire(agent, waiter):
+            return
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self.lock:
+                granted = waiter.state == "granted"
+                waiter.state = "cancelled"
+            if granted:
+                self.release()
+            raise
+
+    def acquire_sync(self, agent):
+        waiter = Waiter()
+        if not self._try_acquire(agent, waiter):
+            waiter.event.wait()
+
+    @asynccontextmanager
+    async def slot(self, agent):
+        started = time.perf_counter()
+        await self.acquire(agent)
+        LLM_QUEUE_SECONDS.observe(time.perf_counter() - started, agent=agent)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @contextmanager
+    def slot_sync(self, agent):
+        started = time.perf_counter()
+        self.acquire_sync(agent)
+        LLM_QUEUE_SECONDS.observe(time.perf_counter() - started, agent=agent)
+        try:
+            yield
+        finally:
+            self.release()
+
+LIMITER = FairLimiter()
+
+ollama_clients = None
+
+def get_ollama_clients():
+    """
+    The (sync, async) Ollama clients shared by every ChatOllama, so all agents draw on one
+    pool of keep-alive HTTP connections.
+    """
+    global ollama_clients
+    if ollama_clients is None:
+        limits = httpx.Limits(max_connections=LLM_MAX_CONCURRENCY * 2, max_keepalive_connections=LLM_MAX_CONCURRENCY * 2)
+        ollama_clients = (Client(limits=limits), AsyncClient(limits=limits))
+    return ollama_clients
+
+def new_ollama(model, temperature, format=None):
+    llm = ChatOllama(model=model, temperature=temperature, keep_alive=LLM_KEEP_ALIVE, format=format)
+    llm._client, llm._async_client = get_ollama_clients()
+    return llm
+
+class PooledChatModel(BaseChatModel):
+    """
+    What the agents' chains hold: forwards to the backend (ChatOllama or CassetteChatModel)
+    while holding a LIMITER slot for the whole generation, streaming included.
+    """
+
+    agent: str
+    model: str
+    temperature: float = 0
+    backend: Any = None
+
+    @property
+    def mode(self):
+        return getattr(self.backend, "mode", None)
+
+    @property
+    def _llm_type(self) -> str:
+        return f"pooled-{self.backend._llm_type}"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"agent": self.agent, **self.backend._identifying_params}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        with LIMITER.slot_sync(self.agent):
+            result = self.backend._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        warm_models.add(self.model)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        async with LIMITER.slot(self.agent):
+            result = await self.backend._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        warm_models.add(self.model)
+        return result
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        with LIMITER.slot_sync(self.agent):
+            if isinstance(self.backend, ChatOllama):
+                yield from self.backend._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+            else:
+                yield self._as_chunk(self.backend._generate(messages, stop=stop, **kwargs))
+        warm_models.add(self.model)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        async with LIMITER.slot(self.agent):
+            if isinstance(self.backend, ChatOllama):
+                async for chunk in self.backend._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                    yield chunk
+            else:
+                yield self._as_chunk(await self.backend._agenerate(messages, stop=stop, **kwargs))
+        warm_models.add(self.model)
+
+    @staticmethod
+    def _as_chunk(result):
+        message = result.generations[0].message
+        return ChatGenerationChunk(message=AIMessageChunk(content=message.content, usage_metadata=message.usage_metadata))
+
+llms = {}
+llms_lock = threading.Lock()
+warm_models = set()  # models that have answered at least once in this process (reported by /health)
+
+async def warm_model(model):
+    """
+    Loads `model` in Ollama with a one-token prompt (kept resident for DEEPSTAT_LLM_KEEP_ALIVE),
+    so the first question doesn't pay for the model load. Replay and stub modes have nothing to load.
+    """
+    if LLM_MODE in ("live", "record"):
+        await get_ollama_clients()[1].chat(
+            model=model,
+            messages=[{"role": "user", "content": "hi"}],
+            options={"num_predict": 1},
+            keep_alive=LLM_KEEP_ALIVE,
+        )
+    warm_models.add(model)
+
+def get_llm(agent, temperature=0, model=LLM_MODEL, format=None):
+    """
+    The shared chat model for one agent ("architect", "coder", "analyst", "plan_coder", "sql_coder") in the
+    configured mode. format="json" turns on Ollama's JSON mode. Repeated calls return the same
+    object, so chain factories are cheap to call again.
+    """
+    if LLM_MODE not in LLM_MODES:
+        raise ValueError(f"DEEPSTAT_LLM_MODE must be one of {', '.join(LLM_MODES)}, not {LLM_MODE!r}.")
+    key = (LLM_MODE, agent, model, temperature, format)
+    with llms_lock:
+        if key not in llms:
+            if LLM_MODE == "live":
+                backend = new_ollama(model, temperature, format)
+            else:
+                backend = CassetteChatModel(
+                    agent=agent,
+                    model=model,
+                    temperature=temperature,
+                    mode=LLM_MODE,
+                    latency=LLM_LATENCY.get(agent, LLM_LATENCY["*"]),
+                    fixture=load_fixtures().get(agent, ""),
+                    live=new_ollama(model, temperature, format) if LLM_MODE == "record" else None,
+                )
+            llms[key] = PooledChatModel(agent=agent, model=model, temperature=temperature, backend=backend)
+        return llms[key]
+
+def _usage(generation):
+    """
+    (prompt, completion) tokens of one generation: usage_metadata on the message, or the raw
+    Ollama counters in generation_info.
+    """
+    message = getattr(generation, "message", None)
+    usage = getattr(message, "usage_metadata", None) if message is not None else None
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    info = getattr(generation, "generation_info", None) or {}
+    return info.get("prompt_eval_count", 0) or 0, info.get("eval_count", 0) or 0
+
+class TokenUsageHandler(BaseCallbackHandler):
+    """
+    LangChain callback that counts prompt/completion tokens per agent.
+    Pass it per call: chain.ainvoke(inputs, config={"callbacks": [TokenUsageHandler("coder")]}).
+    """
+
+    def __init__(self, agent):
+        self.agent = agent
+
+    def on_llm_end(self, response, **kwargs):
+        prompt_tokens = completion_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                p, c = _usage(generation)
+                prompt_tokens += p
+                completion_tokens += c
+        if prompt_tokens:
+            LLM_TOKENS.inc(prompt_tokens, agent=self.agent, type="prompt")
+        if completion_tokens:
+            LLM_TOKENS.inc(completion_tokens, agent=self.agent, type="completion")
@@ -0,0 +1,145 @@
+import math
+import threading
+
+# Metrics
+# Minimal in-process Prometheus instrumentation (no client library needed): counters, gauges and
+# histograms rendered in the text exposition format by GET /metrics. Used for capacity planning
+# on the Ollama box: per-stage latency, LLM latency and tokens per agent, retries, cache hits.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+def _format(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def percentile(values, p, default=None):
+    """
+    Nearest-rank percentile: the smallest sample value with at least p% of the sample at or
+    below it. Returns default for an empty sample. Shared by the tests/bench_*.py reports.
+    """
+    if not values:
+        return default
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def _key(self, labels):
+        missing = set(self.labelnames) - set(labels)
+        if missing:
+            raise ValueError(f"{self.name}: missing labels {sorted(missing)}")
+        return tuple((name, labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            items = sorted(self.values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_label_text(key)} {_format(value)}"]
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            counts, total = self.values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self.values[key] = (counts, total + value)
+
+    def _render_sample(self, key, value):
+        counts, total = value
+        lines = [f"{self.name}_bucket{_label_text(key + (('le', _format(bound)),))} {count}"
+                 for bound, count in zip(self.buckets, counts)]
+        lines.append(f"{self.name}_sum{_label_text(key)} {_format(total)}")
+        lines.append(f"{self.name}_count{_label_text(key)} {counts[-1]}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "deepstat_stage_seconds", "Pipeline stage latency (plan, code, validation, execution, rag, rag_wait, analyst, total).", ["stage"]))
+LLM_SECONDS = REGISTRY.register(Histogram(
+    "deepstat_llm_seconds", "Latency of LLM calls that were not served from the stage cache.", ["agent"]))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "deepstat_llm_tokens_total", "LLM tokens by agent and type (prompt or completion).", ["agent", "type"]))
+REQUESTS = REGISTRY.register(Counter(
+    "deepstat_requests_total", "Answered questions by route (llm, template, cache) and outcome.", ["route", "outcome"]))
+RETRIES = REGISTRY.register(Counter(
+    "deepstat_retries_total", "Extra execution attempts by kind (coder re-prompt, local_repair, sql_autofix, sql_fallback).", ["kind"]))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "deepstat_cache_lookups_total", "Answer and stage cache lookups.", ["cache", "result"]))
+LLM_QUEUE_SECONDS = REGISTRY.register(Histogram(
+    "deepstat_llm_queue_seconds", "Time an LLM call waited for a generation slot.", ["agent"]))
+LLM_IN_FLIGHT = REGISTRY.register(Gauge(
+    "deepstat_llm_in_flight", "LLM generations currently holding a slot."))
+MODEL_ROUTES = REGISTRY.register(Counter(
+    "deepstat_model_routes_total", "Model chosen per agent call by stage, model and reason (disabled, policy, simple, complex, escalation).", ["stage", "model", "reason"]))
+STARTUP_SECONDS = REGISTRY.register(Gauge(
+    "deepstat_startup_seconds", "Cold-start cost by phase (import, sandbox, warmup_duckdb, warmup_chroma, warmup_chains, warmup_llm, ready).", ["phase"]))
+FIRST_REQUEST_SECONDS = REGISTRY.register(Gauge(
+    "deepstat_first_request_seconds", "End-to-end latency of the first question answered by this process."))
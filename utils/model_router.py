@@ -0,0 +1,103 @@
+import os
+import re
+from dataclasses import dataclass, field
+
+from utils.metrics import MODEL_ROUTES
+
+# Model Routing
+# Picks the model for each agent call from the stage and how complex the question (and, for the
+# Coder, the plan) looks. Simple plans, lookups and narratives go to a small fast model; the large
+# model is kept for multi-step SQL (derived seasons, deltas between splits, streaks, several joins).
+# A Coder attempt that fails on the small model is retried on the large one, so routing can only
+# cost a retry, never an answer. Every decision is counted in deepstat_model_routes_total.
+ROUTING_ENABLED = os.getenv("DEEPSTAT_ROUTING_ENABLED", "0") == "1"
+SMALL_MODEL = os.getenv("DEEPSTAT_SMALL_MODEL", "qwen2.5:3b-instruct")
+# Same variable as utils/llm.LLM_MODEL, read here so routing doesn't import the LLM client stack
+LARGE_MODEL = os.getenv("DEEPSTAT_LLM_MODEL", "qwen2.5-coder:7b-instruct")
+# Per stage: always (small model), simple (small model below the complexity threshold), never
+ROUTING_POLICY = {
+    stage: rule
+    for stage, rule in (
+        item.split("=") for item in os.getenv("DEEPSTAT_ROUTING_POLICY", "architect=simple,coder=simple,analyst=always").split(",")
+    )
+}
+COMPLEXITY_THRESHOLD = int(os.getenv("DEEPSTAT_ROUTING_THRESHOLD", "2"))
+
+# (pattern, weight, reason) matched against the question
+QUESTION_SIGNALS = [
+    (r"\b(rookie|debut|first season|final season|last season|retire\w*|career)\b", 2, "derived_season"),
+    (r"\b(improv\w*|elevat\w*|carry|jump|declin\w*|differen\w*|better than|more than|compared to)\b", 2, "delta"),
+    (r"\b(streak|consecutive|in a row)\b", 2, "streak"),
+    (r"\b(compare|versus|vs\.?)\b", 1, "comparison"),
+    (r"\b(per game|average|percentage|ratio|efficien\w*|per 36)\b", 1, "ratio"),
+    (r"\b(playoffs?|regular season|postseason)\b", 1, "split"),
+    (r"\b(each|every|by season|per season|over time|trend)\b", 1, "grouping"),
+]
+# (pattern, weight, reason) matched against the Architect's plan
+PLAN_SIGNALS = [
+    (r"\b(MIN|MAX)\(SEASON\)", 2, "derived_season"),
+    (r"\bWITH\b|\bCTE\b|\bsubquer", 2, "cte"),
+    (r"\b(RANK|ROW_NUMBER|LAG|LEAD|window)\b", 2, "window"),
+]
+
+def complexity(question, plan=None):
+    """
+    (score, reasons): weighted question and plan signals. 0 is a plain lookup.
+    """
+    score, reasons = 0, []
+    for pattern, weight, reason in QUESTION_SIGNALS:
+        if re.search(pattern, question, re.IGNORECASE):
+            score += weight
+            reasons.append(reason)
+    if plan:
+        for pattern, weight, reason in PLAN_SIGNALS:
+            if re.search(pattern, plan, re.IGNORECASE) and reason not in reasons:
+                score += weight
+                reasons.append(reason)
+        if len(re.findall(r"\bjoin\b", plan, re.IGNORECASE)) >= 2:
+            score += 1
+            reasons.append("joins")
+    return score, reasons
+
+@dataclass
+class RouteDecision:
+    stage: str
+    model: str
+    reason: str  # disabled | policy | simple | complex | escalation
+    score: int = 0
+    signals: list = field(default_factory=list)
+
+    @property
+    def tier(self):
+        return "small" if self.model == SMALL_MODEL and self.model != LARGE_MODEL else "large"
+
+    def to_dict(self):
+        return {"model": self.model, "tier": self.tier, "reason": self.reason, "complexity": self.score, "signals": self.signals}
+
+def record(decision):
+    MODEL_ROUTES.inc(stage=decision.stage, model=decision.model, reason=decision.reason)
+    return decision
+
+def route(stage, question, plan=None):
+    """
+    The model for one agent call under ROUTING_POLICY.
+    """
+    if not ROUTING_ENABLED:
+        return record(RouteDecision(stage, LARGE_MODEL, "disabled"))
+    rule = ROUTING_POLICY.get(stage, "never")
+    if rule == "always":
+        return record(RouteDecision(stage, SMALL_MODEL, "policy"))
+    if rule == "never":
+        return record(RouteDecision(stage, LARGE_MODEL, "policy"))
+    score, signals = complexity(question, plan)
+    if score < COMPLEXITY_THRESHOLD:
+        return record(RouteDecision(stage, SMALL_MODEL, "simple", score, signals))
+    return record(RouteDecision(stage, LARGE_MODEL, "complex", score, signals))
+
+def escalate(decision):
+    """
+    After a failed attempt: the large model if the small one was used, else the same decision.
+    """
+    if decision.tier == "large":
+        return decision
+    return record(RouteDecision(decision.stage, LARGE_MODEL, "escalation", decision.score, decision.signals))
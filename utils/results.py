@@ -0,0 +1,110 @@
+import math
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+# Structured Results
+# Execution returns the final DataFrame as an Arrow table. This module turns it into
+# typed columnar JSON pages (or Arrow IPC) for the client and a compact, row-capped text
+# summary for the Analyst prompt, instead of passing around whatever print(df) produced.
+PAGE_SIZE = int(os.getenv("DEEPSTAT_RESULT_PAGE_SIZE", "100"))
+ANALYST_MAX_ROWS = int(os.getenv("DEEPSTAT_ANALYST_MAX_ROWS", "15"))
+RESULT_STORE_SIZE = int(os.getenv("DEEPSTAT_RESULT_STORE_SIZE", "200"))
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+def json_safe_table(table):
+    """
+    Casts columns JSON can't represent natively (decimals, dates, nested types) to float/str.
+    """
+    import pyarrow as pa
+
+    columns = []
+    for field, column in zip(table.schema, table.columns):
+        t = field.type
+        if pa.types.is_decimal(t):
+            column = column.cast(pa.float64())
+        elif not (pa.types.is_integer(t) or pa.types.is_floating(t) or pa.types.is_boolean(t)
+                  or pa.types.is_string(t) or pa.types.is_large_string(t) or pa.types.is_null(t)):
+            column = column.cast(pa.string())
+        columns.append(column)
+    return pa.table(columns, names=table.column_names)
+
+def _clean(value):
+    # NaN/inf are not valid JSON
+    if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+        return None
+    return value
+
+def to_columnar(table, offset=0, limit=PAGE_SIZE):
+    """
+    One page of a result table as typed columnar JSON:
+    {"columns": [{"name", "type"}], "data": {name: [values]}, "total_rows", "offset", "limit"}
+    """
+    page = json_safe_table(table.slice(offset, limit))
+    return {
+        "columns": [{"name": f.name, "type": str(f.type)} for f in table.schema],
+        "data": {name: [_clean(v) for v in values] for name, values in page.to_pydict().items()},
+        "total_rows": table.num_rows,
+        "offset": offset,
+        "limit": limit,
+    }
+
+def to_arrow_ipc(table, offset=0, limit=None):
+    import pyarrow as pa
+
+    if limit is not None:
+        table = table.slice(offset, limit)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def from_arrow_ipc(data):
+    import pyarrow as pa
+
+    return pa.ipc.open_stream(data).read_all()
+
+def _format_cell(value):
+    if isinstance(value, float):
+        return f"{value:.2f}".rstrip("0").rstrip(".") if not math.isnan(value) else "NaN"
+    return str(value)
+
+def summarize_table(table, max_rows=ANALYST_MAX_ROWS):
+    """
+    Compact pipe-separated rendering for the Analyst prompt, capped at max_rows rows.
+    """
+    page = json_safe_table(table.slice(0, max_rows)).to_pylist()
+    lines = [" | ".join(table.column_names)]
+    for row in page:
+        lines.append(" | ".join(_format_cell(row[name]) for name in table.column_names))
+    if table.num_rows > max_rows:
+        lines.append(f"... ({table.num_rows - max_rows} more rows not shown, {table.num_rows} total)")
+    return "\n".join(lines)
+
+class ResultStore:
+    """
+    Keeps recent result tables in memory so clients can page through them by result_id.
+    Oldest results are dropped once RESULT_STORE_SIZE is reached.
+    """
+
+    def __init__(self, max_results=RESULT_STORE_SIZE):
+        self.max_results = max_results
+        self.tables = OrderedDict()
+        self.lock = threading.Lock()
+
+    def put(self, table):
+        result_id = uuid.uuid4().hex
+        with self.lock:
+            self.tables[result_id] = table
+            while len(self.tables) > self.max_results:
+                self.tables.popitem(last=False)
+        return result_id
+
+    def get(self, result_id):
+        with self.lock:
+            table = self.tables.get(result_id)
+            if table is not None:
+                self.tables.move_to_end(result_id)
+            return table
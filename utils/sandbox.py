@@ -0,0 +1,348 @@
+import builtins
+import contextlib
+import io
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+
+from utils.db_pool import ConnectionPool, ArrowCursor, ArrowRecorder
+from utils.results import to_arrow_ipc, from_arrow_ipc
+
+# Sandboxed Execution Pool
+# LLM-written code runs in pre-warmed worker processes instead of the API process.
+# Each worker imports pandas/duckdb once and holds a read-only connection to nba.duckdb
+# (utils/db_pool.py). Every run gets a fresh cursor as `con`, so a run only pays for exec() itself.
+# A run that exceeds its wall-clock timeout (or is cancelled) first gets its in-flight DuckDB
+# queries interrupted, which leaves the worker reusable; only if the script doesn't stop within
+# a short grace period is the worker killed and replaced. A memory cap keeps one runaway query
+# from taking the host down.
+SANDBOX_WORKERS = int(os.getenv("DEEPSTAT_SANDBOX_WORKERS", "4"))
+EXEC_TIMEOUT_SECONDS = float(os.getenv("DEEPSTAT_EXEC_TIMEOUT_SECONDS", "60"))
+EXEC_MEMORY_MB = int(os.getenv("DEEPSTAT_EXEC_MEMORY_MB", "4096"))
+
+DB_PATH = "nba.duckdb"
+POLL_INTERVAL = 0.1  # seconds between timeout/cancellation checks while a run is in flight
+INTERRUPT_GRACE_SECONDS = float(os.getenv("DEEPSTAT_INTERRUPT_GRACE_SECONDS", "2"))
+
+@dataclass
+class ExecutionResult:
+    output: str
+    success: bool
+    timed_out: bool = False
+    table: object = None  # pyarrow.Table of the final result, if any
+
+def clean_code(code: str) -> str:
+    return code.replace("```python", "").replace("```", "").strip()
+
+class ReadOnlyDuckDB:
+    """
+    Stands in for the duckdb module inside generated code, injected and imported (see
+    sandbox_builtins). Every duckdb.connect(...) returns a cursor on the worker's shared read-only
+    connection: several worker processes may hold nba.duckdb open at once only if none of them
+    opens it for writing.
+    """
+
+    def __init__(self, duckdb_module, pool, recorder, cursors):
+        self._duckdb = duckdb_module
+        self._pool = pool
+        self._recorder = recorder
+        self._cursors = cursors
+
+    def connect(self, *args, **kwargs):
+        cursor = self._pool.cursor()
+        self._cursors.append(cursor)
+        return ArrowCursor(cursor, self._recorder)
+
+    def __getattr__(self, name):
+        return getattr(self._duckdb, name)
+
+def sandbox_builtins(shim):
+    """
+    Builtins for generated code in which `import duckdb` (and `from duckdb import connect`) yield the
+    shim: a real duckdb.connect('nba.duckdb') would fail, since the worker already holds the file
+    open with a different configuration (memory_limit).
+    """
+    def sandbox_import(name, globals=None, locals=None, fromlist=(), level=0):
+        if level == 0 and name.split(".")[0] == "duckdb" and not (fromlist and "." in name):
+            return shim
+        return builtins.__import__(name, globals, locals, fromlist, level)
+
+    return {**vars(builtins), "__import__": sandbox_import}
+
+def run_code(code, exec_globals):
+    """
+    Executes code with stdout/stderr captured. Safe to redirect the process-wide streams here
+    because a worker process only ever runs one script at a time.
+    """
+    f = io.StringIO()
+    f_err = io.StringIO()
+    success = False
+
+    with contextlib.redirect_stdout(f), contextlib.redirect_stderr(f_err):
+        try:
+            exec(code, exec_globals)
+            success = True
+        except Exception as e:
+            print(f"RUNTIME ERROR: {e}")
+            traceback.print_exc()
+            success = False
+
+    output = f.getvalue()
+    errors = f_err.getvalue()
+
+    if errors: output += f"\n[STDERR]\n{errors}"
+
+    if not output.strip() and success:
+        if 'result' in exec_globals: output = f"[Captured 'result']:\n{exec_globals['result']}"
+        elif 'df' in exec_globals: output = f"[Captured 'df']:\n{exec_globals['df']}"
+        else: output = "(No output. Try assigning 'result' variable.)"
+
+    return output, success
+
+def capture_table(exec_globals, recorder):
+    """
+    Picks the structured result of a run: the final `result`/`df` DataFrame if the script
+    left one behind, otherwise the last table it fetched through `con`.
+    """
+    import pandas as pd
+    import pyarrow as pa
+
+    for name in ('result', 'df'):
+        value = exec_globals.get(name)
+        if isinstance(value, pa.Table):
+            return value
+        if isinstance(value, pd.DataFrame):
+            try:
+                return pa.Table.from_pandas(value, preserve_index=False)
+            except (pa.ArrowException, TypeError, ValueError):
+                break
+    return recorder.last_table
+
+def apply_memory_limit(memory_mb):
+    try:
+        import resource
+    except ImportError:
+        # Windows has no setrlimit; the DuckDB memory_limit below still applies.
+        return
+    limit = memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def listen_for_interrupts(control, current):
+    """
+    Runs on a side thread of the worker. The main thread is usually inside DuckDB (C code), where
+    a Python signal handler would not run until the query finished, so interrupts arrive on a
+    separate pipe and are applied from here with cursor.interrupt().
+    """
+    while True:
+        try:
+            run_id = control.recv()
+        except (EOFError, OSError):
+            return
+        if run_id != current["run_id"]:
+            continue  # late interrupt for a run that already finished
+        for cursor in list(current["cursors"]):
+            try:
+                cursor.interrupt()
+            except Exception:
+                pass
+
+def worker_main(conn, control, db_path, memory_mb):
+    # Pre-warm: heavy imports and the database connection happen once per worker, not per run
+    import duckdb
+    import pandas as pd
+    import pyarrow  # noqa: F401 (warm the Arrow result path)
+
+    pool = ConnectionPool(db_path, config={"memory_limit": f"{memory_mb // 2}MB"})
+    pool.open()
+    apply_memory_limit(memory_mb)
+    current = {"run_id": None, "cursors": []}
+    threading.Thread(target=listen_for_interrupts, args=(control, current), daemon=True).start()
+    conn.send("ready")
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        run_id, code = message
+
+        recorder = ArrowRecorder()
+        cursors = []
+        current["cursors"] = cursors
+        current["run_id"] = run_id
+        shim = ReadOnlyDuckDB(duckdb, pool, recorder, cursors)
+        exec_globals = {'duckdb': shim, 'pd': pd, '__builtins__': sandbox_builtins(shim)}
+        table_ipc = None
+        try:
+            cursor = pool.cursor()
+            cursors.append(cursor)
+            con = ArrowCursor(cursor, recorder)
+            exec_globals['con'] = con
+        except RuntimeError:
+            con = None
+        try:
+            output, success = run_code(code, exec_globals)
+            table = capture_table(exec_globals, recorder) if success else None
+            if table is not None:
+                table_ipc = to_arrow_ipc(table)
+        except MemoryError:
+            output, success = f"RUNTIME ERROR: Memory limit of {memory_mb} MB exceeded.", False
+        finally:
+            current["run_id"] = None
+            if con is not None:
+                con.close()
+        conn.send((run_id, output, success, table_ipc))
+
+class SandboxWorker:
+    def __init__(self, ctx, db_path, memory_mb):
+        self.conn, child_conn = ctx.Pipe()
+        self.control, child_control = ctx.Pipe()
+        self.process = ctx.Process(
+            target=worker_main,
+            args=(child_conn, child_control, db_path, memory_mb),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        child_control.close()
+        self.runs = 0
+
+    def interrupt(self, run_id, grace):
+        """
+        Interrupts the run's in-flight DuckDB queries and waits up to `grace` seconds for the script
+        to stop. Returns True if the worker came back (and can be reused).
+        """
+        try:
+            self.control.send(run_id)
+            deadline = time.monotonic() + grace
+            while self.conn.poll(max(deadline - time.monotonic(), 0)):
+                if self.conn.recv()[0] == run_id:
+                    return True
+        except (EOFError, OSError, BrokenPipeError):
+            pass
+        return False
+
+    def wait_ready(self, timeout):
+        if not self.conn.poll(timeout):
+            raise RuntimeError("Sandbox worker failed to start.")
+        self.conn.recv()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+        self.control.close()
+
+class SandboxPool:
+    """
+    Fixed-size pool of sandbox worker processes. run() is blocking and thread-safe: callers
+    wait for an idle worker, so at most `size` scripts execute in parallel.
+    """
+
+    def __init__(self, size=SANDBOX_WORKERS, db_path=DB_PATH, timeout=EXEC_TIMEOUT_SECONDS,
+                 memory_mb=EXEC_MEMORY_MB):
+        self.size = size
+        self.db_path = db_path
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        # spawn (not fork): the API process runs threads and an event loop, which fork does not copy safely
+        self.ctx = mp.get_context("spawn")
+        self.idle = queue.Queue()
+        self.workers = []
+        self.lock = threading.Lock()
+
+    def _spawn(self):
+        worker = SandboxWorker(self.ctx, self.db_path, self.memory_mb)
+        with self.lock:
+            self.workers.append(worker)
+        return worker
+
+    def _replace(self, worker):
+        worker.kill()
+        with self.lock:
+            if worker in self.workers:
+                self.workers.remove(worker)
+        fresh = self._spawn()
+        fresh.wait_ready(timeout=120)
+        return fresh
+
+    def start(self):
+        started = time.time()
+        workers = [self._spawn() for _ in range(self.size)]
+        for worker in workers:
+            worker.wait_ready(timeout=120)
+            self.idle.put(worker)
+        print(f"🧪 Sandbox Ready: {self.size} workers in {time.time() - started:.1f}s")
+
+    def run(self, code, timeout=None, cancel_event=None) -> ExecutionResult:
+        """
+        Executes code on an idle worker. Setting cancel_event (a threading.Event) from another
+        thread abandons the run, like a timeout: in-flight SQL is interrupted, and the worker is
+        killed and replaced only if that doesn't stop it.
+        """
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+        worker = self._acquire(cancel_event)
+        if worker is None:
+            return ExecutionResult(output="RUNTIME ERROR: Execution cancelled.", success=False)
+        try:
+            worker.runs += 1
+            run_id = worker.runs
+            worker.conn.send((run_id, clean_code(code)))
+            deadline = time.monotonic() + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if worker.conn.poll(min(POLL_INTERVAL, max(remaining, 0))):
+                    _, output, success, table_ipc = worker.conn.recv()
+                    table = from_arrow_ipc(table_ipc) if table_ipc else None
+                    return ExecutionResult(output=output, success=success, table=table)
+                if cancel_event is not None and cancel_event.is_set():
+                    worker = self._stop(worker, run_id)
+                    return ExecutionResult(output="RUNTIME ERROR: Execution cancelled.", success=False)
+                if remaining <= 0:
+                    break
+
+            # Runaway script: interrupt it (or kill it and bring up a fresh worker in its place)
+            worker = self._stop(worker, run_id)
+            return ExecutionResult(
+                output=f"RUNTIME ERROR: Execution exceeded the {timeout:.0f}s time limit and was stopped.",
+                success=False,
+                timed_out=True,
+            )
+        except (EOFError, OSError, BrokenPipeError) as e:
+            # The worker died mid-run (e.g. hit the memory cap)
+            worker = self._replace(worker)
+            return ExecutionResult(output=f"RUNTIME ERROR: Sandbox worker crashed ({e}).", success=False)
+        finally:
+            self.idle.put(worker)
+
+    def _stop(self, worker, run_id):
+        if worker.interrupt(run_id, INTERRUPT_GRACE_SECONDS):
+            print("   [Sandbox] Run interrupted, worker reused")
+            return worker
+        return self._replace(worker)
+
+    def _acquire(self, cancel_event):
+        while True:
+            try:
+                return self.idle.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if cancel_event is not None and cancel_event.is_set():
+                    return None
+
+    def shutdown(self):
+        with self.lock:
+            workers = list(self.workers)
+            self.workers.clear()
+        for worker in workers:
+            try:
+                worker.conn.send(None)
+            except Exception:
+                pass
+            worker.kill()
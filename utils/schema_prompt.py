@@ -0,0 +1,171 @@
+import os
+import re
+import threading
+
+from utils.db_pool import ConnectionPool
+
+# Schema Prompts
+# The DATA SCHEMA section of the Architect and Coder prompts is rendered from DuckDB's
+# information_schema instead of being hand-written, so every loaded table (players, ranking) is
+# described and the prompt can't drift from the database. Each question only gets the tables and
+# columns it is likely to need, one compact line per table:
+#   - games g(GAME_ID, SEASON, ...) -- notes
+# Fewer prompt tokens per call means less prefill on CPU-only inference.
+SCHEMA_PRUNING_ENABLED = os.getenv("DEEPSTAT_SCHEMA_PRUNING", "1") == "1"
+
+# Render order and the aliases the prompts ask for (gs.PTS, not PTS)
+TABLE_ALIASES = {"games": "g", "game_stats": "gs", "teams": "t", "players": "p", "ranking": "r"}
+
+# What the catalog can't say: (column, note) shown when the table and that column are included (None: always)
+TABLE_NOTES = {
+    "games": [("SEASON", "SEASON is ONLY here."), ("GAME_ID", "GAME_ID 4... = playoffs, 2... = regular season."),
+              ("HOME_TEAM_WINS", "HOME_TEAM_WINS=1: home team won.")],
+    "game_stats": [(None, "Per player per game. NO SEASON: JOIN games g ON gs.GAME_ID = g.GAME_ID."), ("MIN", "MIN is text ('34:12').")],
+    "players": [(None, "Rosters per SEASON.")],
+    "ranking": [(None, "Daily standings."), ("SEASON_ID", "SEASON_ID 22016 = SEASON 2016; use the latest STANDINGSDATE.")],
+}
+
+# Table -> question/plan pattern that pulls it in. games is always included (SEASON lives there).
+TABLE_SIGNALS = {
+    "game_stats": r"\b(players?|points|pts|scor\w*|rebound\w*|assists?|steals?|blocks?|defen\w*|rookie|debut|career|retire\w*"
+                  r"|minutes|shoot\w*|three|3pt|free throws?|plus.minus|ppg|stats?|triple.double|double.double|mvp|carry|starters?|bench)\b",
+    "teams": r"\b(teams?|franchise\w*|city|cities|arena|champion\w*|finals|won|win\w*|nickname|founded|abbreviation|home|away|beat)\b",
+    "players": r"\b(rosters?|teammates?|played for|traded)\b",
+    "ranking": r"\b(standings?|conference|east(ern)?|west(ern)?|seed\w*|records?|win(ning)? (pct|percentage)|losses)\b",
+}
+# A person's name ("LeBron James") means player stats; all-caps words (NBA) don't count
+PLAYER_NAME = re.compile(r"\b[A-Z][a-z][a-zA-Z'.-]* [A-Z][a-z][a-zA-Z'.-]*\b")
+
+# (pattern, columns): words in the question -> the columns that answer them, in whichever tables have them
+COLUMN_SIGNALS = [
+    (r"\b(points|pts|scor\w*|ppg|offen\w*)\b", ["PTS", "FGM", "FGA", "PTS_home", "PTS_away"]),
+    (r"\b(rebound\w*|boards?|reb)\b", ["REB", "OREB", "DREB", "REB_home", "REB_away"]),
+    (r"\b(assists?|passing|playmak\w*|ast)\b", ["AST", "TO", "AST_home", "AST_away"]),
+    (r"\b(defen\w*|steals?|stl)\b", ["STL", "BLK", "DREB"]),
+    (r"\b(blocks?|blk)\b", ["BLK"]),
+    (r"\b(threes?|3pt|3-point\w*|from deep)\b", ["FG3M", "FG3A", "FG3_PCT", "FG3_PCT_home", "FG3_PCT_away"]),
+    (r"\b(free throws?|ft)\b", ["FTM", "FTA", "FT_PCT", "FT_PCT_home", "FT_PCT_away"]),
+    (r"\b(shoot\w*|shot|efficien\w*|percentage|field goals?|fg)\b", ["FGM", "FGA", "FG_PCT", "FG3_PCT", "FT_PCT", "FG_PCT_home", "FG_PCT_away"]),
+    (r"\b(minutes|per 36|per minute|playing time)\b", ["MIN"]),
+    (r"\b(plus.minus|impact|on.court)\b", ["PLUS_MINUS"]),
+    (r"\bturnovers?\b", ["TO"]),
+    (r"\bfouls?\b", ["PF"]),
+    (r"\b(start\w*|bench|position|centers?|guards?|forwards?)\b", ["START_POSITION"]),
+    (r"\b(dates?|when|day|month)\b", ["GAME_DATE_EST", "STANDINGSDATE"]),
+    (r"\b(won|win\w*|champion\w*|finals|beat|lost|loss\w*|home|away|road|margin|blowout)\b",
+     ["HOME_TEAM_WINS", "HOME_TEAM_ID", "VISITOR_TEAM_ID", "PTS_home", "PTS_away", "W", "L", "W_PCT"]),
+    (r"\b(records?|standings?|seed\w*)\b", ["G", "W", "L", "W_PCT", "HOME_RECORD", "ROAD_RECORD", "STANDINGSDATE"]),
+    (r"\b(conference|east(ern)?|west(ern)?)\b", ["CONFERENCE"]),
+    (r"\b(arenas?|stadium)\b", ["ARENA", "ARENACAPACITY"]),
+    (r"\b(founded|oldest|newest)\b", ["YEARFOUNDED", "MIN_YEAR", "MAX_YEAR"]),
+    (r"\bcoach\w*\b", ["HEADCOACH"]),
+    (r"\bowners?\b", ["OWNER"]),
+]
+# Kept in every included table: join keys, names and seasons
+KEY_COLUMNS = {"GAME_ID", "TEAM_ID", "PLAYER_ID", "PLAYER_NAME", "SEASON", "SEASON_ID", "ABBREVIATION", "NICKNAME", "CITY", "TEAM"}
+# Shown when the question names none of the table's stats (mostly what the prompts used to list by hand).
+# games is often only there for SEASON; results and scores come in through COLUMN_SIGNALS.
+DEFAULT_COLUMNS = {
+    "games": {"GAME_ID", "GAME_DATE_EST", "SEASON"},
+    "game_stats": {"GAME_ID", "TEAM_ID", "TEAM_CITY", "PLAYER_NAME", "PTS", "REB", "AST", "STL", "BLK", "DREB", "PF", "MIN",
+                   "PLUS_MINUS", "FG_PCT", "FG3_PCT", "FT_PCT"},
+    "teams": {"TEAM_ID", "ABBREVIATION", "NICKNAME", "CITY"},
+    "ranking": {"TEAM_ID", "SEASON_ID", "STANDINGSDATE", "CONFERENCE", "TEAM", "G", "W", "L", "W_PCT"},
+}
+
+# Used when nba.duckdb is missing (offline runs, stub mode)
+STATIC_SCHEMA = """- games g(GAME_ID, GAME_DATE_EST, HOME_TEAM_ID, VISITOR_TEAM_ID, SEASON, HOME_TEAM_WINS, PTS_home, PTS_away) -- SEASON is ONLY here.
+- game_stats gs(GAME_ID, TEAM_ID, TEAM_CITY, PLAYER_NAME, PTS, REB, AST, STL, BLK, DREB, PF, MIN, PLUS_MINUS, FG_PCT, FG3_PCT, FT_PCT) -- NO SEASON here: JOIN games g ON gs.GAME_ID = g.GAME_ID.
+- teams t(TEAM_ID, ABBREVIATION, NICKNAME, CITY)"""
+
+class SchemaCatalog:
+    """
+    The tables and columns of nba.duckdb, read once from information_schema.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.tables = None  # {table: [columns]} in render order
+        self.version = None  # the nba.duckdb build they were read from
+        self.lock = threading.Lock()
+
+    def load(self):
+        """
+        Raises RuntimeError when nba.duckdb does not exist yet (nothing is cached, so a later call retries).
+        Reloaded when nba.duckdb is rebuilt.
+        """
+        version = self.pool.current_version()
+        with self.lock:
+            if self.tables is None or version != self.version:
+                table = self.pool.fetch_arrow(
+                    "SELECT table_name, column_name FROM information_schema.columns ORDER BY table_name, ordinal_position"
+                )
+                tables = {}
+                for name, column in zip(table.column("table_name").to_pylist(), table.column("column_name").to_pylist()):
+                    tables.setdefault(name, []).append(column)
+                order = list(TABLE_ALIASES)
+                self.tables = dict(sorted(tables.items(), key=lambda item: (order.index(item[0]) if item[0] in order else len(order), item[0])))
+                self.version = version
+        return self.tables
+
+    def select(self, question=None, plan=None):
+        """
+        {table: [columns]} relevant to the question (and the Architect's plan).
+        Everything when question is None or pruning is off.
+        """
+        tables = self.load()
+        if question is None or not SCHEMA_PRUNING_ENABLED:
+            return tables
+        text = question + "\n" + (plan or "")
+
+        wanted = {"games"}
+        for name in tables:
+            pattern = TABLE_SIGNALS.get(name)
+            if re.search(rf"\b{re.escape(name)}\b", text, re.IGNORECASE) or (pattern and re.search(pattern, text, re.IGNORECASE)):
+                wanted.add(name)
+        if PLAYER_NAME.search(question):
+            wanted.add("game_stats")
+        if wanted == {"games"}:
+            return tables  # nothing recognizable: don't guess
+
+        signalled = {column for pattern, columns in COLUMN_SIGNALS if re.search(pattern, text, re.IGNORECASE) for column in columns}
+        selected = {}
+        for name, columns in tables.items():
+            if name not in wanted:
+                continue
+            named = [c for c in columns if c in signalled or re.search(rf"\b{re.escape(c)}\b", text)]
+            keep = set(named) if named else DEFAULT_COLUMNS.get(name, set(columns))
+            selected[name] = [c for c in columns if c in keep or c in KEY_COLUMNS]
+        return selected
+
+    def render(self, question=None, plan=None):
+        lines = []
+        for name, columns in self.select(question, plan).items():
+            alias = TABLE_ALIASES.get(name)
+            line = f"- {name}{' ' + alias if alias else ''}({', '.join(columns)})"
+            notes = [note for column, note in TABLE_NOTES.get(name, []) if column is None or column in columns]
+            if notes:
+                line += " -- " + " ".join(notes)
+            lines.append(line)
+        return "\n".join(lines)
+
+catalog = None
+
+def get_schema_catalog(pool=None):
+    """
+    The process-wide SchemaCatalog. api.py passes its pool first, so the prompts share its connection.
+    """
+    global catalog
+    if catalog is None:
+        catalog = SchemaCatalog(pool or ConnectionPool())
+    return catalog
+
+def schema_prompt(question=None, plan=None):
+    """
+    The DATA SCHEMA text for one agent call: pruned to the question (and plan), or every table when
+    question is None. STATIC_SCHEMA when nba.duckdb is missing.
+    """
+    try:
+        return get_schema_catalog().render(question, plan)
+    except RuntimeError:
+        return STATIC_SCHEMA
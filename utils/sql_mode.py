@@ -0,0 +1,102 @@
+import json
+import os
+import re
+from dataclasses import dataclass, field
+
+# SQL-Only Execution
+# Most Coder scripts are one SQL string wrapped in Python (query = ...; df = con.execute(query).df(); print(df)).
+# In SQL mode the SQL Coder answers with JSON instead: the query, its bound parameters and display hints.
+# The server checks that it is a single read-only SELECT and runs it on the read-only pool
+# (utils/db_pool.py) with the parameters bound: no sandbox round trip, no exec, no stdout capture
+# and no pandas. The result stays an Arrow table. Questions that need pandas ("needs_python"), and
+# queries that fail, go through the Python Coder and the sandbox as before.
+SQL_MODE_DEFAULT = os.getenv("DEEPSTAT_SQL_MODE", "0") == "1"
+CHARTS = {"table", "bar", "line"}
+
+@dataclass
+class SQLAnswer:
+    sql: str
+    params: list = field(default_factory=list)
+    display: dict = field(default_factory=dict)  # title, chart (table | bar | line), x, y
+    needs_python: bool = False
+
+    def render_code(self):
+        """
+        Equivalent Python for display. It is also what the sandbox runs if the query has to fall back.
+        """
+        return (
+            f'# SQL mode (run directly on DuckDB)\n'
+            f'query = """{self.sql}"""\n'
+            f'df = con.execute(query, {self.params!r}).df()\n'
+            f'print(df)'
+        )
+
+def parse_sql_answer(text):
+    """
+    SQLAnswer from the SQL Coder's JSON (fenced or bare), or None when there is no JSON object.
+    """
+    # raw_decode stops at the end of the first object, so prose or a second object after it is ignored
+    decoder = json.JSONDecoder()
+    start = text.find("{")
+    data = None
+    while start != -1 and not isinstance(data, dict):
+        try:
+            data, _ = decoder.raw_decode(text, start)
+        except json.JSONDecodeError:
+            pass
+        start = text.find("{", start + 1)
+    if not isinstance(data, dict):
+        return None
+    sql = str(data.get("sql") or "").strip().rstrip(";").strip()
+    params = data.get("params") or []
+    if not isinstance(params, list):
+        params = [params]
+    display = data.get("display") if isinstance(data.get("display"), dict) else {}
+    if display.get("chart") not in CHARTS:
+        display["chart"] = "table"
+    return SQLAnswer(sql=sql, params=params, display=display, needs_python=bool(data.get("needs_python")) or not sql)
+
+def _nodes(tree):
+    if isinstance(tree, dict):
+        yield tree
+        for value in tree.values():
+            yield from _nodes(value)
+    elif isinstance(tree, list):
+        for value in tree:
+            yield from _nodes(value)
+
+def unsafe_reason(pool, sql):
+    """
+    Why a query can't run directly on the server, or None. It must be ONE SELECT statement
+    (DuckDB's json_serialize_sql rejects everything else) reading only tables by name: table
+    functions (read_csv, glob) and quoted file paths could read files on the server.
+    """
+    table = pool.fetch_arrow("SELECT json_serialize_sql(?::VARCHAR) AS tree", [sql])
+    tree = json.loads(table.column("tree")[0].as_py())
+    if tree.get("error"):
+        return tree.get("error_message") or "not a SELECT statement"
+    if len(tree["statements"]) != 1:
+        return f"{len(tree['statements'])} statements (only one is allowed)"
+    for node in _nodes(tree):
+        if node.get("type") == "TABLE_FUNCTION":
+            return "table functions are not allowed"
+        if node.get("type") == "BASE_TABLE" and not re.fullmatch(r"\w+", node.get("table_name", "")):
+            return f"only tables can be read, not {node.get('table_name')!r}"
+    return None
+
+def run_sql(pool, answer, timeout=None):
+    """
+    Runs a checked SQLAnswer on the server-side read-only pool. Returns an ExecutionResult shaped
+    like a sandbox run; output is the compact rendering of the Arrow table (no pandas).
+    """
+    import duckdb
+    from utils.sandbox import ExecutionResult
+    from utils.results import summarize_table
+
+    try:
+        table = pool.fetch_arrow(answer.sql, answer.params or None, timeout=timeout)
+    except duckdb.InterruptException:
+        return ExecutionResult(output=f"RUNTIME ERROR: query exceeded {timeout:.1f}s and was interrupted", success=False, timed_out=True)
+    except Exception as e:
+        return ExecutionResult(output=f"RUNTIME ERROR: {e}", success=False)
+    return ExecutionResult(output=summarize_table(table), success=True, table=table)
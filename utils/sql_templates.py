@@ -0,0 +1,357 @@
+import os
+import re
+import unicodedata
+from dataclasses import dataclass, field
+
+# LLM-Free Fast Path
+# Most production questions fit a handful of shapes that the Coder prompt already hard-codes
+# (top-N by a stat, head-to-head comparison, champion of year X, best rookie seasons).
+# When a question matches one of them with high confidence we fill a parameterized DuckDB
+# query directly and skip the Architect and Coder LLM calls.
+TEMPLATES_ENABLED = os.getenv("DEEPSTAT_TEMPLATES_ENABLED", "1") == "1"
+TEMPLATE_MIN_CONFIDENCE = float(os.getenv("DEEPSTAT_TEMPLATE_MIN_CONFIDENCE", "0.9"))
+# Per-game rankings ignore tiny samples (a 40-point cameo is not a 40 PPG season)
+PER_GAME_MIN_GAMES = int(os.getenv("DEEPSTAT_TEMPLATE_MIN_GAMES", "20"))
+
+# Stat vocabulary -> game_stats column (whitelisted: column names can't be bound as parameters)
+STATS = {
+    "points": "PTS", "point": "PTS", "pts": "PTS", "scoring": "PTS", "scorer": "PTS", "scorers": "PTS",
+    "rebounds": "REB", "rebound": "REB", "reb": "REB", "rebounding": "REB", "rebounders": "REB",
+    "assists": "AST", "assist": "AST", "ast": "AST",
+    "steals": "STL", "steal": "STL", "stl": "STL",
+    "blocks": "BLK", "block": "BLK", "blk": "BLK", "blocked shots": "BLK",
+    "plus minus": "PLUS_MINUS", "plus/minus": "PLUS_MINUS",
+}
+
+# Qualifiers the templates can't express. If any appears, let the LLM handle the question.
+UNSUPPORTED = re.compile(
+    r"\b(team|teams|triple|double|streak|against|month|quarter|percentage|pct|efficiency|"
+    r"home|away|road|win|wins|loss|losses|coach|arena|career high|single game|in a game|"
+    r"retire|retirement|final season|last season|debut game|improve|improvement|carry|elevat|why|how many games)\b",
+    re.IGNORECASE,
+)
+
+# Qualifiers that change the answer but no template slot takes. Each one found in what the matcher
+# left over halves the match's confidence, so the question falls back to the LLM pipeline.
+# Team names come from the teams table (TemplateLibrary.team_names).
+QUALIFIERS = [
+    ("season_range", re.compile(r"\b(since|between|after|before|until|through|from)\s+(the\s+)?(19|20)\d\d\b"
+                                r"|\b(last|past|previous|recent)\s+(\d+|two|three|four|five|six|seven|eight|nine|ten|few|several)\s+(seasons|years)\b"
+                                r"|\b(19|20)\d0s\b|\bdecades?\b|\beras?\b|\b(19|20)\d\d\s*(-|to|and|through)\s*(19|20)?\d\d\b")),
+    ("position", re.compile(r"\b(centers?|guards?|forwards?|big men|bigs|wings?)\b")),
+    ("games_threshold", re.compile(r"\b(at least|minimum( of)?|min|more than|over|fewer than|less than|under)\s+\d+\s*(games|gp|minutes|mins)\b"
+                                   r"|\b\d+\+\s*(games|gp)\b|\bqualif\w*\b")),
+    ("rate", re.compile(r"\b(efficient|efficiency|true shooting|ts|per 36|per minute|per 100|per possession|usage|rate|ratio|percentage|pct|shooting)\b|%")),
+    ("count", re.compile(r"\bhow (many|much|often)\b|\bnumber of\b|\bmargin\b|\bseries\b")),
+]
+
+def _fold(text):
+    # Lowercase without diacritics, so "Jokić" and "Jokic" compare equal
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+def _name_key(text):
+    # Player names and questions are compared in this form: folded, punctuation other than ' . - dropped
+    return " ".join(re.sub(r"[^\w'\.\- ]", " ", _fold(text)).split())
+
+@dataclass
+class TemplateMatch:
+    name: str
+    confidence: float
+    sql: str
+    params: list
+    plan: str
+    slots: dict = field(default_factory=dict)
+
+    def render_code(self):
+        """
+        Equivalent Python for display (the fast path runs the SQL directly, not this script).
+        """
+        return (
+            f'# Template: {self.name} (no LLM)\n'
+            f'query = """{self.sql}"""\n'
+            f'df = con.execute(query, {self.params!r}).df()\n'
+            f'print(df)'
+        )
+
+def _find_year(text):
+    years = re.findall(r"\b(19[5-9]\d|20[0-4]\d)\b", text)
+    return int(years[0]) if len(years) == 1 else None
+
+def _find_limit(text, default=10):
+    match = re.search(r"\btop\s+(\d{1,2})\b", text) or re.search(r"\b(\d{1,2})\s+(?:best|top|greatest|players|leaders)\b", text)
+    return min(int(match.group(1)), 50) if match else default
+
+def _find_stat(text):
+    for phrase in sorted(STATS, key=len, reverse=True):
+        if re.search(rf"\b{re.escape(phrase)}\b", text):
+            return STATS[phrase]
+    return None
+
+def _game_type(text):
+    # GAME_ID prefix: 2 = regular season, 4 = playoffs
+    if re.search(r"\bplayoffs?\b|\bpostseason\b", text):
+        return "4%", "playoffs"
+    if re.search(r"\bregular season\b", text):
+        return "2%", "regular season"
+    return "%", "all games"
+
+def _min_games(per_game, like):
+    if not per_game:
+        return 1
+    return max(PER_GAME_MIN_GAMES // 4, 1) if like == "4%" else PER_GAME_MIN_GAMES
+
+def _per_game(text):
+    return bool(re.search(r"\bper game\b|\baverage\b|\bppg\b|\brpg\b|\bapg\b", text))
+
+class TemplateLibrary:
+    """
+    Question classifier + parameterized query library. Player names are resolved against the
+    distinct PLAYER_NAME values loaded once from game_stats.
+    """
+
+    def __init__(self, player_names, version=None, team_names=()):
+        self.version = version  # the nba.duckdb build the names were read from
+        self.full_names = {_name_key(name): name for name in player_names if name}
+        # Cities and nicknames ("golden state", "warriors"); abbreviations ("GSW") only match in capitals
+        self.team_names = {name.lower() for name in team_names if name and not name.isupper()}
+        self.team_abbreviations = {name for name in team_names if name and name.isupper()}
+        # Single-token aliases ("LeBron", "Curry") only when they point at exactly one player
+        tokens = {}
+        for name in self.full_names.values():
+            for token in _name_key(name).split():
+                if len(token) >= 4:
+                    tokens.setdefault(token, set()).add(name)
+        self.unique_tokens = {token: next(iter(names)) for token, names in tokens.items() if len(names) == 1}
+
+    @classmethod
+    def from_pool(cls, pool):
+        version = pool.current_version()
+        table = pool.fetch_arrow("SELECT DISTINCT PLAYER_NAME FROM game_stats WHERE PLAYER_NAME IS NOT NULL")
+        teams = pool.fetch_arrow("SELECT CITY, NICKNAME, ABBREVIATION FROM teams")
+        team_names = [name for column in teams.columns for name in column.to_pylist()]
+        return cls(table.column("PLAYER_NAME").to_pylist(), version, team_names)
+
+    def find_players(self, question):
+        """
+        Returns [(canonical name, exact)] in order of appearance. exact=False for single-token aliases.
+        """
+        text = f" {_name_key(question)} "
+        found = []
+        for key, name in self.full_names.items():
+            position = text.find(f" {key} ")
+            if position >= 0:
+                found.append((position, name, True))
+        covered = {name for _, name, _ in found}
+        # Only capitalized words in the original question are considered as name aliases
+        for match in re.finditer(r"\b([^\W\d_][\w'\.\-]{3,})\b", question):
+            if not match.group(1)[0].isupper():
+                continue
+            name = self.unique_tokens.get(_name_key(match.group(1)))
+            if name and name not in covered:
+                found.append((match.start(), name, False))
+                covered.add(name)
+        return [(name, exact) for _, name, exact in sorted(found)]
+
+    def match(self, question):
+        """
+        Returns the best TemplateMatch for the question, or None. Its confidence drops below
+        TEMPLATE_MIN_CONFIDENCE when the question has qualifiers the template would ignore.
+        """
+        text = " ".join(question.lower().split())
+        # "Which team won ..." is the champion shape itself, so it is checked before the qualifier filter
+        champion = self._match_champion(question, text)
+        if champion or UNSUPPORTED.search(text):
+            return self._qualify(champion, question, text)
+        for matcher in (self._match_rookies, self._match_compare, self._match_top_players):
+            result = matcher(question, text)
+            if result:
+                return self._qualify(result, question, text)
+        return None
+
+    def unhandled_qualifiers(self, question, text):
+        """
+        Names of the QUALIFIERS (and "team") in what is left of the question once the parts a
+        template consumes are removed: player names, one season year, "top N".
+        """
+        leftover = _fold(text)
+        for name, _ in self.find_players(question):
+            leftover = leftover.replace(_fold(name), " ")
+        years = re.findall(r"\b(?:19[5-9]\d|20[0-4]\d)\b", leftover)
+        found = ["season_range"] if len(years) > 1 else []
+        leftover = re.sub(r"\btop\s+\d{1,2}\b", " ", leftover)
+        found += [name for name, pattern in QUALIFIERS if pattern.search(leftover) and name not in found]
+        if (any(re.search(rf"\b{re.escape(team)}\b", leftover) for team in self.team_names)
+                or any(re.search(rf"\b{re.escape(abbreviation)}\b", question) for abbreviation in self.team_abbreviations)):
+            found.append("team")
+        return found
+
+    def _qualify(self, match, question, text):
+        if match is None:
+            return None
+        unhandled = self.unhandled_qualifiers(question, text)
+        if unhandled:
+            match.confidence = round(match.confidence * 0.5 ** len(unhandled), 3)
+            match.slots["unhandled"] = unhandled
+        return match
+
+    def _match_champion(self, question, text):
+        if not re.search(r"\b(champion|champions|championship|title|finals)\b", text):
+            return None
+        if not re.search(r"\b(who|which team|winner|won|win)\b", text):
+            return None
+        if re.search(r"\b(mvp|player|players|roster|coach|series|game \d|lose|lost|against|runner)", text):
+            return None
+        year = _find_year(text)
+        if year is None or _find_stat(text) or self.find_players(question):
+            return None
+        # Data SEASON=X is the season that ends with the June X+1 Finals
+        season = year - 1
+        sql = """
+            WITH finals_game AS (
+                SELECT g.GAME_ID, g.GAME_DATE_EST, g.HOME_TEAM_ID, g.VISITOR_TEAM_ID, g.HOME_TEAM_WINS
+                FROM games g
+                WHERE g.SEASON = ? AND CAST(g.GAME_ID AS VARCHAR) LIKE '4%'
+                ORDER BY g.GAME_DATE_EST DESC, g.GAME_ID DESC
+                LIMIT 1
+            )
+            SELECT t.CITY, t.NICKNAME, t.ABBREVIATION, f.GAME_DATE_EST AS Clinching_Game_Date
+            FROM finals_game f
+            JOIN teams t ON t.TEAM_ID = CASE WHEN f.HOME_TEAM_WINS = 1 THEN f.HOME_TEAM_ID ELSE f.VISITOR_TEAM_ID END
+        """
+        plan = (
+            f"1. Load 'games' (Filter: SEASON={season} because the {year} Finals end season {season}; playoff games only).\n"
+            f"2. Take the last playoff game by date (the clinching Finals game).\n"
+            f"3. Identify the winner using 'HOME_TEAM_WINS'.\n"
+            f"4. Join with 'teams' to get the team name."
+        )
+        return TemplateMatch("champion", 1.0, sql, [season], plan, {"year": year, "season": season})
+
+    def _match_rookies(self, question, text):
+        if not re.search(r"\brookies?\b|\bfirst seasons?\b", text):
+            return None
+        if not re.search(r"\b(best|greatest|top|most|highest|leading)\b", text):
+            return None
+        if self.find_players(question) or _find_year(text):
+            return None
+        stat = _find_stat(text) or "PTS"
+        limit = _find_limit(text)
+        order = "Per_Game" if _per_game(text) else "Rookie_Total"
+        min_games = _min_games(order == "Per_Game", "%")
+        sql = f"""
+            WITH player_milestones AS (
+                SELECT gs.PLAYER_NAME, MIN(g.SEASON) AS Rookie_Season
+                FROM game_stats gs
+                JOIN games g ON gs.GAME_ID = g.GAME_ID
+                GROUP BY gs.PLAYER_NAME
+            )
+            SELECT gs.PLAYER_NAME,
+                   mil.Rookie_Season AS Season,
+                   COUNT(gs.{stat}) AS GP,
+                   SUM(gs.{stat}) AS Rookie_Total,
+                   ROUND(AVG(gs.{stat}), 1) AS Per_Game
+            FROM game_stats gs
+            JOIN games g ON gs.GAME_ID = g.GAME_ID
+            JOIN player_milestones mil ON gs.PLAYER_NAME = mil.PLAYER_NAME
+                                      AND g.SEASON = mil.Rookie_Season
+            GROUP BY gs.PLAYER_NAME, mil.Rookie_Season
+            HAVING COUNT(gs.{stat}) >= ?
+            ORDER BY {order} DESC NULLS LAST
+            LIMIT ?
+        """
+        plan = (
+            f"1. Compute each player's first season: MIN(SEASON) per PLAYER_NAME (join game_stats with games).\n"
+            f"2. Keep only games from that first season.\n"
+            f"3. Aggregate {stat}: SUM as Rookie_Total and AVG as Per_Game.\n"
+            f"4. Order by {order} DESC and return the top {limit}."
+        )
+        confidence = 1.0 if _find_stat(text) else 0.9
+        return TemplateMatch("best_rookie_seasons", confidence, sql, [min_games, limit], plan, {"stat": stat, "limit": limit})
+
+    def _match_compare(self, question, text):
+        if not re.search(r"\b(compare|comparison|vs|versus|better|or)\b", text):
+            return None
+        players = self.find_players(question)
+        if len(players) != 2:
+            return None
+        year = _find_year(text)
+        like, game_label = _game_type(text)
+        sql = """
+            SELECT gs.PLAYER_NAME,
+                   COUNT(gs.PTS) AS GP,
+                   SUM(gs.PTS) AS Total_Points,
+                   ROUND(AVG(gs.PTS), 1) AS PPG,
+                   ROUND(AVG(gs.REB), 1) AS RPG,
+                   ROUND(AVG(gs.AST), 1) AS APG,
+                   ROUND(AVG(gs.STL), 1) AS SPG,
+                   ROUND(AVG(gs.BLK), 1) AS BPG,
+                   ROUND(AVG(gs.PLUS_MINUS), 1) AS Plus_Minus
+            FROM game_stats gs
+            JOIN games g ON gs.GAME_ID = g.GAME_ID
+            WHERE gs.PLAYER_NAME IN (?, ?)
+              AND (CAST(? AS BIGINT) IS NULL OR g.SEASON = ?)
+              AND CAST(g.GAME_ID AS VARCHAR) LIKE ?
+            GROUP BY gs.PLAYER_NAME
+            ORDER BY Total_Points DESC
+        """
+        (first, first_exact), (second, second_exact) = players
+        season_note = f"SEASON={year}" if year else "no season filter (career)"
+        plan = (
+            f"1. Load 'game_stats' joined with 'games' for {first} and {second} ({season_note}, {game_label}).\n"
+            f"2. Group By PLAYER_NAME.\n"
+            f"3. Calculate GP, Total_Points and per-game PTS/REB/AST/STL/BLK/PLUS_MINUS.\n"
+            f"4. Order by Total_Points DESC."
+        )
+        confidence = 1.0 if first_exact and second_exact else 0.9
+        return TemplateMatch("compare_players", confidence, sql, [first, second, year, year, like], plan,
+                             {"players": [first, second], "season": year})
+
+    def _match_top_players(self, question, text):
+        if not re.search(r"\b(most|top|leader|leaders|leading|led|highest|best|greatest)\b", text):
+            return None
+        stat = _find_stat(text)
+        if stat is None or self.find_players(question):
+            return None
+        year = _find_year(text)
+        limit = _find_limit(text)
+        like, game_label = _game_type(text)
+        order = "Per_Game" if _per_game(text) else "Total"
+        min_games = _min_games(order == "Per_Game", like)
+        sql = f"""
+            SELECT gs.PLAYER_NAME,
+                   g.SEASON,
+                   COUNT(gs.{stat}) AS GP,
+                   SUM(gs.{stat}) AS Total,
+                   ROUND(AVG(gs.{stat}), 1) AS Per_Game
+            FROM game_stats gs
+            JOIN games g ON gs.GAME_ID = g.GAME_ID
+            WHERE (CAST(? AS BIGINT) IS NULL OR g.SEASON = ?)
+              AND CAST(g.GAME_ID AS VARCHAR) LIKE ?
+            GROUP BY gs.PLAYER_NAME, g.SEASON
+            HAVING COUNT(gs.{stat}) >= ?
+            ORDER BY {order} DESC NULLS LAST
+            LIMIT ?
+        """
+        # GLOBAL SEARCH: without a season, rank player-seasons across history (same rule as the Architect)
+        season_note = f"SEASON={year}" if year else "no season filter; GROUP BY PLAYER_NAME, SEASON across history"
+        plan = (
+            f"1. Load 'game_stats' joined with 'games' ({season_note}, {game_label}).\n"
+            f"2. Group By PLAYER_NAME, SEASON.\n"
+            f"3. Aggregate {stat}: SUM as Total, AVG as Per_Game.\n"
+            f"4. Order by {order} DESC (minimum {min_games} games) and return the top {limit}."
+        )
+        return TemplateMatch("top_players", 1.0, sql, [year, year, like, min_games, limit], plan,
+                             {"stat": stat, "season": year, "limit": limit})
+
+def run_template(pool, match, timeout=None):
+    """
+    Executes a matched template on the server-side read-only pool. Returns an ExecutionResult
+    shaped like a sandbox run, so the rest of the pipeline doesn't care which path produced it.
+    """
+    from utils.sandbox import ExecutionResult
+
+    try:
+        table = pool.fetch_arrow(match.sql, match.params, timeout=timeout)
+    except Exception as e:
+        return ExecutionResult(output=f"RUNTIME ERROR: {e}", success=False)
+    return ExecutionResult(output=table.to_pandas().to_string(), success=True, table=table)
@@ -0,0 +1,320 @@
+import ast
+import difflib
+import os
+import re
+import threading
+from dataclasses import dataclass, field, asdict
+
+# Pre-Execution SQL Validation
+# Most Coder retries exist to catch hallucinated columns (WIN_SHARES), a SEASON read from
+# game_stats without the games join, or a misspelled table. The SQL literals in a generated
+# script are bound against the real catalog with EXPLAIN (nothing is executed) before the
+# script reaches the sandbox. Failures come back as structured issues with a did-you-mean;
+# unambiguous ones are fixed in place without another Coder call.
+SQL_VALIDATION_ENABLED = os.getenv("DEEPSTAT_SQL_VALIDATION", "1") == "1"
+SQL_AUTOFIX_ENABLED = os.getenv("DEEPSTAT_SQL_AUTOFIX", "1") == "1"
+MAX_FIXES_PER_QUERY = 3
+
+SQL_START = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+# Placeholders mean the string is filled in at runtime, so it can't be bound as written
+PLACEHOLDERS = re.compile(r"\?|\$\d|%s|%\(|\{|\}")
+CREATED_TABLE = re.compile(r"CREATE\s+(?:OR\s+REPLACE\s+)?(?:TEMP(?:ORARY)?\s+)?(?:TABLE|VIEW)\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)", re.IGNORECASE)
+REGISTERED_TABLE = re.compile(r"register\(\s*['\"](\w+)['\"]")
+
+# Common hallucinated names -> real column
+COLUMN_ALIASES = {
+    "POINTS": "PTS", "REBOUNDS": "REB", "ASSISTS": "AST", "STEALS": "STL", "BLOCKS": "BLK",
+    "PLAYER": "PLAYER_NAME", "NAME": "PLAYER_NAME", "GAME_DATE": "GAME_DATE_EST", "DATE": "GAME_DATE_EST",
+    "MINUTES": "MIN", "TEAM_ABBR": "TEAM_ABBREVIATION", "YEAR": "SEASON", "SEASON_ID": "SEASON",
+}
+
+@dataclass
+class SQLIssue:
+    kind: str  # unknown_column | unknown_table | unknown_alias | grouping | syntax | other
+    message: str  # first line of DuckDB's error
+    sql: str
+    column: str | None = None
+    table: str | None = None
+    suggestion: str | None = None
+
+    def to_dict(self):
+        return asdict(self)
+
+    def describe(self):
+        text = self.message
+        if self.suggestion:
+            text += f" Did you mean: {self.suggestion}?"
+        return text
+
+@dataclass
+class ValidationReport:
+    code: str
+    issues: list = field(default_factory=list)
+    fixes: list = field(default_factory=list)  # human-readable rewrites applied to the code
+    queries: int = 0  # SQL literals that were bound against the catalog
+
+    @property
+    def ok(self):
+        return not self.issues
+
+    def error_output(self):
+        lines = ["SQL VALIDATION ERROR (script was not executed):"]
+        for issue in self.issues:
+            lines.append(f"- [{issue.kind}] {issue.describe()}")
+        return "\n".join(lines)
+
+def _standalone_sql(tree):
+    """
+    SQL-looking string literals that are used as-is: assigned, passed as an argument or returned.
+    Fragments glued together with +, % or .format() are skipped.
+    """
+    parents = {}
+    for node in ast.walk(tree):
+        for child in ast.iter_child_nodes(node):
+            parents[child] = node
+    found = []
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Constant) and isinstance(node.value, str)):
+            continue
+        if not SQL_START.match(node.value) or PLACEHOLDERS.search(node.value):
+            continue
+        parent = parents.get(node)
+        if isinstance(parent, (ast.Assign, ast.AnnAssign, ast.Call, ast.keyword, ast.Return)):
+            if isinstance(parent, ast.Call) and node is parent.func:
+                continue
+            found.append(node.value)
+    return found
+
+def extract_sql(code):
+    """
+    Returns (queries, local_names): the standalone SQL literals in a script and the names
+    it could query besides the catalog (Python variables for DataFrame scans, created/registered tables).
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return [], set()
+    local_names = {node.id.lower() for node in ast.walk(tree) if isinstance(node, ast.Name)}
+    local_names |= {name.lower() for name in CREATED_TABLE.findall(code)}
+    local_names |= {name.lower() for name in REGISTERED_TABLE.findall(code)}
+    return _standalone_sql(tree), local_names
+
+def _first_line(message):
+    return message.strip().splitlines()[0] if message.strip() else message
+
+def _aliases(sql):
+    # alias -> table for "FROM table alias" / "JOIN table AS alias"
+    aliases = {}
+    for table, alias in re.findall(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", sql, re.IGNORECASE):
+        aliases[table.lower()] = table
+        if alias and alias.upper() not in {"ON", "WHERE", "JOIN", "LEFT", "RIGHT", "INNER", "OUTER", "FULL",
+                                           "CROSS", "GROUP", "ORDER", "LIMIT", "USING", "HAVING", "UNION", "WINDOW"}:
+            aliases[alias.lower()] = table
+    return aliases
+
+def _replace_column(sql, old, new, qualifier=None):
+    if qualifier:
+        pattern = rf"\b{re.escape(qualifier)}\.{re.escape(old)}\b"
+        return re.sub(pattern, f"{qualifier}.{new}", sql, flags=re.IGNORECASE)
+    # Leave output aliases ("... AS POINTS") alone: downstream pandas code may use them.
+    # Once POINTS is defined as an output alias, later references (ORDER BY POINTS) are to the alias,
+    # so only the occurrences before the definition (SUM(POINTS) AS POINTS) are rewritten, or else
+    # aggregate arguments after it (an aggregate can't take the alias it defines).
+    pattern = rf"(?<!AS )(?<!\.)\b{re.escape(old)}\b"
+    definition = re.search(rf"\bAS\s+{re.escape(old)}\b", sql, re.IGNORECASE)
+    if not definition:
+        return re.sub(pattern, new, sql, flags=re.IGNORECASE)
+    head, tail = sql[:definition.start()], sql[definition.start():]
+    fixed_head = re.sub(pattern, new, head, flags=re.IGNORECASE)
+    if fixed_head != head:
+        return fixed_head + tail
+    aggregate = rf"(\b(?:SUM|AVG|MIN|MAX|COUNT|MEDIAN)\s*\(\s*(?:DISTINCT\s+)?){re.escape(old)}(\s*\))"
+    return head + re.sub(aggregate, rf"\g<1>{new}\g<2>", tail, flags=re.IGNORECASE)
+
+class SQLValidator:
+    """
+    Binds SQL against the live catalog via EXPLAIN on the server-side read-only pool.
+    Thread-safe; counters feed GET /api/validation/stats.
+    """
+
+    def __init__(self, pool, autofix=SQL_AUTOFIX_ENABLED):
+        self.pool = pool
+        self.autofix = autofix
+        self.catalog = None
+        self.version = None  # the nba.duckdb build the catalog was read from
+        self.lock = threading.Lock()
+        self.counts = {"scripts": 0, "queries": 0, "passed": 0, "rejected": 0, "auto_fixed": 0, "skipped": 0}
+
+    def get_catalog(self):
+        """
+        {table_lower: (table, [columns])} from information_schema, loaded once per nba.duckdb build.
+        """
+        version = self.pool.current_version()
+        if self.catalog is None or version != self.version:
+            table = self.pool.fetch_arrow(
+                "SELECT table_name, column_name FROM information_schema.columns ORDER BY table_name, ordinal_position"
+            )
+            catalog = {}
+            for name, column in zip(table.column("table_name").to_pylist(), table.column("column_name").to_pylist()):
+                catalog.setdefault(name.lower(), (name, []))[1].append(column)
+            self.catalog = catalog
+            self.version = version
+        return self.catalog
+
+    def _count(self, key, n=1):
+        with self.lock:
+            self.counts[key] += n
+
+    def check(self, sql, params=None):
+        """
+        EXPLAINs one statement (with its bound parameters, if any). Returns None if it binds, else an SQLIssue.
+        """
+        import duckdb
+
+        cur = self.pool.cursor()
+        try:
+            if params:
+                cur.execute("EXPLAIN " + sql.strip().rstrip(";"), params)
+            else:
+                cur.execute("EXPLAIN " + sql.strip().rstrip(";"))
+            return None
+        except duckdb.ParserException as e:
+            return SQLIssue("syntax", _first_line(str(e)), sql)
+        except duckdb.Error as e:
+            return self._classify(str(e), sql)
+        finally:
+            cur.close()
+
+    def _classify(self, message, sql):
+        catalog = self.get_catalog()
+        aliases = _aliases(sql)
+        first = _first_line(message)
+
+        match = re.search(r'Table "(\w+)" does not have a column named "(\w+)"', message)
+        if match:
+            alias, column = match.groups()
+            table = aliases.get(alias.lower(), alias)
+            return SQLIssue("unknown_column", first, sql, column=column, table=table,
+                            suggestion=self._suggest_column(column, [table], qualifier=alias))
+
+        match = re.search(r'Referenced column "(\w+)" not found', message)
+        if match:
+            column = match.group(1)
+            tables = sorted({t for t in aliases.values() if t.lower() in catalog})
+            return SQLIssue("unknown_column", first, sql, column=column, table=", ".join(tables) or None,
+                            suggestion=self._suggest_column(column, tables))
+
+        match = re.search(r'Table with name (\w+) does not exist', message)
+        if match:
+            table = match.group(1)
+            duckdb_hint = re.search(r'Did you mean "(\w+)"', message)
+            close = difflib.get_close_matches(table.lower(), list(catalog), n=1)
+            suggestion = duckdb_hint.group(1) if duckdb_hint else (catalog[close[0]][0] if close else None)
+            return SQLIssue("unknown_table", first, sql, table=table, suggestion=suggestion)
+
+        match = re.search(r'Referenced table "(\w+)" not found', message)
+        if match:
+            candidates = re.search(r'Candidate tables: (.*)', message)
+            return SQLIssue("unknown_alias", first, sql, table=match.group(1),
+                            suggestion=candidates.group(1).strip() if candidates else None)
+
+        match = re.search(r'column "(\w+)" must appear in the GROUP BY', message)
+        if match:
+            column = match.group(1)
+            return SQLIssue("grouping", first, sql, column=column,
+                            suggestion=f"add {column} to GROUP BY or wrap it in an aggregate")
+
+        return SQLIssue("other", first, sql)
+
+    def _suggest_column(self, column, tables, qualifier=None):
+        catalog = self.get_catalog()
+        upper = column.upper()
+        own = [c for t in tables if t.lower() in catalog for c in catalog[t.lower()][1]]
+        alias_target = COLUMN_ALIASES.get(upper)
+        if alias_target and alias_target in own:
+            return alias_target
+        close = difflib.get_close_matches(upper, [c.upper() for c in own], n=1, cutoff=0.8)
+        if close:
+            return next(c for c in own if c.upper() == close[0])
+        # Right column, wrong table (e.g. SEASON lives only in games)
+        homes = [name for key, (name, columns) in catalog.items()
+                 if key not in {t.lower() for t in tables} and upper in (c.upper() for c in columns)]
+        if homes:
+            return f"{column} is in {', '.join(homes)}: JOIN it on GAME_ID and read it from there"
+        return None
+
+    def _fix(self, sql, issue):
+        """
+        Returns the rewritten SQL for an issue with a single unambiguous fix, else None.
+        """
+        if issue.kind == "unknown_table" and issue.suggestion:
+            return re.sub(rf"\b{re.escape(issue.table)}\b", issue.suggestion, sql)
+        if issue.kind == "unknown_column" and issue.suggestion and re.fullmatch(r"\w+", issue.suggestion):
+            qualifier = None
+            match = re.search(rf"\b(\w+)\.{re.escape(issue.column)}\b", sql, re.IGNORECASE)
+            if match and match.group(1).lower() in _aliases(sql):
+                qualifier = match.group(1)
+            return _replace_column(sql, issue.column, issue.suggestion, qualifier)
+        return None
+
+    def validate(self, code):
+        """
+        Checks every standalone SQL literal in a script. With autofix, unambiguous issues
+        (misspelled table, near-miss column name) are rewritten in the code and re-checked.
+        """
+        report = ValidationReport(code=code)
+        queries, local_names = extract_sql(code)
+        self._count("scripts")
+        for sql in queries:
+            referenced = {name.lower() for name in re.findall(r"\b(?:FROM|JOIN)\s+(\w+)", sql, re.IGNORECASE)}
+            if referenced & local_names:
+                # Queries a DataFrame or a table the script creates itself: not in the catalog
+                self._count("skipped")
+                continue
+            self._check_query(report, sql)
+        return self._finish(report)
+
+    def validate_sql(self, sql, params=None):
+        """
+        Checks one query run as-is (SQL mode). report.code is the query, rewritten by any autofixes.
+        """
+        report = ValidationReport(code=sql)
+        self._count("scripts")
+        self._check_query(report, sql, params)
+        return self._finish(report)
+
+    def _check_query(self, report, sql, params=None):
+        report.queries += 1
+        self._count("queries")
+        current = sql
+        issue = self.check(current, params)
+        fixes = 0
+        while issue and self.autofix and fixes < MAX_FIXES_PER_QUERY and current in report.code:
+            fixed = self._fix(current, issue)
+            if not fixed or fixed == current:
+                break
+            report.code = report.code.replace(current, fixed)
+            report.fixes.append(f"{issue.column or issue.table} -> {issue.suggestion}")
+            current = fixed
+            fixes += 1
+            issue = self.check(current, params)
+        if issue:
+            report.issues.append(issue)
+
+    def _finish(self, report):
+        if report.issues:
+            self._count("rejected")
+        elif report.fixes:
+            self._count("auto_fixed")
+        elif report.queries:
+            self._count("passed")
+        return report
+
+    def stats(self):
+        with self.lock:
+            counts = dict(self.counts)
+        # Every rejected script skips a sandbox run that would have failed; an auto-fixed one
+        # also skips the Coder round trip that would have been needed to fix it
+        counts["executions_saved"] = counts["rejected"] + counts["auto_fixed"]
+        counts["coder_calls_saved"] = counts["auto_fixed"]
+        return counts
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Per-Stage Memoization
+# Each agent call (Architect plan, Coder script, Analyst narrative) is stored on disk under a hash
+# of exactly what the LLM would see: stage name, model settings and the rendered prompt messages.
+# Identical inputs never pay for the LLM twice, even across restarts.
+STAGE_CACHE_PATH = os.getenv("DEEPSTAT_STAGE_CACHE_PATH", "stage_cache.sqlite3")
+STAGE_CACHE_MAX_BYTES = int(os.getenv("DEEPSTAT_STAGE_CACHE_MAX_MB", "64")) * 1024 * 1024
+STAGE_CACHE_ENABLED = os.getenv("DEEPSTAT_STAGE_CACHE_ENABLED", "1") == "1"
+
+def stage_key(stage: str, chain, inputs: dict) -> str:
+    """
+    Content address for one stage call: sha256 of the stage, the model settings and the
+    fully rendered prompt. Editing a prompt template or switching models changes the key.
+    """
+    payload = {"stage": stage}
+    steps = getattr(chain, "steps", None) or [chain]
+    prompt = steps[0]
+    if hasattr(prompt, "format_messages"):
+        payload["messages"] = [(m.type, m.content) for m in prompt.format_messages(**inputs)]
+    else:
+        payload["inputs"] = inputs
+    for step in steps[1:]:
+        if hasattr(step, "model"):
+            payload["model"] = step.model
+            payload["temperature"] = getattr(step, "temperature", None)
+            if getattr(step, "mode", None):
+                payload["mode"] = step.mode  # stub fixtures must never be served to a live run
+    raw = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class StageCache:
+    """
+    SQLite-backed key/value store with a total size cap. When the cap is exceeded the
+    least recently read entries are evicted first.
+    """
+
+    def __init__(self, path=STAGE_CACHE_PATH, max_bytes=STAGE_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = {}
+        self.misses = {}
+        self.lock = threading.Lock()
+        self.con = sqlite3.connect(path, check_same_thread=False)
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS stage_cache (
+                key TEXT PRIMARY KEY,
+                stage TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self.con.execute("CREATE INDEX IF NOT EXISTS idx_stage_cache_accessed ON stage_cache(accessed_at)")
+        self.con.commit()
+
+    def get(self, stage: str, key: str):
+        with self.lock:
+            row = self.con.execute("SELECT value FROM stage_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses[stage] = self.misses.get(stage, 0) + 1
+                return None
+            self.con.execute("UPDATE stage_cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self.con.commit()
+            self.hits[stage] = self.hits.get(stage, 0) + 1
+            return row[0]
+
+    def put(self, stage: str, key: str, value: str):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self.lock:
+            self.con.execute(
+                "INSERT OR REPLACE INTO stage_cache (key, stage, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, stage, value, size, now, now),
+            )
+            self._evict()
+            self.con.commit()
+
+    def delete(self, key: str):
+        with self.lock:
+            self.con.execute("DELETE FROM stage_cache WHERE key = ?", (key,))
+            self.con.commit()
+
+    def _evict(self):
+        total = self.con.execute("SELECT COALESCE(SUM(size), 0) FROM stage_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Walk from least recently used until enough bytes are freed
+        excess = total - self.max_bytes
+        doomed = []
+        for key, size in self.con.execute("SELECT key, size FROM stage_cache ORDER BY accessed_at ASC").fetchall():
+            doomed.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self.con.executemany("DELETE FROM stage_cache WHERE key = ?", doomed)
+
+    def stats(self):
+        with self.lock:
+            rows = self.con.execute("SELECT stage, COUNT(*), SUM(size) FROM stage_cache GROUP BY stage").fetchall()
+        return {
+            "entries": {stage: count for stage, count, _ in rows},
+            "bytes": sum(size for _, _, size in rows),
+            "max_bytes": self.max_bytes,
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+        }
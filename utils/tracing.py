@@ -0,0 +1,170 @@
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+# Query Traces
+# Every answered question becomes one JSON line: the question, outcome, and a tree of spans
+# (plan, code, validation, execution attempts, repairs, analyst...) with durations, prompt hashes,
+# generated code, row counts and errors. Lines are queued and written in batches by a background
+# thread, so tracing never blocks a request. The file rotates at DEEPSTAT_TRACE_MAX_MB.
+TRACE_ENABLED = os.getenv("DEEPSTAT_TRACE_ENABLED", "1") == "1"
+TRACE_PATH = os.getenv("DEEPSTAT_TRACE_PATH", os.path.join("logs", "traces.jsonl"))
+TRACE_MAX_BYTES = int(float(os.getenv("DEEPSTAT_TRACE_MAX_MB", "10")) * 1024 * 1024)
+TRACE_BACKUPS = int(os.getenv("DEEPSTAT_TRACE_BACKUPS", "5"))
+TRACE_FLUSH_SECONDS = float(os.getenv("DEEPSTAT_TRACE_FLUSH_SECONDS", "1"))
+TRACE_BATCH_SIZE = 100
+TRACE_QUEUE_SIZE = 10000
+
+class Span:
+    def __init__(self, name, origin, **attrs):
+        self.name = name
+        self.origin = origin  # perf_counter of the trace start
+        self.started = time.perf_counter()
+        self.duration = None
+        self.attrs = attrs
+        self.children = []
+
+    def span(self, name, **attrs):
+        child = Span(name, self.origin, **attrs)
+        self.children.append(child)
+        return child
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def end(self):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self.started
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.attrs["error"] = f"{exc_type.__name__}: {exc}" if str(exc) else exc_type.__name__
+        self.end()
+        return False
+
+    def to_dict(self):
+        record = {
+            "name": self.name,
+            "start": round(self.started - self.origin, 4),
+            "duration": round(self.duration if self.duration is not None else time.perf_counter() - self.started, 4),
+        }
+        record.update(self.attrs)
+        if self.children:
+            record["spans"] = [child.to_dict() for child in self.children]
+        return record
+
+class Trace:
+    """
+    One question's trace. trace.root is the top-level "query" span; stages hang off it.
+    """
+
+    def __init__(self, question, **attrs):
+        self.trace_id = uuid.uuid4().hex
+        self.timestamp = datetime.now(timezone.utc).isoformat()
+        self.question = question
+        self.root = Span("query", time.perf_counter(), **attrs)
+
+    def span(self, name, **attrs):
+        return self.root.span(name, **attrs)
+
+    def to_dict(self, **summary):
+        self.root.end()
+        return {
+            "trace_id": self.trace_id,
+            "timestamp": self.timestamp,
+            "question": self.question,
+            **summary,
+            "duration": round(self.root.duration, 4),
+            "spans": [child.to_dict() for child in self.root.children],
+        }
+
+class TraceSink:
+    """
+    Append-only JSONL writer with size-based rotation (traces.jsonl -> traces.jsonl.1 ... .N).
+    emit() never blocks: records are queued and a daemon thread writes them in batches.
+    """
+
+    def __init__(self, path=TRACE_PATH, max_bytes=TRACE_MAX_BYTES, backups=TRACE_BACKUPS,
+                 flush_seconds=TRACE_FLUSH_SECONDS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_seconds = flush_seconds
+        self.queue = queue.Queue(maxsize=TRACE_QUEUE_SIZE)
+        self.dropped = 0
+        self.written = 0
+        self.closed = threading.Event()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.thread = threading.Thread(target=self._run, name="trace-sink", daemon=True)
+        self.thread.start()
+
+    def emit(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1  # never slow a request down for the sake of a trace
+
+    def _run(self):
+        while not (self.closed.is_set() and self.queue.empty()):
+            batch = []
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < TRACE_BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0.01)))
+                except queue.Empty:
+                    break
+                if time.monotonic() >= deadline:
+                    break
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch):
+        lines = "".join(json.dumps(record, default=str) + "\n" for record in batch)
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) + len(lines) > self.max_bytes:
+                self._rotate()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+            self.written += len(batch)
+        except OSError as e:
+            print(f"   [Trace] Write failed: {e}")
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{i}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def close(self, timeout=5):
+        """
+        Flushes queued records and stops the writer thread.
+        """
+        self.closed.set()
+        self.thread.join(timeout=timeout)
+
+def read_traces(path=TRACE_PATH):
+    """
+    Yields trace records from a JSONL file (skipping malformed lines).
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue